@@ -0,0 +1 @@
+# py-feed-reader.benchmarks
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""Compares the generated camelCase codecs with dataclasses-json's to_dict / from_dict
+
+Usage:
+    python -m benchmarks.codec [--items 20000] [--repeat 3]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from dataclasses_json import DataClassJsonMixin
+
+from benchmarks.synthetic import make_feeds, make_items
+from core.config.file import FileStorageSettings
+from core.mixins.dataclasses_json import CamelCaseJsonMixin
+
+
+def legacy_to_dict(value: CamelCaseJsonMixin) -> dict[str, Any]:
+    return DataClassJsonMixin.to_dict(value)
+
+
+def legacy_from_dict(cls: type[CamelCaseJsonMixin], kvs: dict[str, Any]) -> Any:
+    return super(CamelCaseJsonMixin, cls).from_dict(kvs)
+
+
+def legacy_list_to_json(values: list[CamelCaseJsonMixin]) -> str:
+    """The original list_to_json"""
+    return json.dumps([legacy_to_dict(value) for value in values])
+
+
+def legacy_json_to_list(cls: type[CamelCaseJsonMixin], json_string: str) -> list[Any]:
+    """The original json_to_list"""
+    return [legacy_from_dict(cls, kvs) for kvs in json.loads(json_string)]
+
+
+def measure(function: Callable[[], object], repeat: int) -> tuple[float, int]:
+    """(best seconds, peak traced bytes of one extra run)"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def report(name: str, legacy: Callable[[], object], generated: Callable[[], object], repeat: int) -> None:
+    legacy_time, legacy_peak = measure(legacy, repeat)
+    generated_time, generated_peak = measure(generated, repeat)
+    print(
+        f"{name:<34} {legacy_time * 1000:>10.1f} {generated_time * 1000:>10.1f} "
+        f"{legacy_time / generated_time:>8.1f}x {legacy_peak / 2**20:>10.1f} {generated_peak / 2**20:>10.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    feeds = make_feeds(max(args.items // 100, 1))
+    settings = [FileStorageSettings() for _ in range(max(args.items // 100, 1))]
+    item_type, feed_type, settings_type = type(items[0]), type(feeds[0]), FileStorageSettings
+    # the generated codecs must produce exactly what dataclasses-json does
+    for values in (items, feeds, settings):
+        for value in values[:100]:
+            assert value.to_dict() == legacy_to_dict(value), value
+            decoded = type(value).from_dict(value.to_dict())
+            assert legacy_to_dict(decoded) == legacy_to_dict(legacy_from_dict(type(value), value.to_dict()))
+    item_json = legacy_list_to_json(items)
+    feed_json = legacy_list_to_json(feeds)
+    settings_json = legacy_list_to_json(settings)
+
+    print(f"{'':<34} {'legacy ms':>10} {'gen ms':>10} {'speedup':>9} {'legacy MiB':>10} {'gen MiB':>10}")
+    for name, cls, values, json_string in (
+        ("FeedItem", item_type, items, item_json),
+        ("Feed", feed_type, feeds, feed_json),
+        ("FileStorageSettings", settings_type, settings, settings_json),
+    ):
+        report(
+            f"{name} list_to_json",
+            lambda: legacy_list_to_json(values),
+            lambda: cls.list_to_json(values),
+            args.repeat,
+        )
+        report(
+            f"{name} json_to_list",
+            lambda: legacy_json_to_list(cls, json_string),
+            lambda: cls.json_to_list(json_string),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
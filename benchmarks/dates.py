@@ -0,0 +1,101 @@
+"""Compares DateTime.parse_timestamp against the strptime chain it replaced
+
+Usage:
+    python -m benchmarks.dates [--count 10000] [--repeat 5]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+import random
+import time
+from typing import Callable
+
+from core.utilities.datetime import OFFSET_FORMAT, TZ_FORMAT, UTC, DateTime, _parse_cached
+
+
+def legacy_parse_timestamp(date_string: str) -> datetime:
+    """The original implementation: up to three strptime attempts, driven by exceptions"""
+    try:
+        return datetime.strptime(date_string, OFFSET_FORMAT)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(date_string, TZ_FORMAT)
+    except ValueError:
+        pass
+    return datetime.fromisoformat(date_string)
+
+
+def make_timestamps(count: int, feeds: int = 50, seed: int = 1) -> list[tuple[str, str]]:
+    """(feed url, timestamp) pairs in the formats seen in the wild, each feed sticking to one"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    formats: list[Callable[[datetime], str]] = [
+        lambda value: value.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        lambda value: format_datetime(value.astimezone()),
+        lambda value: value.isoformat(),
+    ]
+    timestamps: list[tuple[str, str]] = []
+    for index in range(count):
+        feed = index % feeds
+        value = start + timedelta(seconds=rng.randrange(0, 5 * 365 * 24 * 60 * 60))
+        timestamps.append((f"http://feed-{feed}/rss", formats[feed % len(formats)](value)))
+    return timestamps
+
+
+def measure(name: str, function: Callable[[], object], count: int, repeat: int) -> float:
+    best = min(_time(function) for _ in range(repeat))
+    rate = count / best
+    print(f"{name:<40} {best * 1000:>10.1f} ms {rate:>14,.0f} /s")
+    return rate
+
+
+def _time(function: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    timestamps = make_timestamps(args.count)
+    parsed = [
+        (source, text, DateTime.parse_timestamp(text).utctimetuple())  # type: ignore
+        for source, text in timestamps
+    ]
+
+    def legacy() -> None:
+        for _, text in timestamps:
+            legacy_parse_timestamp(text)
+
+    def cold() -> None:
+        _parse_cached.cache_clear()
+        for source, text in timestamps:
+            DateTime.parse_timestamp(text, source=source)
+
+    def warm() -> None:
+        for source, text in timestamps:
+            DateTime.parse_timestamp(text, source=source)
+
+    def struct() -> None:
+        for source, text, value in parsed:
+            DateTime.parse_timestamp(text, value, source)
+
+    print(f"{args.count:,} timestamps, best of {args.repeat}")
+    baseline = measure("legacy strptime chain", legacy, args.count, args.repeat)
+    for name, function in [
+        ("parse_timestamp (cold cache)", cold),
+        ("parse_timestamp (warm cache, re-poll)", warm),
+        ("parse_timestamp (published_parsed)", struct),
+    ]:
+        rate = measure(name, function, args.count, args.repeat)
+        print(f"{'':<40} {rate / baseline:>10.1f}x legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Load and soak test: refreshes thousands of simulated feeds from a local HTTP server
+
+Usage:
+    python -m benchmarks.load [--feeds 2000] [--rounds 5] [--duration SECONDS]
+                              [--latency 0.02] [--jitter 0.05] [--error-rate 0.02]
+                              [--churn 0.2] [--oversize-rate 0.001] [--oversize-bytes 5242880]
+                              [--atom 0.3] [--storage pickle] [--concurrency 32]
+                              [--parse-workers 0] [--trace-memory] [--metrics metrics.prom]
+
+The feeds are served by a separate process, so the reader's timings and
+memory are not mixed with the server's. Each round is one
+RssFeedReaderService.refresh of every feed, with ETags kept between rounds;
+--duration keeps running rounds for that long, as a soak test. Every round
+reports fetches per second, p50 / p99 fetch latency and the memory high-water
+mark of the process, which keeps growing across rounds if anything leaks.
+With --metrics, the time spent in each refresh stage is summed up at the end
+and every series is written to the given file in the Prometheus text format.
+"""
+
+import argparse
+from dataclasses import dataclass
+import multiprocessing
+from multiprocessing.connection import Connection
+from pathlib import Path
+import sys
+import tempfile
+from threading import Lock
+import time
+import tracemalloc
+
+from benchmarks.run import use_directory
+from benchmarks.synthetic import write_opml
+from core.config.fetch import FetchSettings
+from core.constants.metrics import CONVERT, DEDUPE, PARSE, READ, SAVE
+from core.interfaces.rss import IRssStorageService
+from core.models.feed import Feed
+from core.models.fetch import FetchResult
+from core.services.feed.opml import OPMLFeedService
+from core.services.feed.state import JsonFeedStateService
+from core.services.metrics.prometheus import to_prometheus_text
+from core.services.metrics.sinks import InMemoryMetricsSink
+from core.services.rss.appendlog import AppendLogRssStorageService
+from core.services.rss.fetch import FeedFetcher
+from core.services.rss.jsonl import JsonLinesRssStorageService
+from core.services.rss.pickle import PickleRssStorageService
+from core.services.rss.reader import RssFeedReaderService
+from core.services.rss.sqlite import SqliteRssStorageService
+from fixtures.feed_server import FeedProfile, FeedServer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+STORAGES: dict[str, type[IRssStorageService]] = {
+    "pickle": PickleRssStorageService,
+    "jsonl": JsonLinesRssStorageService,
+    "appendlog": AppendLogRssStorageService,
+    "sqlite": SqliteRssStorageService,
+}
+STAGES: tuple[str, ...] = (READ, PARSE, CONVERT, DEDUPE, SAVE)
+
+
+class TimedFetcher(FeedFetcher):
+    """A FeedFetcher that keeps how long every fetch took"""
+
+    latencies: list[float]
+    _latencies_lock: Lock
+
+    def __init__(self, settings: FetchSettings | None = None):
+        super().__init__(settings)
+        self.latencies = []
+        self._latencies_lock = Lock()
+
+    def fetch_feed(self, feed: Feed) -> FetchResult:
+        result = super().fetch_feed(feed)
+        with self._latencies_lock:
+            self.latencies.append(result.elapsed)
+        return result
+
+    def take_latencies(self) -> list[float]:
+        with self._latencies_lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+
+@dataclass(slots=True)
+class RoundResult:
+    round: int
+    fetches: int
+    seconds: float
+    ok: int
+    not_modified: int
+    failed: int
+    new_items: int
+    p50: float
+    p99: float
+    # the process's resident set high-water mark in bytes, None where it can't be read
+    peak_rss: int | None
+    # the Python heap high-water mark in bytes, with --trace-memory
+    peak_traced: int | None
+
+    @property
+    def fetches_per_second(self) -> float:
+        return self.fetches / self.seconds if self.seconds else 0.0
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """The nearest-rank percentile of values, 0 for none"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss() -> int | None:
+    if resource is None:
+        return None
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def serve(count: int, profile: FeedProfile, seed: int, connection: Connection) -> None:
+    """Runs in the server process: serves the feeds until the connection says stop"""
+    with FeedServer(record_requests=False) as server:
+        connection.send(server.add_simulated_feeds(count, profile, seed))
+        connection.recv()
+        connection.send(dict(server.statuses))
+
+
+def run_round(index: int, reader: RssFeedReaderService, fetcher: TimedFetcher, trace: bool) -> RoundResult:
+    if trace:
+        tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        results = reader.refresh()
+        seconds = time.perf_counter() - started
+        peak_traced = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    latencies = fetcher.take_latencies()
+    stats = reader.last_refresh
+    return RoundResult(
+        round=index,
+        fetches=len(results),
+        seconds=seconds,
+        ok=stats.ok,
+        not_modified=stats.not_modified,
+        failed=stats.failed,
+        new_items=sum(result.new_items for result in results),
+        p50=percentile(latencies, 0.50),
+        p99=percentile(latencies, 0.99),
+        peak_rss=peak_rss(),
+        peak_traced=peak_traced,
+    )
+
+
+def megabytes(size: int | None) -> str:
+    return "-" if size is None else f"{size / 2**20:.1f}"
+
+
+def report_stages(sink: InMemoryMetricsSink) -> None:
+    print(f"{'stage':<8} {'count':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9}")
+    for stage in STAGES:
+        stats = sink.get_span(stage)
+        if stats is not None:
+            print(
+                f"{stage:<8} {stats.count:>8} {stats.total:>9.2f} "
+                f"{stats.mean * 1000:>9.2f} {stats.max * 1000:>9.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=2_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=None, help="run rounds for this many seconds instead")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--churn", type=float, default=0.2)
+    parser.add_argument("--new-items", type=int, default=2)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--oversize-rate", type=float, default=0.001)
+    parser.add_argument("--oversize-bytes", type=int, default=5 * 2**20)
+    parser.add_argument("--atom", type=float, default=0.3)
+    parser.add_argument("--no-etags", action="store_true")
+    parser.add_argument("--storage", choices=sorted(STORAGES), default="pickle")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--parse-workers", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-memory", action="store_true", help="also trace the Python heap, slowing the rounds")
+    parser.add_argument("--metrics", type=Path, default=None, help="write the refresh metrics to this file")
+    args = parser.parse_args()
+
+    profile = FeedProfile(
+        items=args.items,
+        churn=args.churn,
+        new_items=args.new_items,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        etags=not args.no_etags,
+        oversize_rate=args.oversize_rate,
+        oversize_bytes=args.oversize_bytes,
+        atom=args.atom,
+    )
+    connection, server_connection = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=serve, args=(args.feeds, profile, args.seed, server_connection), daemon=True
+    )
+    server.start()
+    try:
+        feeds: list[Feed] = connection.recv()
+        with tempfile.TemporaryDirectory(prefix="py-feed-reader-load-") as workdir:
+            settings = use_directory(Path(workdir))
+            write_opml(settings.opml_file_path, feeds)
+            # every simulated feed is on one host, which the per-host limit would serialize
+            fetcher = TimedFetcher(
+                FetchSettings(
+                    max_concurrency=args.concurrency,
+                    per_host_limit=args.concurrency,
+                    parse_workers=args.parse_workers,
+                )
+            )
+            sink = InMemoryMetricsSink() if args.metrics is not None else None
+            reader = RssFeedReaderService(
+                STORAGES[args.storage](),
+                OPMLFeedService(),
+                fetcher=fetcher,
+                state_service=JsonFeedStateService(),
+                metrics=sink,
+            )
+            print(f"{args.feeds:,} feeds, {profile}")
+            print(
+                f"{'round':>5} {'fetches/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'ok':>6} {'304':>6} "
+                f"{'failed':>6} {'new':>7} {'rss MiB':>8} {'heap MiB':>8}"
+            )
+            results: list[RoundResult] = []
+            started = time.perf_counter()
+            try:
+                while (
+                    len(results) < args.rounds
+                    if args.duration is None
+                    else time.perf_counter() - started < args.duration
+                ):
+                    result = run_round(len(results) + 1, reader, fetcher, args.trace_memory)
+                    results.append(result)
+                    print(
+                        f"{result.round:>5} {result.fetches_per_second:>10,.0f} {result.p50 * 1000:>8.1f} "
+                        f"{result.p99 * 1000:>8.1f} {result.ok:>6} {result.not_modified:>6} {result.failed:>6} "
+                        f"{result.new_items:>7} {megabytes(result.peak_rss):>8} {megabytes(result.peak_traced):>8}"
+                    )
+            finally:
+                reader.close()
+        fetches = sum(result.fetches for result in results)
+        seconds = sum(result.seconds for result in results)
+        if seconds:
+            print(f"total {fetches:,} fetches in {seconds:.1f} s, {fetches / seconds:,.0f} fetches/s")
+        if sink is not None:
+            report_stages(sink)
+            args.metrics.write_text(to_prometheus_text(sink))
+        connection.send(None)
+        print(f"server responses by status: {dict(sorted(connection.recv().items()))}")
+    finally:
+        server.join(timeout=10)
+        if server.is_alive():
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
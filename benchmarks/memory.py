@@ -0,0 +1,54 @@
+"""Compares the memory held by stored items as a FeedItem list and in the columnar store
+
+Usage:
+    python -m benchmarks.memory [--items 1000000]
+"""
+
+import argparse
+import gc
+import pickle
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.run import use_directory
+from benchmarks.synthetic import make_items
+from core.services.rss.columnar import ColumnarRssStorageService
+
+
+def traced(load) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = load()
+        size = tracemalloc.get_traced_memory()[0]
+        del value
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        use_directory(Path(workdir))
+        items = make_items(args.items)
+        data = pickle.dumps(items)
+        store = ColumnarRssStorageService()
+        with store.batch():
+            store.store_feed_items(items)
+        store.close()
+        del items, store
+
+        as_list = traced(lambda: pickle.loads(data))
+        columnar = traced(ColumnarRssStorageService)
+    print(f"{args.items} items")
+    print(f"{'list':<10} {as_list / 1e6:>10.1f} MB {as_list / args.items:>8.0f} B/item")
+    print(f"{'columnar':<10} {columnar / 1e6:>10.1f} MB {columnar / args.items:>8.0f} B/item {as_list / columnar:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
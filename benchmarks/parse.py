@@ -0,0 +1,64 @@
+"""Measures feed parsing throughput in process and with a growing parsing process pool
+
+Usage:
+    python -m benchmarks.parse [--feeds 64] [--entries 200] [--workers 0,1,2,4] [--repeat 3]
+"""
+
+import argparse
+from concurrent.futures import wait
+import os
+import time
+from xml.sax.saxutils import escape
+
+from benchmarks.synthetic import make_entries
+from core.services.rss.parse import FeedParser
+
+
+def make_document(feed: int, entries: int) -> bytes:
+    """A large RSS document with HTML summaries, which feedparser has to sanitize"""
+    items = "".join(
+        f"<item><guid>{escape(entry['id'])}</guid><title>{escape(entry['title'])}</title>"
+        f"<link>{escape(entry['link'])}</link><pubDate>{entry['published']}</pubDate>"
+        f"<description>{escape('<p>' + entry['summary'] + '</p><script>x()</script>')}</description></item>"
+        for entry in make_entries(entries, feed)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Feed {feed}</title><link>http://feed-{feed}.example.com/</link>{items}"
+        "</channel></rss>"
+    ).encode("utf-8")
+
+
+def measure(parser: FeedParser, documents: list[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        wait([parser.submit(document) for document in documents])
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=64)
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--workers", default="0,1,2,4")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = [make_document(feed, args.entries) for feed in range(args.feeds)]
+    size = sum(len(document) for document in documents)
+    print(f"{args.feeds} feeds x {args.entries} entries ({size / 1e6:.1f} MB), {os.cpu_count()} cpus")
+    baseline = None
+    for workers in (int(count) for count in args.workers.split(",")):
+        with FeedParser(workers) as feed_parser:
+            # start the pool before timing
+            feed_parser.submit(documents[0]).result()
+            best = measure(feed_parser, documents, args.repeat)
+        baseline = baseline or best
+        label = "in process" if workers <= 0 else f"{workers} workers"
+        print(f"{label:<14} {best * 1000:>10.1f} ms {args.feeds / best:>10.1f} feeds/s {baseline / best:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
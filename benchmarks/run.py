@@ -0,0 +1,266 @@
+"""Runs the ingestion, storage and OPML benchmarks and writes the timings as JSON
+
+Usage:
+    python -m benchmarks.run [--scales 10,1000,100000] [--repeat 3] [--only NAME ...]
+                             [--output results.json] [--compare baseline.json]
+
+Every case is set up from scratch in a temporary directory before each
+repetition and only the measured call is timed. Results from two commits can
+be compared with --compare.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+from pathlib import Path
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.synthetic import make_entries, make_feeds, make_items, write_opml
+from core.config.common import config
+from core.config.file import FileStorageSettings
+from core.models.feed import Feed, FeedItem
+from core.services.feed.opml import OPMLFeedService
+from core.services.rss.file import RssReaderStorage
+from core.services.rss.pickle import PickleRssStorageService
+from core.services.rss.reader import RssFeedReaderService, create_feed_item_from_entry
+from fixtures.feed_server import CannedFeed, FeedServer, make_rss
+
+DEFAULT_SCALES: tuple[int, ...] = (10, 1_000, 100_000)
+# HTTP cases are capped, thousands of local sockets measure the OS more than the reader
+MAX_HTTP_FEEDS: int = 1_000
+ITEMS_PER_FEED: int = 10
+OPML_ADDS: int = 10
+MAX_LOOKUPS: int = 10_000
+
+# a case gets (scale, working directory) and returns the call to time and how many operations it performs
+Case = Callable[[int, Path], tuple[Callable[[], object], int]]
+CASES: dict[str, Case] = {}
+# teardown registered by the case being measured, run after each repetition
+CLEANUPS: list[Callable[[], None]] = []
+
+
+@dataclass(slots=True)
+class BenchmarkResult:
+    name: str
+    scale: int
+    operations: int
+    best: float
+    mean: float
+    repeat: int
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.operations / self.best if self.best else 0.0
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result["operationsPerSecond"] = self.operations_per_second
+        return result
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(function: Case) -> Case:
+        CASES[name] = function
+        return function
+
+    return register
+
+
+def use_directory(workdir: Path) -> FileStorageSettings:
+    settings = FileStorageSettings()
+    settings.file_path = workdir / "file-settings.json"
+    settings.storage_file_path = workdir / "feed-items"
+    settings.opml_file_path = workdir / "feeds.opml"
+    settings.state_file_path = workdir / "feed-state.json"
+    config.set_config(FileStorageSettings, settings)
+    return settings
+
+
+def split_incoming(scale: int) -> tuple[list[FeedItem], list[FeedItem]]:
+    """Stored items plus an incoming batch that is half duplicates, half new"""
+    batch = max(scale // 10, 1)
+    items = make_items(scale + batch)
+    stored = items[:scale]
+    incoming = stored[: batch // 2] + items[scale : scale + batch - batch // 2]
+    return stored, incoming
+
+
+@case("create_feed_item_from_entry")
+def convert_entries(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    entries = make_entries(scale)
+
+    def run() -> None:
+        for entry in entries:
+            create_feed_item_from_entry(entry, "http://feed-0.example.com/rss.xml")
+
+    return run, scale
+
+
+@case("store_feed_items[pickle]")
+def store_pickle(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    settings = use_directory(workdir)
+    stored, incoming = split_incoming(scale)
+    settings.storage_file_path.write_bytes(pickle.dumps(stored))
+    storage = PickleRssStorageService()
+    return (lambda: storage.store_feed_items(incoming)), len(incoming)
+
+
+@case("store_feed_items[json]")
+def store_json(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    settings = use_directory(workdir)
+    stored, incoming = split_incoming(scale)
+    settings.storage_file_path.write_text(FeedItem.list_to_json(stored))
+    storage = RssReaderStorage()
+    return (lambda: storage.store_feed_items(incoming)), len(incoming)
+
+
+@case("OPMLFeedService.add_feed")
+def opml_add_feed(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    settings = use_directory(workdir)
+    write_opml(settings.opml_file_path, make_feeds(scale))
+    feed_service = OPMLFeedService()
+    new_feeds = [
+        Feed(title=f"New {index}", url=f"http://new-{index}/rss.xml", html_url="", category="new")
+        for index in range(OPML_ADDS)
+    ]
+
+    def run() -> None:
+        for feed in new_feeds:
+            feed_service.add_feed(feed)
+
+    return run, len(new_feeds)
+
+
+@case("OPMLFeedService.get_feed")
+def opml_get_feed(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    settings = use_directory(workdir)
+    feeds = make_feeds(scale)
+    write_opml(settings.opml_file_path, feeds)
+    feed_service = OPMLFeedService()
+    step = max(scale // MAX_LOOKUPS, 1)
+    urls = [feed.url for feed in feeds[::step]]
+
+    def run() -> None:
+        for url in urls:
+            feed_service.get_feed(url)
+
+    return run, len(urls)
+
+
+@case("RssFeedReaderService.get_items")
+def get_items_stored(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    settings = use_directory(workdir)
+    write_opml(settings.opml_file_path, make_feeds(min(scale, MAX_HTTP_FEEDS)))
+    settings.storage_file_path.write_bytes(pickle.dumps(make_items(scale)))
+    reader = RssFeedReaderService(PickleRssStorageService(), OPMLFeedService())
+    return reader.get_items, scale
+
+
+@case("RssFeedReaderService.refresh[http]")
+def refresh_http(scale: int, workdir: Path) -> tuple[Callable[[], object], int]:
+    settings = use_directory(workdir)
+    feed_count = min(scale, MAX_HTTP_FEEDS)
+    server = FeedServer()
+    feeds: list[Feed] = []
+    for index in range(feed_count):
+        body = make_rss(
+            f"Feed {index}",
+            [(f"{index}-{item}", f"Item {item}") for item in range(ITEMS_PER_FEED)],
+        )
+        url = server.add_feed(f"/{index}.xml", CannedFeed(body))
+        feeds.append(Feed(title=f"Feed {index}", url=url, html_url="", category="bench"))
+    write_opml(settings.opml_file_path, feeds)
+    reader = RssFeedReaderService(PickleRssStorageService(), OPMLFeedService())
+    server.start()
+    CLEANUPS.append(server.stop)
+    return reader.refresh, feed_count
+
+
+def measure(name: str, scale: int, repeat: int) -> BenchmarkResult:
+    timings: list[float] = []
+    operations = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="py-feed-reader-bench-") as workdir:
+            try:
+                run, operations = CASES[name](scale, Path(workdir))
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            finally:
+                while CLEANUPS:
+                    CLEANUPS.pop()()
+    return BenchmarkResult(
+        name=name,
+        scale=scale,
+        operations=operations,
+        best=min(timings),
+        mean=sum(timings) / len(timings),
+        repeat=repeat,
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[BenchmarkResult], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    previous = {(r["name"], r["scale"]): r for r in baseline["results"]}
+    print(f"\ncompared with {baseline['meta'].get('commit') or baseline_path}")
+    for result in results:
+        before = previous.get((result.name, result.scale))
+        if before is None:
+            continue
+        ratio = before["best"] / result.best if result.best else float("inf")
+        print(f"{result.name:<40} {result.scale:>8,} {ratio:>8.2f}x {'faster' if ratio >= 1 else 'slower'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=sorted(CASES), default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    names = args.only or list(CASES)
+    results: list[BenchmarkResult] = []
+    print(f"{'benchmark':<40} {'scale':>8} {'best':>12} {'ops/s':>14}")
+    for name in names:
+        for scale in scales:
+            result = measure(name, scale, args.repeat)
+            results.append(result)
+            print(
+                f"{name:<40} {scale:>8,} {result.best * 1000:>9.2f} ms {result.operations_per_second:>14,.0f}"
+            )
+    if args.output is not None:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "timestamp": time.time(),
+                "repeat": args.repeat,
+            },
+            "results": [result.to_dict() for result in results],
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compares opening the pickle store with opening the memory-mapped store
+
+Usage:
+    python -m benchmarks.startup [--scales 1000,100000,1000000] [--repeat 3]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.run import use_directory
+from benchmarks.synthetic import make_items
+from core.interfaces.rss import IRssStorageService
+from core.models.query import ItemQuery
+from core.services.rss.mapped import MappedRssStorageService
+from core.services.rss.pickle import PickleRssStorageService
+from core.services.rss.query import filter_items
+
+PAGE = ItemQuery(limit=50)
+
+
+def first_page(storage: IRssStorageService) -> list:
+    if isinstance(storage, MappedRssStorageService):
+        return list(storage.query_items(PAGE))
+    return filter_items(storage.get_stored_items(), PAGE)
+
+
+def measure(open_storage: Callable[[], IRssStorageService], repeat: int) -> tuple[float, float]:
+    opened = paged = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        storage = open_storage()
+        middle = time.perf_counter()
+        first_page(storage)
+        ended = time.perf_counter()
+        opened, paged = min(opened, middle - started), min(paged, ended - middle)
+        if isinstance(storage, MappedRssStorageService):
+            storage.close()
+    return opened, paged
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'store':<8} {'items':>9} {'open ms':>10} {'first page ms':>14}")
+    for scale in (int(count) for count in args.scales.split(",")):
+        with tempfile.TemporaryDirectory() as workdir:
+            use_directory(Path(workdir))
+            items = make_items(scale)
+            pickled = PickleRssStorageService()
+            pickled.store_feed_items(items)
+            mapped_path = Path(workdir) / "feed-items.map"
+            mapped = MappedRssStorageService(mapped_path)
+            mapped.store_feed_items(items)
+            mapped.close()
+            del items, pickled, mapped
+
+            for name, open_storage in (
+                ("pickle", PickleRssStorageService),
+                ("mapped", lambda: MappedRssStorageService(mapped_path)),
+            ):
+                opened, paged = measure(open_storage, args.repeat)
+                print(f"{name:<8} {scale:>9} {opened * 1000:>10.2f} {paged * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Deterministic synthetic data for the benchmarks: feedparser-style entries, items and OPML"""
+
+from datetime import timedelta
+from email.utils import format_datetime
+from pathlib import Path
+import random
+from typing import Any
+from xml.etree.ElementTree import tostring
+
+from core.models.feed import Feed, FeedItem
+from core.services.feed.opml import OPMLFeedService, get_empty_opml
+from core.utilities.datetime import DateTime, UTC
+
+EPOCH = DateTime(2024, 1, 1, tzinfo=UTC)
+WORDS: tuple[str, ...] = (
+    "python", "feed", "reader", "release", "notes", "weekly", "digest", "update",
+    "security", "performance", "storage", "parser", "async", "index", "cache", "news",
+)
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_entries(count: int, feed: int = 0, seed: int = 1) -> list[dict[str, Any]]:
+    """Entries shaped like feedparser's FeedParserDict entries"""
+    rng = random.Random(seed + feed)
+    entries: list[dict[str, Any]] = []
+    for index in range(count):
+        published = EPOCH + timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+        link = f"http://feed-{feed}.example.com/posts/{index}"
+        entries.append(
+            {
+                "id": link,
+                "title": make_text(rng, 8),
+                "summary": make_text(rng, 60),
+                "link": link,
+                "published": format_datetime(published),
+                "published_parsed": published.utctimetuple(),
+                "media_thumbnail": [{"url": f"{link}/thumb.png"}],
+            }
+        )
+    return entries
+
+
+def make_items(count: int, feeds: int = 100, seed: int = 1) -> list[FeedItem]:
+    rng = random.Random(seed)
+    items: list[FeedItem] = []
+    for index in range(count):
+        feed = index % feeds
+        link = f"http://feed-{feed}.example.com/posts/{index}"
+        items.append(
+            FeedItem(
+                id=link,
+                title=make_text(rng, 8),
+                summary=make_text(rng, 60),
+                images=[f"{link}/thumb.png"],
+                link=link,
+                published=EPOCH + timedelta(minutes=rng.randrange(0, 365 * 24 * 60)),
+                feed_url=feed_url(feed),
+                read=rng.random() < 0.5,
+                created=EPOCH,
+            )
+        )
+    return items
+
+
+def feed_url(feed: int, base_url: str = "http://feed-{feed}.example.com") -> str:
+    return f"{base_url.format(feed=feed)}/rss.xml"
+
+
+def make_feeds(count: int, categories: int = 20) -> list[Feed]:
+    return [
+        Feed(
+            title=f"Feed {index}",
+            url=feed_url(index),
+            html_url=f"http://feed-{index}.example.com/",
+            category=f"category-{index % categories}",
+        )
+        for index in range(count)
+    ]
+
+
+def write_opml(file_path: Path, feeds: list[Feed]) -> Path:
+    """Writes feeds straight into an OPML file, without going through add_feed"""
+    document = get_empty_opml(DateTime.utcnow_timestamp())
+    outlines = "\n".join(
+        tostring(OPMLFeedService.create_element_from_feed(feed), encoding="unicode")
+        for feed in feeds
+    )
+    file_path.write_text(document.replace("    <body>\n", f"    <body>\n{outlines}\n"))
+    return file_path
+
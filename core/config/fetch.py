@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+
+from core.constants.common import APPLICATION_NAME
+from core.mixins.dataclasses_json import CamelCaseJsonMixin
+
+DEFAULT_USER_AGENT: str = f"{APPLICATION_NAME}/1.0"
+
+
+@dataclass(slots=True)
+class FetchSettings(CamelCaseJsonMixin):
+    max_concurrency: int = 16
+    per_host_limit: int = 2
+    timeout: float = 30.0
+    user_agent: str = DEFAULT_USER_AGENT
+    # 0 parses in the refreshing thread, otherwise the size of the parsing process pool
+    parse_workers: int = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(max_concurrency={self.max_concurrency},per_host_limit={self.per_host_limit},timeout={self.timeout},parse_workers={self.parse_workers})"
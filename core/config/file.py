@@ -9,11 +9,21 @@ SETTINGS_FILE_NAME: str = "file-settings.json"
 JSON_STORAGE_NAME: str = "feed-items.json"
 OPML_FILE_NAME: str = "feeds.opml"
 PICKLE_STORAGE_NAME: str = "feed-items.pickle"
+APPEND_LOG_STORAGE_NAME: str = "feed-items.log"
+SQLITE_STORAGE_NAME: str = "feed-items.db"
+MAPPED_STORAGE_NAME: str = "feed-items.map"
+FEED_STATE_NAME: str = "feed-state.json"
+ARCHIVE_DIRECTORY_NAME: str = "archive"
 
 DEFAULT_SETTINGS_PATH: Path = APPLICATION_DIRECTORY / SETTINGS_FILE_NAME
 DEFAULT_JSON_STORAGE_PATH: Path = APPLICATION_DIRECTORY / JSON_STORAGE_NAME
 DEFAULT_OPML_PATH: Path = APPLICATION_DIRECTORY / OPML_FILE_NAME
 DEFAULT_PICKLE_STORAGE_PATH: Path = APPLICATION_DIRECTORY / PICKLE_STORAGE_NAME
+DEFAULT_APPEND_LOG_STORAGE_PATH: Path = APPLICATION_DIRECTORY / APPEND_LOG_STORAGE_NAME
+DEFAULT_SQLITE_STORAGE_PATH: Path = APPLICATION_DIRECTORY / SQLITE_STORAGE_NAME
+DEFAULT_MAPPED_STORAGE_PATH: Path = APPLICATION_DIRECTORY / MAPPED_STORAGE_NAME
+DEFAULT_FEED_STATE_PATH: Path = APPLICATION_DIRECTORY / FEED_STATE_NAME
+DEFAULT_ARCHIVE_PATH: Path = APPLICATION_DIRECTORY / ARCHIVE_DIRECTORY_NAME
 
 
 @dataclass(slots=True)
@@ -28,6 +38,15 @@ class FileStorageSettings(CamelCaseJsonMixin):
     def storage_file_path(self, storage_file: Path | str):
         self.storage_file = str(storage_file)
 
+    @property
+    def state_file_path(self) -> Path:
+        """the path to the feed validator state file"""
+        return Path(self.state_file)
+
+    @state_file_path.setter
+    def state_file_path(self, state_file_path: str | Path):
+        self.state_file = str(state_file_path)
+
     @property
     def file_path(self) -> Path:
         """the path to this file"""
@@ -49,6 +68,42 @@ class FileStorageSettings(CamelCaseJsonMixin):
     file: str = str(DEFAULT_SETTINGS_PATH)
     storage_file: str = str(DEFAULT_JSON_STORAGE_PATH)
     opml_file: str = str(DEFAULT_OPML_PATH)
+    state_file: str = str(DEFAULT_FEED_STATE_PATH)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(file_path="{self.file_path.as_posix()}",storage_file_path="{self.storage_file_path.as_posix()}",opml_file_path="{self.opml_file_path.as_posix()}",state_file_path="{self.state_file_path.as_posix()}")'
+
+
+@dataclass(slots=True)
+class RetentionSettings(CamelCaseJsonMixin):
+    """Which stored items the compaction job removes; None turns a rule off
+
+    An item's age is taken from its published date, or from when it was stored
+    if it has none.
+    """
+
+    @property
+    def archive_directory_path(self) -> Path:
+        """the directory holding archived item segments"""
+        return Path(self.archive_directory)
+
+    @archive_directory_path.setter
+    def archive_directory_path(self, archive_directory: Path | str):
+        self.archive_directory = str(archive_directory)
+
+    # remove any item older than this many days
+    max_age_days: float | None = None
+    # keep only this many of the newest items of each feed
+    max_items_per_feed: int | None = None
+    # remove read items older than this many days
+    read_max_age_days: float | None = None
+    # move removed items to compressed archive segments instead of discarding them
+    archive: bool = True
+    archive_directory: str = str(DEFAULT_ARCHIVE_PATH)
+    # seconds between compaction runs of the polling scheduler
+    compaction_interval: float = 24 * 60 * 60
+    # forget a removed item once its feed has not listed it for this many days
+    forget_removed_days: float = 30
 
     def __repr__(self) -> str:
-        return f'{self.__class__.__name__}(file_path="{self.file_path.as_posix()}",storage_file_path="{self.storage_file_path.as_posix()}",opml_file_path="{self.opml_file_path.as_posix()}")'
+        return f'{self.__class__.__name__}(max_age_days={self.max_age_days},max_items_per_feed={self.max_items_per_feed},read_max_age_days={self.read_max_age_days},archive={self.archive},archive_directory_path="{self.archive_directory_path.as_posix()}")'
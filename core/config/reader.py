@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+from core.mixins.dataclasses_json import CamelCaseJsonMixin
+
+
+@dataclass(slots=True)
+class ReaderSettings(CamelCaseJsonMixin):
+    # return stored items straight away and refresh their feeds in the background
+    stale_while_revalidate: bool = False
+    # seconds before reading the same feeds again starts another background refresh
+    revalidate_interval: float = 300.0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(stale_while_revalidate={self.stale_while_revalidate},revalidate_interval={self.revalidate_interval})"
@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+
+from core.mixins.dataclasses_json import CamelCaseJsonMixin
+
+MINUTE: int = 60
+HOUR: int = 60 * MINUTE
+DAY: int = 24 * HOUR
+
+
+@dataclass(slots=True)
+class SchedulerSettings(CamelCaseJsonMixin):
+    """Polling intervals are in seconds"""
+
+    min_interval: float = 5 * MINUTE
+    default_interval: float = 30 * MINUTE
+    max_interval: float = DAY
+    backoff_factor: float = 1.5
+    error_interval: float = 10 * MINUTE
+    max_error_interval: float = DAY
+    jitter: float = 0.1
+    sync_interval: float = MINUTE
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(min_interval={self.min_interval},default_interval={self.default_interval},max_interval={self.max_interval})"
@@ -0,0 +1,20 @@
+METRIC_PREFIX: str = "feed_reader_"
+
+# stages of a refresh, timed as spans
+READ: str = "read"
+PARSE: str = "parse"
+CONVERT: str = "convert"
+DEDUPE: str = "dedupe"
+SAVE: str = "save"
+
+# per-feed counters
+FETCHED_BYTES: str = "fetched_bytes"
+ENTRIES: str = "entries"
+NEW_ITEMS: str = "new_items"
+RESPONSES: str = "responses"
+
+# labels
+FEED: str = "feed"
+STATUS: str = "status"
+# the status label of a fetch that got no response
+NO_RESPONSE: str = "error"
@@ -1,4 +1,6 @@
 OUTLINE_TAG: str = "outline"
+HEAD_TAG: str = "head"
+BODY_TAG: str = "body"
 CATEGORY: str = "category"
 DISABLED: str = "isComment"
 HTML_URL: str = "htmlUrl"
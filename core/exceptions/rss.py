@@ -23,3 +23,50 @@ class RssFeedNotFoundError(BaseError):
     @property
     def message(self) -> str:
         return f"'{self.feed_url}' was not found!"
+
+
+class InvalidCursorError(BaseError):
+    cursor: str
+
+    def __init__(self, cursor: str, *args):
+        super().__init__(args)
+        self.cursor = cursor
+
+    @property
+    def message(self) -> str:
+        return f"'{self.cursor}' is not a valid cursor!"
+
+
+class FeedParseError(BaseError):
+    feed_url: str
+    reason: str
+
+    def __init__(self, feed_url: str, reason: str, *args):
+        super().__init__(args)
+        self.feed_url = feed_url
+        self.reason = reason
+
+    @property
+    def message(self) -> str:
+        return f"'{self.feed_url}' could not be parsed: {self.reason}"
+
+
+class StorageFormatError(BaseError):
+    file_path: str
+    reason: str
+
+    def __init__(self, file_path: str, reason: str, *args):
+        super().__init__(args)
+        self.file_path = file_path
+        self.reason = reason
+
+    @property
+    def message(self) -> str:
+        return f"'{self.file_path}' is not a readable item store: {self.reason}"
+
+
+class StaleItemError(BaseError):
+
+    @property
+    def message(self) -> str:
+        return "the stored item was removed, or moved by more than one removal since it was read"
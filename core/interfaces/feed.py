@@ -1,6 +1,6 @@
 from abc import ABC, ABCMeta, abstractmethod
 
-from core.models.feed import Feed
+from core.models.feed import Feed, FeedState
 
 
 class IFeedService(ABC, metaclass=ABCMeta):
@@ -88,3 +88,27 @@ class IFeedService(ABC, metaclass=ABCMeta):
     @abstractmethod
     def disabled_feed_exists(self, feed: Feed) -> bool:
         pass
+
+
+class IFeedStateService(ABC, metaclass=ABCMeta):
+
+    @abstractmethod
+    def get_state(self, xml_url: str) -> FeedState | None:
+        """Returns the stored validator state for a feed
+
+        Args:
+            xml_url (str): the xml_url of the feed
+
+        Returns:
+            FeedState | None: the stored state, or None if the feed was never fetched
+        """
+        pass
+
+    @abstractmethod
+    def set_states(self, states: list[FeedState]) -> None:
+        """Stores the validator state for multiple feeds
+
+        Args:
+            states (list[FeedState]): the states to be stored, replacing any previous state per url
+        """
+        pass
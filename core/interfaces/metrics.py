@@ -0,0 +1,61 @@
+from abc import ABC, ABCMeta, abstractmethod
+from contextlib import AbstractContextManager
+import time
+
+# label (name, value) pairs, a tuple so it can key a series
+Labels = tuple[tuple[str, str], ...]
+
+
+class IMetricsSink(ABC, metaclass=ABCMeta):
+    """Receives the timings and counts of the refresh pipeline
+
+    Callers check enabled before doing work that only feeds the sink, such as
+    building per-feed labels, so a disabled sink costs next to nothing.
+    """
+
+    enabled: bool = True
+
+    @abstractmethod
+    def observe(self, name: str, seconds: float, labels: Labels = ()) -> None:
+        """Records how long one run of a stage took
+
+        Args:
+            name (str): the stage, such as "parse"
+            seconds (float): the duration
+            labels (Labels, optional): the series' labels. Defaults to ().
+        """
+        pass
+
+    @abstractmethod
+    def increment(self, name: str, value: float = 1, labels: Labels = ()) -> None:
+        """Adds to a counter
+
+        Args:
+            name (str): the counter, such as "fetched_bytes"
+            value (float, optional): the amount to add. Defaults to 1.
+            labels (Labels, optional): the series' labels. Defaults to ().
+        """
+        pass
+
+    def span(self, name: str, labels: Labels = ()) -> AbstractContextManager:
+        """Times the body of a with statement as one run of a stage"""
+        return Span(self, name, labels)
+
+
+class Span(AbstractContextManager):
+    """Observes the time spent inside a with statement, whether or not it raised"""
+
+    __slots__ = ("sink", "name", "labels", "started")
+
+    def __init__(self, sink: IMetricsSink, name: str, labels: Labels = ()):
+        self.sink = sink
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self) -> Span:
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.sink.observe(self.name, time.perf_counter() - self.started, self.labels)
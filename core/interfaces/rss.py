@@ -1,6 +1,11 @@
 from abc import ABC, ABCMeta, abstractmethod
+from typing import AsyncIterator, Iterator
 
+from core.models.counters import UnreadSummary
 from core.models.feed import Feed, FeedItem
+from core.models.query import ItemPage, ItemQuery
+from core.models.refresh import FeedRefreshResult
+from core.utilities.datetime import DateTime
 
 
 class IRssReaderService(ABC, metaclass=ABCMeta):
@@ -10,7 +15,7 @@ class IRssReaderService(ABC, metaclass=ABCMeta):
         category: str | None = None,
         exclude_read: bool = True,
     ) -> list[FeedItem]:
-        """Retrieves feed items optionally filtered by read status and/or category
+        """Retrieves stored feed items optionally filtered by read status and/or category
 
         Args:
             category (str | None, optional): category retrieve items from. Defaults to None.
@@ -26,17 +31,114 @@ class IRssReaderService(ABC, metaclass=ABCMeta):
 
     @abstractmethod
     def get_feed_items(self, feed: Feed, exclude_read: bool = True) -> list[FeedItem]:
-        """Retrieves items from the specified feed
+        """Retrieves stored items from the specified feed
 
         Args:
             feed (Feed): the feed to retrieve items for
             exclude_read (bool, optional): set to False to include previously read items. Defaults to True.
 
+        Returns:
+            list[FeedItem]: the feed's stored items
+        """
+        pass
+
+    @abstractmethod
+    def get_unread_summary(self) -> UnreadSummary:
+        """Counts unread items overall, per feed and per category, without fetching any feed
+
+        Returns:
+            UnreadSummary: the unread counts
+        """
+        pass
+
+    @abstractmethod
+    def mark_feed_read(self, feed: Feed, before: DateTime | None = None) -> int:
+        """Marks the stored unread items of a feed read
+
+        Args:
+            feed (Feed): the feed to mark read
+            before (DateTime | None, optional): only mark items dated before this time. Defaults to None.
+
+        Returns:
+            int: the number of items marked read
+        """
+        pass
+
+    @abstractmethod
+    def mark_all_read(self, category: str | None = None, before: DateTime | None = None) -> int:
+        """Marks stored unread items read, optionally only those in a category
+
+        Args:
+            category (str | None, optional): category to mark the items of. Defaults to None.
+            before (DateTime | None, optional): only mark items dated before this time. Defaults to None.
+
+        Raises:
+            CategoryDoesNotExistError: raised if the specified category could not be found
+
+        Returns:
+            int: the number of items marked read
+        """
+        pass
+
+    @abstractmethod
+    def refresh(self, category: str | None = None) -> list[FeedRefreshResult]:
+        """Fetches feeds, optionally only those in a category, and stores their new items
+
+        Args:
+            category (str | None, optional): category to refresh the feeds of. Defaults to None.
+
+        Raises:
+            CategoryDoesNotExistError: raised if the specified category could not be found
+
+        Returns:
+            list[FeedRefreshResult]: one result per feed, failures included
+        """
+        pass
+
+    @abstractmethod
+    def refresh_feed(self, feed: Feed) -> FeedRefreshResult:
+        """Fetches a single feed and stores its new items
+
+        Args:
+            feed (Feed): the feed to refresh
+
+        Raises:
+            FeedNotFoundError: raised if the feed could not be found
+
+        Returns:
+            FeedRefreshResult: the outcome of the refresh
+        """
+        pass
+
+    @abstractmethod
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        """Lazily yields stored feed items matching the query, in the query's order
+
+        Args:
+            query (ItemQuery): the filters, order, limit and cursor to apply
+
+        Raises:
+            CategoryDoesNotExistError: raised if the query's category could not be found
+            InvalidCursorError: raised if the query's cursor could not be decoded
+
+        Returns:
+            Iterator[FeedItem]: the matching feed items
+        """
+        pass
+
+    @abstractmethod
+    def get_page(self, query: ItemQuery) -> ItemPage:
+        """Retrieves one page of stored feed items matching the query
+
+        Args:
+            query (ItemQuery): the filters, order, page size (limit) and cursor to apply
+
         Raises:
-            RssFeedNotFoundError: raised if the Rss Feed could not be retrieved
+            CategoryDoesNotExistError: raised if the query's category could not be found
+            InvalidCursorError: raised if the query's cursor could not be decoded
 
         Returns:
-            FeedItem:
+            ItemPage: the page of items, with a cursor for the next page if there is one
         """
         pass
 
@@ -52,6 +154,18 @@ class IRssStorageService(ABC, metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        """Retrieves a single stored feed item
+
+        Args:
+            item_id (str): the id of the feed item
+
+        Returns:
+            FeedItem | None: the stored feed item, or None if it is not in storage
+        """
+        pass
+
     @abstractmethod
     def store_feed_item(self, item: FeedItem) -> None:
         """Add a feed item to storage
@@ -69,3 +183,259 @@ class IRssStorageService(ABC, metaclass=ABCMeta):
             items (list[FeedItem]): the feed items to be stored
         """
         pass
+
+    @abstractmethod
+    def update_feed_item(self, item: FeedItem) -> None:
+        """Update a stored feed item, storing it if it does not exist yet
+
+        Args:
+            item (FeedItem): the feed item with its updated values
+        """
+        pass
+
+    @abstractmethod
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        """Remove feed items from storage, ignoring ids that are not stored
+
+        Args:
+            item_ids (list[str]): the ids of the feed items to be removed
+        """
+        pass
+
+    @abstractmethod
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        """Set the read state of stored feed items, saving once for all of them
+
+        Args:
+            item_ids (list[str]): the ids of the feed items, ids that are not stored are ignored
+            read (bool, optional): the read state to set. Defaults to True.
+
+        Returns:
+            list[str]: the ids of the items whose read state changed
+        """
+        pass
+
+
+class IRssQueryService(ABC, metaclass=ABCMeta):
+    """Implemented by storage backends that can filter, sort and page items themselves"""
+
+    @abstractmethod
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        """Lazily yields stored feed items matching the query, in the query's order
+
+        The category is resolved by the reader, only feed_urls is applied here.
+
+        Args:
+            query (ItemQuery): the filters, order, limit and cursor to apply
+
+        Raises:
+            InvalidCursorError: raised if the query's cursor could not be decoded
+
+        Returns:
+            Iterator[FeedItem]: the matching feed items
+        """
+        pass
+
+
+class IAsyncRssReaderService(ABC, metaclass=ABCMeta):
+    """IRssReaderService for event loops, whose blocking I/O runs outside the loop"""
+
+    @abstractmethod
+    async def get_items(
+        self,
+        category: str | None = None,
+        exclude_read: bool = True,
+    ) -> list[FeedItem]:
+        """Retrieves stored feed items optionally filtered by read status and/or category
+
+        Args:
+            category (str | None, optional): category retrieve items from. Defaults to None.
+            exclude_read (bool, optional): set to False to include previously read items. Defaults to True.
+
+        Raises:
+            CategoryDoesNotExistError: raised if the specified category could not be found
+
+        Returns:
+            list[FeedItem]: the list of feed items
+        """
+        pass
+
+    @abstractmethod
+    async def get_feed_items(self, feed: Feed, exclude_read: bool = True) -> list[FeedItem]:
+        """Retrieves stored items from the specified feed
+
+        Args:
+            feed (Feed): the feed to retrieve items for
+            exclude_read (bool, optional): set to False to include previously read items. Defaults to True.
+
+        Returns:
+            list[FeedItem]: the feed's stored items
+        """
+        pass
+
+    @abstractmethod
+    async def get_unread_summary(self) -> UnreadSummary:
+        """Counts unread items overall, per feed and per category, without fetching any feed
+
+        Returns:
+            UnreadSummary: the unread counts
+        """
+        pass
+
+    @abstractmethod
+    async def mark_feed_read(self, feed: Feed, before: DateTime | None = None) -> int:
+        """Marks the stored unread items of a feed read
+
+        Args:
+            feed (Feed): the feed to mark read
+            before (DateTime | None, optional): only mark items dated before this time. Defaults to None.
+
+        Returns:
+            int: the number of items marked read
+        """
+        pass
+
+    @abstractmethod
+    async def mark_all_read(self, category: str | None = None, before: DateTime | None = None) -> int:
+        """Marks stored unread items read, optionally only those in a category
+
+        Args:
+            category (str | None, optional): category to mark the items of. Defaults to None.
+            before (DateTime | None, optional): only mark items dated before this time. Defaults to None.
+
+        Raises:
+            CategoryDoesNotExistError: raised if the specified category could not be found
+
+        Returns:
+            int: the number of items marked read
+        """
+        pass
+
+    @abstractmethod
+    async def refresh(self, category: str | None = None) -> list[FeedRefreshResult]:
+        """Fetches feeds, optionally only those in a category, and stores their new items
+
+        Concurrent calls share the refresh of any feed they have in common.
+
+        Args:
+            category (str | None, optional): category to refresh the feeds of. Defaults to None.
+
+        Raises:
+            CategoryDoesNotExistError: raised if the specified category could not be found
+
+        Returns:
+            list[FeedRefreshResult]: one result per feed, failures included
+        """
+        pass
+
+    @abstractmethod
+    async def refresh_feed(self, feed: Feed) -> FeedRefreshResult:
+        """Fetches a single feed and stores its new items, joining a refresh already under way
+
+        Args:
+            feed (Feed): the feed to refresh
+
+        Raises:
+            FeedNotFoundError: raised if the feed could not be found
+
+        Returns:
+            FeedRefreshResult: the outcome of the refresh
+        """
+        pass
+
+    @abstractmethod
+    def query_items(self, query: ItemQuery) -> AsyncIterator[FeedItem]:
+        """Lazily yields stored feed items matching the query, in the query's order
+
+        Args:
+            query (ItemQuery): the filters, order, limit and cursor to apply
+
+        Raises:
+            CategoryDoesNotExistError: raised if the query's category could not be found
+            InvalidCursorError: raised if the query's cursor could not be decoded
+
+        Returns:
+            AsyncIterator[FeedItem]: the matching feed items
+        """
+        pass
+
+    @abstractmethod
+    async def get_page(self, query: ItemQuery) -> ItemPage:
+        """Retrieves one page of stored feed items matching the query
+
+        Args:
+            query (ItemQuery): the filters, order, page size (limit) and cursor to apply
+
+        Raises:
+            CategoryDoesNotExistError: raised if the query's category could not be found
+            InvalidCursorError: raised if the query's cursor could not be decoded
+
+        Returns:
+            ItemPage: the page of items, with a cursor for the next page if there is one
+        """
+        pass
+
+
+class IAsyncRssStorageService(ABC, metaclass=ABCMeta):
+    """IRssStorageService for event loops, whose file and database I/O runs outside the loop"""
+
+    @abstractmethod
+    async def get_stored_items(self) -> list[FeedItem]:
+        """Retrieves all feed items currently in storage
+
+        Returns:
+            list[FeedItem]: the stored feed items
+        """
+        pass
+
+    @abstractmethod
+    async def get_stored_item(self, item_id: str) -> FeedItem | None:
+        """Retrieves a single stored feed item
+
+        Args:
+            item_id (str): the id of the feed item
+
+        Returns:
+            FeedItem | None: the stored feed item, or None if it is not in storage
+        """
+        pass
+
+    @abstractmethod
+    async def store_feed_items(self, items: list[FeedItem]) -> None:
+        """Add multiple feed items to storage
+
+        Args:
+            items (list[FeedItem]): the feed items to be stored
+        """
+        pass
+
+    @abstractmethod
+    async def update_feed_item(self, item: FeedItem) -> None:
+        """Update a stored feed item, storing it if it does not exist yet
+
+        Args:
+            item (FeedItem): the feed item with its updated values
+        """
+        pass
+
+    @abstractmethod
+    async def remove_feed_items(self, item_ids: list[str]) -> None:
+        """Remove feed items from storage, ignoring ids that are not stored
+
+        Args:
+            item_ids (list[str]): the ids of the feed items to be removed
+        """
+        pass
+
+    @abstractmethod
+    async def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        """Set the read state of stored feed items, saving once for all of them
+
+        Args:
+            item_ids (list[str]): the ids of the feed items, ids that are not stored are ignored
+            read (bool, optional): the read state to set. Defaults to True.
+
+        Returns:
+            list[str]: the ids of the items whose read state changed
+        """
+        pass
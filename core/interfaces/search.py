@@ -0,0 +1,38 @@
+from abc import ABC, ABCMeta, abstractmethod
+
+from core.models.feed import FeedItem
+from core.models.search import SearchResult
+
+
+class ISearchService(ABC, metaclass=ABCMeta):
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 20) -> list[SearchResult]:
+        """Finds stored feed items matching every keyword and quoted phrase in the query
+
+        Args:
+            query (str): keywords, with exact phrases in double quotes
+            limit (int, optional): the maximum number of results. Defaults to 20.
+
+        Returns:
+            list[SearchResult]: the matching items, best match first
+        """
+        pass
+
+    @abstractmethod
+    def index_items(self, items: list[FeedItem]) -> None:
+        """Adds items to the index, re-indexing any whose title or summary changed
+
+        Args:
+            items (list[FeedItem]): the feed items to be indexed
+        """
+        pass
+
+    @abstractmethod
+    def remove_items(self, item_ids: list[str]) -> None:
+        """Removes items from the index
+
+        Args:
+            item_ids (list[str]): the ids of the feed items to be removed
+        """
+        pass
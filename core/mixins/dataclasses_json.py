@@ -1,12 +1,28 @@
-import json
-from typing import Any, Type
+"""camelCase JSON for the dataclasses of this application
+
+dataclasses-json reflects over every field of every instance and, to decode,
+goes through a marshmallow schema. For a dataclass whose fields are plain
+JSON values or types with a registered encoder and decoder, such as DateTime
+and Path, CamelCaseJsonMixin instead generates a to_dict / from_dict pair the
+first time the class is converted. The generated functions read and build the
+same camelCase objects, and anything they do not cover, like nested
+dataclasses or per-field configuration, falls back to dataclasses-json.
+"""
+
+from dataclasses import MISSING, fields
 from pathlib import Path
+import types
+from typing import Any, Callable, Iterable, Iterator, Union, get_args, get_origin, get_type_hints
 
 from dataclasses_json import DataClassJsonMixin, LetterCase, config, global_config
 
+from core.utilities import json
 from core.utilities.datetime import DateTime
 
 DATACLASSES_JSON = "dataclasses_json"
+# types copied as they are between an object and its JSON
+JSON_TYPES: tuple[type, ...] = (str, int, float, bool, type(None))
+JSON_CONTAINERS: tuple[type, ...] = (list, dict)
 
 
 def to_iso_format(dt: DateTime | Any) -> str:
@@ -23,15 +39,144 @@ global_config.encoders[Path] = encode_path
 global_config.decoders[Path] = Path.from_uri
 
 
+class Codec:
+    """A generated to_dict / from_dict pair for one dataclass"""
+
+    encode: Callable[[Any], dict[str, Any]]
+    decode: Callable[[dict[str, Any]], Any]
+
+    def __init__(
+        self,
+        encode: Callable[[Any], dict[str, Any]],
+        decode: Callable[[dict[str, Any]], Any],
+    ):
+        self.encode = encode
+        self.decode = decode
+
+
+def _is_json_type(field_type: Any) -> bool:
+    if field_type in JSON_TYPES:
+        return True
+    if get_origin(field_type) in JSON_CONTAINERS:
+        return all(_is_json_type(argument) for argument in get_args(field_type))
+    return False
+
+
+def _optional_type(field_type: Any) -> tuple[Any, bool]:
+    """(the type, whether None is allowed) for T and T | None"""
+    if get_origin(field_type) in (Union, types.UnionType):
+        arguments = [argument for argument in get_args(field_type) if argument is not type(None)]
+        if len(arguments) == 1:
+            return arguments[0], True
+    return field_type, False
+
+
+def _convert(function: str | None, value: str, optional: bool) -> str:
+    """The expression converting value, None passing through when allowed"""
+    if function is None:
+        return value
+    if optional:
+        return f"(None if (value := {value}) is None else {function}(value))"
+    return f"{function}({value})"
+
+
+def compile_codec(cls: type) -> Codec | None:
+    """Generates the to_dict / from_dict functions of a dataclass
+
+    Args:
+        cls (type): a dataclass using CamelCaseJsonMixin
+
+    Returns:
+        Codec | None: the generated functions, or None if a field needs dataclasses-json
+    """
+    letter_case = cls.dataclass_json_config.get("letter_case")
+    hints = get_type_hints(cls)
+    namespace: dict[str, Any] = {"cls": cls}
+    encoded: list[str] = []
+    decoded: list[str] = []
+    for index, field in enumerate(fields(cls)):
+        if not field.init or DATACLASSES_JSON in field.metadata:
+            return None
+        key = letter_case(field.name) if letter_case is not None else field.name
+        field_type, optional = _optional_type(hints[field.name])
+        if _is_json_type(field_type):
+            encoder = decoder = None
+        elif field_type in global_config.encoders and field_type in global_config.decoders:
+            encoder, decoder = f"encode_{index}", f"decode_{index}"
+            namespace[encoder] = global_config.encoders[field_type]
+            namespace[decoder] = global_config.decoders[field_type]
+        else:
+            return None
+        encoded.append(f"{key!r}: {_convert(encoder, f'obj.{field.name}', optional)}")
+        # like dataclasses-json, the field's own name is read when the camelCase key is missing
+        if key == field.name:
+            value, present = f"kvs[{key!r}]", f"{key!r} in kvs"
+        else:
+            value = f"(kvs[{key!r}] if {key!r} in kvs else kvs[{field.name!r}])"
+            present = f"({key!r} in kvs or {field.name!r} in kvs)"
+        value = _convert(decoder, value, optional)
+        if field.default is not MISSING:
+            namespace[f"default_{index}"] = field.default
+            value = f"{value} if {present} else default_{index}"
+        elif field.default_factory is not MISSING:
+            namespace[f"default_{index}"] = field.default_factory
+            value = f"{value} if {present} else default_{index}()"
+        decoded.append(f"{field.name}={value}")
+    source = (
+        "def encode(obj):\n"
+        f"    return {{{', '.join(encoded)}}}\n"
+        "def decode(kvs):\n"
+        f"    return cls({', '.join(decoded)})\n"
+    )
+    exec(compile(source, f"<codec {cls.__qualname__}>", "exec"), namespace)
+    return Codec(namespace["encode"], namespace["decode"])
+
+
 class CamelCaseJsonMixin(DataClassJsonMixin):
     dataclass_json_config: dict = config(letter_case=LetterCase.CAMEL)[DATACLASSES_JSON]
 
+    @classmethod
+    def codec(cls: type[CamelCaseJsonMixin]) -> Codec | None:
+        """The generated functions of this class, compiled on first use"""
+        # looked up in the class's own dict, so every dataclass gets a codec of its own
+        if "_codec" not in cls.__dict__:
+            dataclass = next(base for base in cls.__mro__ if "__dataclass_fields__" in base.__dict__)
+            # a subclass that is not a dataclass itself, like a view, converts as its base
+            cls._codec = compile_codec(cls) if dataclass is cls else dataclass.codec()
+        return cls.__dict__["_codec"]
+
+    def to_dict(self, encode_json: bool = False) -> dict[str, Any]:
+        codec = type(self).codec()
+        if codec is None or encode_json:
+            return super().to_dict(encode_json)
+        return codec.encode(self)
+
+    @classmethod
+    def from_dict(
+        cls: type[CamelCaseJsonMixin], kvs: dict[str, Any], *, infer_missing: bool = False
+    ) -> Any:
+        codec = cls.codec()
+        if codec is None or infer_missing:
+            return super().from_dict(kvs, infer_missing=infer_missing)
+        return codec.decode(kvs)
+
+    @classmethod
+    def iter_to_json(cls: type[CamelCaseJsonMixin], iter: Iterable[CamelCaseJsonMixin]) -> bytes:
+        """Encodes objects as a UTF-8 JSON array, converting one object at a time"""
+        return json.dumps_array(i.to_dict() for i in iter)
+
+    @classmethod
+    def iter_from_json(cls: type[CamelCaseJsonMixin], json_data: bytes | str) -> Iterator[Any]:
+        """Decodes a JSON array lazily, building each object as its element is read"""
+        for i in json.iter_array(json_data):
+            yield cls.from_dict(i)
+
     @classmethod
     def list_to_json(
         cls: type[CamelCaseJsonMixin], iter: list[CamelCaseJsonMixin]
     ) -> str:
-        return json.dumps([i.to_dict() for i in iter])
+        return cls.iter_to_json(iter).decode("utf-8")
 
     @classmethod
     def json_to_list(cls: type[CamelCaseJsonMixin], json_string: str) -> list[Any]:
-        return [cls.from_dict(i) for i in json.loads(json_string)]
+        return list(cls.iter_from_json(json_string))
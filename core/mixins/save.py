@@ -0,0 +1,26 @@
+from contextlib import AbstractContextManager
+
+from core.utilities.save import SaveCoalescer, SaveMetrics, get_save_coalescer
+
+
+class BatchSaveMixin:
+    # seconds to wait for further changes before saving, 0 saves immediately
+    save_debounce: float = 0.0
+
+    def batch(self) -> AbstractContextManager[SaveCoalescer]:
+        """Defers saving until the outermost batch exits, however many changes are made
+
+        Usage:
+            with storage.batch():
+                for item in items:
+                    storage.update_feed_item(item)
+        """
+        return get_save_coalescer(self).batch()  # type: ignore
+
+    def flush(self) -> None:
+        """Performs any deferred or debounced save now"""
+        get_save_coalescer(self).flush()  # type: ignore
+
+    @property
+    def save_metrics(self) -> SaveMetrics:
+        return get_save_coalescer(self).metrics  # type: ignore
@@ -0,0 +1,18 @@
+from dataclasses import dataclass, field
+
+from core.mixins.dataclasses_json import CamelCaseJsonMixin
+
+
+@dataclass(slots=True)
+class UnreadSummary(CamelCaseJsonMixin):
+    """Unread item counts for badges, overall, per feed url and per OPML category"""
+
+    unread: int = 0
+    # stored items, read or not
+    total: int = 0
+    feeds: dict[str, int] = field(default_factory=dict)
+    # a category's count includes the folders nested below it
+    categories: dict[str, int] = field(default_factory=dict)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(unread={self.unread}, total={self.total}, feeds={len(self.feeds)}, categories={len(self.categories)})"
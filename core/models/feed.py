@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import MISSING, dataclass, fields
 
 from core.mixins.dataclasses_json import CamelCaseJsonMixin
 from core.constants.common import EMPTY_STRING
@@ -33,10 +33,25 @@ class FeedItem(CamelCaseJsonMixin):
     feed_url: str = EMPTY_STRING
     read: bool = False
     created: DateTime | None = None
+    # hash of the normalized link, title and published date, see core.services.rss.fingerprint
+    fingerprint: str | None = None
+    content_hash: str | None = None
 
     def __eq__(self, other: FeedItem) -> bool:
         return self.id == other.id
 
+    def __setstate__(self, state: tuple[None, dict] | dict) -> None:
+        # items pickled before a field was added leave it at its default
+        slots = state[1] if isinstance(state, tuple) else state
+        for item_field in fields(self):
+            if item_field.name in slots:
+                value = slots[item_field.name]
+            elif item_field.default is not MISSING:
+                value = item_field.default
+            else:
+                value = item_field.default_factory()  # type: ignore
+            object.__setattr__(self, item_field.name, value)
+
     def update(self, other: FeedItem) -> None:
         self.title = other.title
         self.summary = other.summary
@@ -46,3 +61,18 @@ class FeedItem(CamelCaseJsonMixin):
         self.feed_url = other.feed_url
         self.read = other.read
         self.created = other.created
+        self.fingerprint = other.fingerprint
+        self.content_hash = other.content_hash
+
+
+@dataclass(slots=True)
+class FeedState(CamelCaseJsonMixin):
+    """HTTP validator state for a feed, persisted so conditional GETs survive restarts"""
+
+    url: str
+    etag: str | None = None
+    modified: str | None = None
+    status: int | None = None
+    last_fetched: DateTime | None = None
+    # digest of the last response body, so an unchanged document is not parsed again
+    body_digest: str | None = None
@@ -0,0 +1,24 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class FetchResult:
+    url: str
+    status: int | None = None
+    # the URL the document was served from, after any redirects
+    location: str | None = None
+    content: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+    etag: str | None = None
+    modified: str | None = None
+    elapsed: float = 0.0
+    error: Exception | None = None
+
+    @property
+    def document_url(self) -> str:
+        """the URL relative links in the document are resolved against"""
+        return self.location or self.url
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
@@ -0,0 +1,33 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class SpanStats:
+    """The observations of one timed series, with histogram buckets"""
+
+    # bucket upper bounds in seconds, ascending
+    bounds: tuple[float, ...]
+    # observations per bucket, the last one above every bound
+    buckets: list[int] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.buckets:
+            self.buckets = [0] * (len(self.bounds) + 1)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(self.bounds, seconds)] += 1
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(count={self.count}, mean={self.mean:.6f}, max={self.max:.6f})"
@@ -0,0 +1,37 @@
+from dataclasses import dataclass, field
+from enum import StrEnum
+
+from core.models.feed import FeedItem
+from core.utilities.datetime import DateTime
+
+
+class SortOrder(StrEnum):
+    NEWEST_FIRST = "newest"
+    OLDEST_FIRST = "oldest"
+
+
+@dataclass(slots=True)
+class ItemQuery:
+    """Filters, order and page position for reading stored feed items
+
+    Items are ordered by published date, ties broken by id, and items without
+    a published date come last when newest first. A cursor is taken from the
+    previous ItemPage and continues after its last item.
+    """
+
+    category: str | None = None
+    feed_urls: list[str] | None = None
+    # False for unread items only, True for read items only, None for both
+    read: bool | None = False
+    # inclusive lower and exclusive upper bound on the published date
+    published_after: DateTime | None = None
+    published_before: DateTime | None = None
+    order: SortOrder = SortOrder.NEWEST_FIRST
+    limit: int | None = None
+    cursor: str | None = None
+
+
+@dataclass(slots=True)
+class ItemPage:
+    items: list[FeedItem] = field(default_factory=list)
+    next_cursor: str | None = None
@@ -0,0 +1,52 @@
+from dataclasses import dataclass, field
+from http import HTTPStatus as http
+
+from core.utilities.datetime import DateTime
+
+
+@dataclass(slots=True)
+class RefreshStats:
+    """Response counts for a single refresh of the feeds"""
+
+    ok: int = 0
+    not_modified: int = 0
+    failed: int = 0
+    started: DateTime = field(default_factory=DateTime.now)
+
+    @property
+    def total(self) -> int:
+        return self.ok + self.not_modified + self.failed
+
+    def record(self, status: int | None) -> None:
+        if status == http.NOT_MODIFIED:
+            self.not_modified += 1
+        elif status is not None and status < http.BAD_REQUEST:
+            self.ok += 1
+        else:
+            self.failed += 1
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(ok={self.ok}, not_modified={self.not_modified}, failed={self.failed})"
+
+
+@dataclass(slots=True)
+class FeedRefreshResult:
+    """The outcome of refreshing a single feed"""
+
+    url: str
+    status: int | None = None
+    entries: int = 0
+    new_items: int = 0
+    updated_items: int = 0
+    # the body matched the last one fetched, so it was not parsed
+    unchanged: bool = False
+    update_hint: int | None = None
+    error: Exception | None = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == http.NOT_MODIFIED
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or self.status is None or self.status >= http.BAD_REQUEST
@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(slots=True)
+class CompactionResult:
+    """The outcome of one run of the retention policy over the stored items"""
+
+    # items left in storage
+    kept: int = 0
+    removed: int = 0
+    # removed items written to the archive
+    archived: int = 0
+    segment: Path | None = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(kept={self.kept}, removed={self.removed}, archived={self.archived})"
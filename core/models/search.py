@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+from core.models.feed import FeedItem
+
+
+@dataclass(slots=True)
+class SearchResult:
+    item: FeedItem
+    score: float
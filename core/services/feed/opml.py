@@ -1,8 +1,9 @@
+from dataclasses import replace
 from io import StringIO
 import logging
 from logging import Logger
 from pathlib import Path
-from typing import Optional
+from typing import IO, Iterator, Optional
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import Element, ElementTree
 
@@ -13,17 +14,30 @@ import core.constants.opml as OPML
 from core.exceptions.feed import DuplicateFeedError, FeedNotFoundError
 from core.interfaces.common import ISave
 from core.interfaces.feed import IFeedService
+from core.mixins.save import BatchSaveMixin
 from core.models.feed import Feed
 from core.utilities.datetime import DateTime
 from core.utilities.decorators import autosave
+from core.utilities.file import atomic_replace
+from core.utilities.save import get_save_coalescer
 from core.utilities.xml import get_first_element_or_default
 
+START = "start"
+END = "end"
 
-class OPMLFeedService(IFeedService, ISave):
+
+class OPMLFeedService(BatchSaveMixin, IFeedService, ISave):
     tree: ElementTree[Element[str]]
     head: Element
     body: Element
     log: Logger
+    # xml_url -> outline, and xml_url -> Feed built from it, kept in sync on every mutation;
+    # callers get copies, since the reader sets validators on the feeds it is given
+    _elements: dict[str, Element]
+    _folders: dict[str, str]
+    _feed_cache: dict[str, Feed]
+    _feeds_view: list[Feed] | None
+    _disabled_feeds_view: list[Feed] | None
 
     def __init__(self, settings: FileStorageSettings | None = None):
         self.log = logging.getLogger(OPMLFeedService.__name__)
@@ -49,19 +63,23 @@ class OPMLFeedService(IFeedService, ISave):
 
     @property
     def disabled_feeds(self) -> list[Feed]:
-        return [
-            self.create_feed_from_outline(outline)
-            for outline in self.body
-            if disabled(outline)
-        ]
+        if self._disabled_feeds_view is None:
+            self._disabled_feeds_view = [
+                self._get_cached_feed(xml_url, outline)
+                for xml_url, outline in self._elements.items()
+                if disabled(outline)
+            ]
+        return [replace(feed) for feed in self._disabled_feeds_view]
 
     @property
     def feeds(self) -> list[Feed]:
-        return [
-            self.create_feed_from_outline(outline)
-            for outline in self.body
-            if not disabled(outline)
-        ]
+        if self._feeds_view is None:
+            self._feeds_view = [
+                self._get_cached_feed(xml_url, outline)
+                for xml_url, outline in self._elements.items()
+                if not disabled(outline)
+            ]
+        return [replace(feed) for feed in self._feeds_view]
 
     def load_from_string(self, opml_text: str) -> None:
         self.tree = ET.parse(StringIO(opml_text))
@@ -93,14 +111,52 @@ class OPMLFeedService(IFeedService, ISave):
         timestamp = DateTime.utcnow_timestamp()
         last_modified = get_first_element_or_default(self.head, OPML.DATE_MODIFIED)
         last_modified.text = timestamp
-        self.tree.write(opml_file, encoding="UTF-8", xml_declaration=True)
+        with atomic_replace(opml_file) as temp_path:
+            self.tree.write(temp_path, encoding="UTF-8", xml_declaration=True)
+
+    def iter_feeds(self, include_disabled: bool = False) -> Iterator[Feed]:
+        """Streams the feeds in the OPML file as it is parsed
+
+        While changes are waiting to be saved, the file is out of date, so
+        the feeds come from memory instead.
+        """
+        if get_save_coalescer(self).pending or not self.file_path.exists():
+            feeds = self.feeds + self.disabled_feeds if include_disabled else self.feeds
+            return iter(feeds)
+        return stream_feeds(self.file_path, include_disabled)
 
     def extract_elements(self, timestamp) -> None:
-        self.head = self.tree.getroot()[0]
-        self.body = self.tree.getroot()[1]
+        root = self.tree.getroot()
+        self.head = get_first_element_or_default(root, OPML.HEAD_TAG)
+        self.body = get_first_element_or_default(root, OPML.BODY_TAG)
         # Don't need the elements, just adding them if they're not there
         get_first_element_or_default(self.head, OPML.DATE_MODIFIED, timestamp)
         get_first_element_or_default(self.head, OPML.DATE_CREATED, timestamp)
+        self.build_index()
+
+    def build_index(self) -> None:
+        self._elements = {}
+        self._folders = {}
+        self._feed_cache = {}
+        folders: list[str] = []
+
+        def index(parent: Element) -> None:
+            for outline in parent:
+                if outline.tag != OPML.OUTLINE_TAG:
+                    continue
+                xml_url = outline.attrib.get(OPML.XML_URL)
+                if xml_url is not None:
+                    if xml_url not in self._elements:
+                        self._elements[xml_url] = outline
+                        if folders:
+                            self._folders[xml_url] = Constants.SLASH.join(folders)
+                else:
+                    folders.append(folder_name(outline))
+                    index(outline)
+                    folders.pop()
+
+        index(self.body)
+        self._invalidate()
 
     @autosave
     def add_feed(self, feed: Feed) -> None:
@@ -110,46 +166,41 @@ class OPMLFeedService(IFeedService, ISave):
             self.update_feed(feed)
             self.enable_feed(feed)
         else:
-            self.body.append(self.create_element_from_feed(feed))
+            element = self.create_element_from_feed(feed)
+            self.body.append(element)
+            self._elements[feed.url] = element
+            self._invalidate(feed.url)
 
     def get_feed(self, feed_url: str) -> Feed:
-        try:
-            return [feed for feed in self.feeds if feed.url == feed_url][0]
-        except IndexError as e:
-            raise FeedNotFoundError(feed_url).with_traceback(e.__traceback__)
+        outline = self._elements.get(feed_url)
+        if outline is None or disabled(outline):
+            raise FeedNotFoundError(feed_url)
+        return replace(self._get_cached_feed(feed_url, outline))
 
     def get_feed_element(self, xml_url: str) -> Element:
         try:
-            return [
-                outline
-                for outline in self.body
-                if outline.attrib[OPML.XML_URL] == xml_url
-            ][0]
-        except IndexError as e:
+            return self._elements[xml_url]
+        except KeyError as e:
             self.log.warning(str(e), exc_info=e)
             raise FeedNotFoundError(xml_url).with_traceback(e.__traceback__)
 
     @autosave
     def disable_feed(self, feed: Feed) -> None:
         self.get_feed_element(feed.url).set(OPML.DISABLED, OPML.TRUE)
+        self._invalidate()
 
     @autosave
     def enable_feed(self, feed: Feed) -> None:
         self.get_feed_element(feed.url).set(OPML.DISABLED, OPML.FALSE)
+        self._invalidate()
 
     def feed_exists(self, feed: Feed) -> bool:
-        return any(
-            [existing_feed for existing_feed in self.feeds if existing_feed == feed]
-        )
+        outline = self._elements.get(feed.url)
+        return outline is not None and not disabled(outline)
 
     def disabled_feed_exists(self, feed: Feed) -> bool:
-        return any(
-            [
-                existing_feed
-                for existing_feed in self.disabled_feeds
-                if existing_feed == feed
-            ]
-        )
+        outline = self._elements.get(feed.url)
+        return outline is not None and disabled(outline)
 
     @autosave
     def update_feed(self, feed_info: Feed) -> None:
@@ -159,6 +210,23 @@ class OPMLFeedService(IFeedService, ISave):
         feed_element.set(OPML.CATEGORY, f"/{feed_info.category}")
         feed_element.set(OPML.XML_URL, feed_info.url)
         feed_element.set(OPML.HTML_URL, feed_info.html_url)
+        self._invalidate(feed_info.url)
+
+    def _get_cached_feed(self, xml_url: str, outline: Element) -> Feed:
+        feed = self._feed_cache.get(xml_url)
+        if feed is None:
+            feed = self.create_feed_from_outline(
+                outline, self._folders.get(xml_url, Constants.EMPTY_STRING)
+            )
+            self._feed_cache[xml_url] = feed
+        return feed
+
+    def _invalidate(self, xml_url: str | None = None) -> None:
+        """Drops the cached feed views, and the cached Feed for xml_url if its outline changed"""
+        self._feeds_view = None
+        self._disabled_feeds_view = None
+        if xml_url is not None:
+            self._feed_cache.pop(xml_url, None)
 
     @staticmethod
     def create_element_from_feed(feed: Feed) -> Element:
@@ -176,15 +244,16 @@ class OPMLFeedService(IFeedService, ISave):
         )
 
     @staticmethod
-    def create_feed_from_outline(outline: Element) -> Feed:
+    def create_feed_from_outline(
+        outline: Element, folder: str = Constants.EMPTY_STRING
+    ) -> Feed:
+        """Builds a Feed from an outline, falling back to its enclosing folder(s) for the category"""
         entry = outline.attrib
         return Feed(
-            title=entry.get(OPML.TITLE, Constants.EMPTY_STRING),
+            title=entry.get(OPML.TITLE, entry.get(OPML.TEXT, Constants.EMPTY_STRING)),
             url=entry.get(OPML.XML_URL, Constants.EMPTY_STRING),
             html_url=entry.get(OPML.HTML_URL, Constants.EMPTY_STRING),
-            category=entry.get(OPML.CATEGORY, Constants.EMPTY_STRING).replace(
-                Constants.SLASH, Constants.EMPTY_STRING
-            ),
+            category=entry.get(OPML.CATEGORY, folder).strip(Constants.SLASH),
         )
 
 
@@ -207,6 +276,63 @@ def get_empty_opml(
 """
 
 
+def stream_feeds(
+    source: Path | str | IO[bytes], include_disabled: bool = False
+) -> Iterator[Feed]:
+    """Yields the feeds of an OPML document as they are parsed
+
+    Built on iterparse, so memory stays flat for very large files: each outline
+    is cleared once handled and finished top-level outlines are dropped.
+    Nested outlines without an xmlUrl are folders, and become the category of
+    the feeds inside them that don't declare their own. Because this is a
+    generator, the reader can start fetching the first feeds while the rest
+    of the file is still being read.
+
+    Args:
+        source (Path | str | IO[bytes]): the OPML file, or an open binary stream
+        include_disabled (bool, optional): set to True to also yield disabled feeds. Defaults to False.
+
+    Yields:
+        Feed: each feed, in document order
+    """
+    folders: list[str] = []
+    parents: list[Element] = []
+    body: Element | None = None
+    seen: set[str] = set()
+    for event, element in ET.iterparse(source, events=(START, END)):
+        if element.tag == OPML.BODY_TAG:
+            body = element
+            continue
+        if element.tag != OPML.OUTLINE_TAG:
+            continue
+        is_feed = OPML.XML_URL in element.attrib
+        if event == START:
+            if not is_feed:
+                folders.append(folder_name(element))
+            parents.append(element)
+            continue
+        parents.pop()
+        if is_feed:
+            xml_url = element.attrib[OPML.XML_URL]
+            if xml_url not in seen and (include_disabled or not disabled(element)):
+                seen.add(xml_url)
+                yield OPMLFeedService.create_feed_from_outline(
+                    element, Constants.SLASH.join(folders)
+                )
+        else:
+            folders.pop()
+        element.clear()
+        if not parents and body is not None:
+            # a top-level outline is done, release it and everything beneath it
+            body.clear()
+
+
+def folder_name(outline: Element) -> str:
+    return outline.attrib.get(
+        OPML.TITLE, outline.attrib.get(OPML.TEXT, Constants.EMPTY_STRING)
+    ).strip(Constants.SLASH)
+
+
 def disabled(outline: Element) -> bool:
     """
     Checks if the element has been "commented out", i.e. disabled
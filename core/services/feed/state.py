@@ -0,0 +1,65 @@
+import logging
+from logging import Logger
+from pathlib import Path
+
+from core.config.common import config
+from core.config.file import FileStorageSettings
+from core.interfaces.common import ISave
+from core.interfaces.feed import IFeedStateService
+from core.mixins.save import BatchSaveMixin
+from core.models.feed import FeedState
+from core.utilities.decorators import autosave
+from core.utilities.file import atomic_write_text
+
+
+class JsonFeedStateService(BatchSaveMixin, IFeedStateService, ISave):
+    """Keeps per-feed validator state in memory, persisted to a small JSON sidecar file"""
+
+    states: dict[str, FeedState]
+    log: Logger
+
+    def __init__(self, settings: FileStorageSettings | None = None):
+        self.log = logging.getLogger(JsonFeedStateService.__name__)
+        if settings is not None:
+            self.settings = settings
+        self.load()
+
+    @property
+    def settings(self) -> FileStorageSettings:
+        return config.get_config(FileStorageSettings)
+
+    @settings.setter
+    def settings(self, settings: FileStorageSettings) -> None:
+        config.set_config(FileStorageSettings, settings)
+
+    @property
+    def file_path(self) -> Path:
+        return self.settings.state_file_path
+
+    def load(self) -> None:
+        if not self.file_path.exists():
+            self.states = {}
+            return
+        try:
+            states = FeedState.json_to_list(self.file_path.read_text())
+        except ValueError as e:
+            self.log.warning(
+                "'%s' could not be read, starting without validators",
+                self.file_path.as_posix(),
+                exc_info=e,
+            )
+            states = []
+        self.states = {state.url: state for state in states}
+
+    def get_state(self, xml_url: str) -> FeedState | None:
+        return self.states.get(xml_url)
+
+    @autosave
+    def set_states(self, states: list[FeedState]) -> None:
+        for state in states:
+            self.states[state.url] = state
+
+    def save(self) -> None:
+        atomic_write_text(
+            self.file_path, FeedState.list_to_json(list(self.states.values()))
+        )
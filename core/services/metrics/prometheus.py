@@ -0,0 +1,62 @@
+"""Renders an InMemoryMetricsSink in the Prometheus text exposition format
+
+Timed stages become histograms named <prefix><stage>_seconds and counters
+become <prefix><counter>_total, so the output can be served from a /metrics
+endpoint or written to a file for the node exporter's textfile collector.
+"""
+
+from core.constants.metrics import METRIC_PREFIX
+from core.interfaces.metrics import Labels
+from core.services.metrics.sinks import InMemoryMetricsSink
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+INFINITY: str = "+Inf"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def to_prometheus_text(sink: InMemoryMetricsSink, prefix: str = METRIC_PREFIX) -> str:
+    """Every series of the sink, grouped by metric, in the Prometheus text format
+
+    Args:
+        sink (InMemoryMetricsSink): the sink to export
+        prefix (str, optional): put before every metric name. Defaults to METRIC_PREFIX.
+
+    Returns:
+        str: the exposition, ending with a newline
+    """
+    spans, counters = sink.snapshot()
+    lines: list[str] = []
+    for name in sorted({name for name, _ in spans}):
+        metric = f"{prefix}{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for (series, labels), stats in sorted(spans.items()):
+            if series != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(stats.bounds, stats.buckets):
+                cumulative += count
+                lines.append(f"{metric}_bucket{format_labels(labels, (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{format_labels(labels, (('le', INFINITY),))} {stats.count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {format_value(stats.total)}")
+            lines.append(f"{metric}_count{format_labels(labels)} {stats.count}")
+    for name in sorted({name for name, _ in counters}):
+        metric = f"{prefix}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (series, labels), value in sorted(counters.items()):
+            if series == name:
+                lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,87 @@
+"""Metrics sinks: one that drops everything, the default, and one that keeps every series in memory"""
+
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import replace
+from threading import Lock
+
+from core.interfaces.metrics import IMetricsSink, Labels
+from core.models.metrics import SpanStats
+
+# histogram bucket bounds in seconds, from a cached parse to a slow publisher
+DEFAULT_BOUNDS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+NULL_SPAN: AbstractContextManager = nullcontext()
+
+# a series is a metric name and its labels
+Series = tuple[str, Labels]
+
+
+class NullMetricsSink(IMetricsSink):
+    """Discards everything; spans don't even read the clock"""
+
+    enabled = False
+
+    def observe(self, name: str, seconds: float, labels: Labels = ()) -> None:
+        pass
+
+    def increment(self, name: str, value: float = 1, labels: Labels = ()) -> None:
+        pass
+
+    def span(self, name: str, labels: Labels = ()) -> AbstractContextManager:
+        return NULL_SPAN
+
+
+NULL_METRICS: NullMetricsSink = NullMetricsSink()
+
+
+class InMemoryMetricsSink(IMetricsSink):
+    """Keeps a histogram per timed series and a total per counter, for tests, benchmarks and exporting"""
+
+    bounds: tuple[float, ...]
+    spans: dict[Series, SpanStats]
+    counters: dict[Series, float]
+    _lock: Lock
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BOUNDS):
+        self.bounds = bounds
+        self.spans = {}
+        self.counters = {}
+        self._lock = Lock()
+
+    def observe(self, name: str, seconds: float, labels: Labels = ()) -> None:
+        with self._lock:
+            stats = self.spans.get((name, labels))
+            if stats is None:
+                stats = self.spans[(name, labels)] = SpanStats(self.bounds)
+            stats.observe(seconds)
+
+    def increment(self, name: str, value: float = 1, labels: Labels = ()) -> None:
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get_span(self, name: str, labels: Labels = ()) -> SpanStats | None:
+        with self._lock:
+            stats = self.spans.get((name, labels))
+            return None if stats is None else replace(stats, buckets=list(stats.buckets))
+
+    def get_counter(self, name: str, labels: Labels = ()) -> float:
+        with self._lock:
+            return self.counters.get((name, labels), 0)
+
+    def get_total(self, name: str) -> float:
+        """A counter summed over all of its labels, such as the bytes fetched from every feed"""
+        with self._lock:
+            return sum(value for (series, _), value in self.counters.items() if series == name)
+
+    def snapshot(self) -> tuple[dict[Series, SpanStats], dict[Series, float]]:
+        """Copies of every timed series and counter, consistent with each other"""
+        with self._lock:
+            spans = {key: replace(stats, buckets=list(stats.buckets)) for key, stats in self.spans.items()}
+            return spans, dict(self.counters)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
@@ -0,0 +1,252 @@
+"""asyncio front ends over the blocking reader and storage services
+
+Every blocking call runs in a worker thread, so an event loop serving many
+requests is never held up by disk or network I/O. Refreshes are coalesced:
+while a feed is being refreshed, any other request for the same feed awaits
+that refresh instead of fetching and parsing the feed again.
+"""
+
+import asyncio
+from dataclasses import replace
+from itertools import islice
+import logging
+from logging import Logger
+from threading import RLock
+import time
+from typing import Any, AsyncIterator, Callable, Iterable, TypeVar
+
+from core.exceptions.common import BaseError
+from core.interfaces.rss import (
+    IAsyncRssReaderService,
+    IAsyncRssStorageService,
+    IRssStorageService,
+)
+from core.models.counters import UnreadSummary
+from core.models.feed import Feed, FeedItem
+from core.models.query import ItemPage, ItemQuery
+from core.models.refresh import FeedRefreshResult
+from core.services.rss.query import encode_cursor
+from core.services.rss.reader import RssFeedReaderService
+from core.utilities.datetime import DateTime
+
+T = TypeVar("T")
+
+# items read from a blocking query per worker thread call
+QUERY_CHUNK_SIZE: int = 500
+
+
+class AsyncRssStorageService(IAsyncRssStorageService):
+    """Runs a blocking storage backend's calls in worker threads, one call at a time
+
+    The backends are not all safe to call from several threads at once, so
+    calls made through this wrapper hold a lock. When the backend is also
+    used by a reader, pass the reader's storage_lock so that the wrapper's
+    calls are serialized with the reader's own.
+    """
+
+    storage: IRssStorageService
+    _lock: RLock
+
+    def __init__(self, storage: IRssStorageService, lock: RLock | None = None):
+        self.storage = storage
+        self._lock = RLock() if lock is None else lock
+
+    async def get_stored_items(self) -> list[FeedItem]:
+        return await self._run(self.storage.get_stored_items)
+
+    async def get_stored_item(self, item_id: str) -> FeedItem | None:
+        return await self._run(self.storage.get_stored_item, item_id)
+
+    async def store_feed_items(self, items: list[FeedItem]) -> None:
+        await self._run(self.storage.store_feed_items, items)
+
+    async def update_feed_item(self, item: FeedItem) -> None:
+        await self._run(self.storage.update_feed_item, item)
+
+    async def remove_feed_items(self, item_ids: list[str]) -> None:
+        await self._run(self.storage.remove_feed_items, item_ids)
+
+    async def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        return await self._run(self.storage.mark_items_read, item_ids, read)
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        return await asyncio.to_thread(self._call, function, *args)
+
+    def _call(self, function: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            return function(*args)
+
+
+class AsyncRssFeedReaderService(IAsyncRssReaderService):
+    """Serves an RssFeedReaderService to an event loop
+
+    Refreshes run one at a time, each as a single blocking refresh_feeds call
+    in a worker thread, so the fetcher's connection pool and the parse workers
+    are shared as in the blocking reader. A feed requested while it is being
+    refreshed, or while it waits for its turn, joins that refresh.
+
+    Storage is reached either through the reader, which holds its
+    storage_lock for every use of storage, or through the storage attribute,
+    which holds the same lock.
+    """
+
+    reader: RssFeedReaderService
+    storage: AsyncRssStorageService
+    log: Logger
+    # feed url -> the result of the refresh under way
+    _in_flight: dict[str, asyncio.Future[FeedRefreshResult]]
+    _refresh_lock: asyncio.Lock
+    _tasks: set[asyncio.Task]
+    _revalidated: dict[str | None, float]
+
+    def __init__(self, reader: RssFeedReaderService):
+        self.log = logging.getLogger(AsyncRssFeedReaderService.__name__)
+        self.reader = reader
+        self.storage = AsyncRssStorageService(reader.storage_service, reader.storage_lock)
+        self._in_flight = {}
+        self._refresh_lock = asyncio.Lock()
+        self._tasks = set()
+        self._revalidated = {}
+
+    async def get_items(
+        self,
+        category: str | None = None,
+        exclude_read: bool = True,
+    ) -> list[FeedItem]:
+        items = await self._list(ItemQuery(category=category, read=False if exclude_read else None))
+        if self.reader.settings.stale_while_revalidate:
+            await self.revalidate(category)
+        return items
+
+    async def get_feed_items(self, feed: Feed, exclude_read: bool = True) -> list[FeedItem]:
+        items = await self._list(
+            ItemQuery(feed_urls=[feed.url], read=False if exclude_read else None)
+        )
+        if self.reader.settings.stale_while_revalidate:
+            self._revalidate(feed.url, [feed])
+        return items
+
+    async def get_unread_summary(self) -> UnreadSummary:
+        return await asyncio.to_thread(self.reader.get_unread_summary)
+
+    async def mark_feed_read(self, feed: Feed, before: DateTime | None = None) -> int:
+        return await asyncio.to_thread(self.reader.mark_feed_read, feed, before)
+
+    async def mark_all_read(self, category: str | None = None, before: DateTime | None = None) -> int:
+        return await asyncio.to_thread(self.reader.mark_all_read, category, before)
+
+    async def query_items(self, query: ItemQuery) -> AsyncIterator[FeedItem]:
+        items = await asyncio.to_thread(self.reader.query_items, query)
+        while True:
+            chunk = await asyncio.to_thread(list, islice(items, QUERY_CHUNK_SIZE))
+            if not chunk:
+                return
+            for item in chunk:
+                yield item
+
+    async def get_page(self, query: ItemQuery) -> ItemPage:
+        if query.limit is None:
+            return ItemPage(items=await self._list(query))
+        # one extra item tells whether there is a next page
+        items = await self._list(replace(query, limit=query.limit + 1))
+        if len(items) <= query.limit:
+            return ItemPage(items=items)
+        items = items[: query.limit]
+        return ItemPage(items=items, next_cursor=encode_cursor(items[-1]) if items else None)
+
+    async def refresh(self, category: str | None = None) -> list[FeedRefreshResult]:
+        feeds = await asyncio.to_thread(self._get_feeds, category)
+        return await self.refresh_feeds(feeds)
+
+    async def refresh_feed(self, feed: Feed) -> FeedRefreshResult:
+        (result,) = await self.refresh_feeds([feed])
+        # like the blocking refresh_feed, raise what the reader would have raised
+        if isinstance(result.error, BaseError):
+            raise result.error
+        return result
+
+    async def refresh_feeds(self, feeds: Iterable[Feed]) -> list[FeedRefreshResult]:
+        """Refreshes feeds, joining the refreshes already under way for any of them
+
+        A waiting caller that is cancelled does not cancel the refresh, which
+        other callers may share.
+
+        Args:
+            feeds (Iterable[Feed]): the feeds to refresh
+
+        Returns:
+            list[FeedRefreshResult]: one result per feed, in the order given
+        """
+        loop = asyncio.get_running_loop()
+        waiting: list[asyncio.Future[FeedRefreshResult]] = []
+        started: list[Feed] = []
+        for feed in feeds:
+            future = self._in_flight.get(feed.url)
+            if future is None:
+                future = self._in_flight[feed.url] = loop.create_future()
+                started.append(feed)
+            waiting.append(future)
+        if started:
+            task = loop.create_task(self._refresh(started))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return list(await asyncio.gather(*(asyncio.shield(future) for future in waiting)))
+
+    async def revalidate(self, category: str | None = None) -> bool:
+        """Starts a background refresh of every feed, or those in a category
+
+        Returns:
+            bool: False if the same feeds were refreshed within revalidate_interval
+        """
+        feeds = await asyncio.to_thread(self._get_feeds, category)
+        return self._revalidate(None if category is None else f"category:{category}", feeds)
+
+    async def wait_for_refreshes(self) -> None:
+        """Waits until every refresh under way, including background ones, has finished"""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.wait_for_refreshes()
+        await asyncio.to_thread(self.reader.close)
+
+    def _revalidate(self, key: str | None, feeds: list[Feed]) -> bool:
+        now = time.monotonic()
+        last = self._revalidated.get(key)
+        if last is not None and now - last < self.reader.settings.revalidate_interval:
+            return False
+        self._revalidated[key] = now
+        task = asyncio.get_running_loop().create_task(self.refresh_feeds(feeds))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _refresh(self, feeds: list[Feed]) -> None:
+        """Runs one blocking refresh and hands each feed's result to everyone awaiting it"""
+        futures = [self._in_flight[feed.url] for feed in feeds]
+        try:
+            async with self._refresh_lock:
+                results = await asyncio.to_thread(self.reader.refresh_feeds, feeds)
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            self.log.warning("refresh of %d feeds failed: %s", len(feeds), e)
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        finally:
+            for feed, future in zip(feeds, futures):
+                if self._in_flight.get(feed.url) is future:
+                    del self._in_flight[feed.url]
+
+    async def _list(self, query: ItemQuery) -> list[FeedItem]:
+        return await asyncio.to_thread(lambda: list(self.reader.query_items(query)))
+
+    def _get_feeds(self, category: str | None) -> list[Feed]:
+        if category is None:
+            return self.reader.feed_service.feeds
+        return self.reader.get_category_feeds(category)
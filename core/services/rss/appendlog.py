@@ -0,0 +1,227 @@
+import logging
+from logging import Logger
+import os
+from pathlib import Path
+import pickle
+import struct
+from threading import Lock, RLock, Thread
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssStorageService
+from core.mixins.save import BatchSaveMixin
+from core.models.feed import FeedItem
+from core.utilities.decorators import autosave
+
+config = ConfigurationRoot()
+
+RECORD_HEADER = struct.Struct(">I")
+COMPACTION_SUFFIX = ".compact"
+# compact once superseded records outnumber live ones by this factor
+COMPACTION_RATIO: float = 1.0
+COMPACTION_MIN_STALE_RECORDS: int = 1024
+
+
+class AppendLogRssStorageService(BatchSaveMixin, IRssStorageService, ISave):
+    """Keeps every item in an id -> item index and persists changes to an append-only log
+
+    Each store or update appends one length-prefixed pickle per changed item, so
+    saving costs O(changed items). When a later record for an id is read it
+    replaces the earlier one, and a removal appends the bare id as a tombstone;
+    superseded records and tombstones are dropped by a background compaction
+    once they outnumber the live ones.
+    """
+
+    index: dict[str, FeedItem]
+    log: Logger
+    # None marks an item removed since the last save
+    _pending: dict[str, FeedItem | None]
+    _records: int
+    _lock: RLock
+    _compaction: Thread | None
+    # held for a whole compaction, so a direct compact() and a background one don't share the temp file
+    _compaction_lock: Lock
+
+    @property
+    def settings(self) -> FileStorageSettings:
+        return config.get_config(FileStorageSettings)
+
+    @property
+    def file_path(self) -> Path:
+        return self.settings.storage_file_path
+
+    @property
+    def cache(self) -> list[FeedItem]:
+        return list(self.index.values())
+
+    @property
+    def stale_records(self) -> int:
+        return self._records - len(self.index)
+
+    def __init__(self):
+        self.log = logging.getLogger(AppendLogRssStorageService.__name__)
+        self._lock = RLock()
+        self._compaction = None
+        self._compaction_lock = Lock()
+        self.load()
+
+    def load(self) -> list[FeedItem]:
+        with self._lock:
+            self.index = {}
+            self._pending = {}
+            self._records = 0
+            if self.file_path.exists():
+                valid_size = 0
+                with open(self.file_path, "rb") as log_file:
+                    for record, end in read_records(log_file):
+                        if isinstance(record, str):
+                            self.index.pop(record, None)
+                        else:
+                            self.index[record.id] = record
+                        self._records += 1
+                        valid_size = end
+                if valid_size != self.file_path.stat().st_size:
+                    self.log.warning(
+                        "'%s' ends with a partial record, truncating to %d bytes",
+                        self.file_path.as_posix(),
+                        valid_size,
+                    )
+                    os.truncate(self.file_path, valid_size)
+            return self.cache
+
+    def get_stored_items(self) -> list[FeedItem]:
+        return self.cache
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        return self.index.get(item_id)
+
+    def contains(self, item_id: str) -> bool:
+        return item_id in self.index
+
+    @autosave
+    def update_feed_item(self, item: FeedItem) -> None:
+        with self._lock:
+            cached_item = self.index.get(item.id)
+            if cached_item is None:
+                self.index[item.id] = item
+                self._pending[item.id] = item
+            else:
+                cached_item.update(item)
+                self._pending[item.id] = cached_item
+
+    @autosave
+    def store_feed_item(self, item: FeedItem) -> None:
+        self.store_feed_items([item])
+
+    @autosave
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        with self._lock:
+            for item in items:
+                if item.id not in self.index:
+                    self.index[item.id] = item
+                    self._pending[item.id] = item
+
+    @autosave
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        with self._lock:
+            for item_id in item_ids:
+                if self.index.pop(item_id, None) is not None:
+                    self._pending[item_id] = None
+
+    @autosave
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        with self._lock:
+            changed = []
+            for item_id in item_ids:
+                item = self.index.get(item_id)
+                if item is not None and item.read != read:
+                    item.read = read
+                    self._pending[item_id] = item
+                    changed.append(item_id)
+            return changed
+
+    def save(self) -> None:
+        with self._lock:
+            self._append_pending()
+            if self._needs_compaction():
+                self.start_compaction()
+
+    def start_compaction(self) -> None:
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = Thread(
+                target=self.compact,
+                name=f"{AppendLogRssStorageService.__name__}.compact",
+                daemon=True,
+            )
+            self._compaction.start()
+
+    def compact(self) -> None:
+        """Rewrites the log with one record per live item
+
+        The snapshot is written without holding the lock; records appended while
+        it was being written are copied over before the files are swapped.
+        """
+        with self._compaction_lock:
+            compact_path = self.file_path.with_name(self.file_path.name + COMPACTION_SUFFIX)
+            with self._lock:
+                self._append_pending()
+                items = list(self.index.values())
+                snapshot_size = self.file_path.stat().st_size if self.file_path.exists() else 0
+                snapshot_records = self._records
+            with open(compact_path, "wb") as compact_file:
+                for item in items:
+                    compact_file.write(encode_record(item))
+            with self._lock:
+                self._append_pending()
+                with open(compact_path, "ab") as compact_file:
+                    if self.file_path.exists():
+                        with open(self.file_path, "rb") as log_file:
+                            log_file.seek(snapshot_size)
+                            compact_file.write(log_file.read())
+                    compact_file.flush()
+                    os.fsync(compact_file.fileno())
+                os.replace(compact_path, self.file_path)
+                self._records = len(items) + self._records - snapshot_records
+            self.log.debug("compacted '%s' to %d records", self.file_path.as_posix(), self._records)
+
+    def _append_pending(self) -> None:
+        if not self._pending:
+            return
+        with open(self.file_path, "ab") as log_file:
+            for item_id, item in self._pending.items():
+                log_file.write(encode_record(item_id if item is None else item))
+                self._records += 1
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        self._pending = {}
+
+    def _needs_compaction(self) -> bool:
+        stale = self.stale_records
+        return (
+            stale >= COMPACTION_MIN_STALE_RECORDS
+            and stale > len(self.index) * COMPACTION_RATIO
+        )
+
+
+def encode_record(item: FeedItem | str) -> bytes:
+    """Encodes an item, or the id of a removed item, as one log record"""
+    payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+    return RECORD_HEADER.pack(len(payload)) + payload
+
+
+def read_records(log_file):
+    """Yields (item or removed id, end offset) for every complete record in the log file"""
+    offset = 0
+    while True:
+        header = log_file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        (length,) = RECORD_HEADER.unpack(header)
+        payload = log_file.read(length)
+        if len(payload) < length:
+            return
+        offset += RECORD_HEADER.size + length
+        yield pickle.loads(payload), offset
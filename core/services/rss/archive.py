@@ -0,0 +1,117 @@
+"""Compressed, append-only segments of items removed from the active store
+
+Each compaction run that removes items writes them to one gzipped JSON
+segment. Segments are never rewritten, and nothing reads them until the
+archive is searched or listed.
+"""
+
+import gzip
+import heapq
+import logging
+from logging import Logger
+from pathlib import Path
+from typing import Iterator
+
+from core.config.common import ConfigurationRoot
+from core.config.file import RetentionSettings
+from core.constants.common import EMPTY_STRING
+from core.models.feed import FeedItem
+from core.models.search import SearchResult
+from core.services.rss.search import PHRASE, TITLE_WEIGHT, contains_phrase, tokenize
+from core.utilities.datetime import DateTime
+from core.utilities.file import atomic_write_bytes
+
+config = ConfigurationRoot()
+
+SEGMENT_PREFIX: str = "segment-"
+SEGMENT_SUFFIX: str = ".json.gz"
+SEGMENT_TIME_FORMAT: str = "%Y%m%dT%H%M%S%f"
+
+
+class ItemArchive:
+    """Stores removed items in compressed segments and searches them on demand
+
+    A search decompresses every segment, newest first, and matches items the
+    way the search index does: every keyword and quoted phrase must appear.
+    """
+
+    log: Logger
+    _directory: Path | None
+
+    @property
+    def settings(self) -> RetentionSettings:
+        return config.get_config(RetentionSettings, True)
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is not None:
+            return self._directory
+        return self.settings.archive_directory_path
+
+    def __init__(self, directory: Path | None = None):
+        self.log = logging.getLogger(ItemArchive.__name__)
+        self._directory = directory
+
+    def segments(self) -> list[Path]:
+        """The archive's segment files, newest first"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"), reverse=True)
+
+    def write_segment(self, items: list[FeedItem]) -> Path | None:
+        """Writes items to a new segment
+
+        Args:
+            items (list[FeedItem]): the items to archive
+
+        Returns:
+            Path | None: the new segment, or None if there was nothing to write
+        """
+        if not items:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = DateTime.now().strftime(SEGMENT_TIME_FORMAT)
+        segment = self.directory / f"{SEGMENT_PREFIX}{name}{SEGMENT_SUFFIX}"
+        data = gzip.compress(FeedItem.list_to_json(items).encode("utf-8"))
+        atomic_write_bytes(segment, data)
+        self.log.info("archived %d items to '%s'", len(items), segment.as_posix())
+        return segment
+
+    def read_segment(self, segment: Path) -> list[FeedItem]:
+        return FeedItem.json_to_list(gzip.decompress(segment.read_bytes()).decode("utf-8"))
+
+    def get_items(self) -> Iterator[FeedItem]:
+        """Lazily yields every archived item, one segment at a time"""
+        for segment in self.segments():
+            yield from self.read_segment(segment)
+
+    def search(self, query: str, limit: int = 20) -> list[SearchResult]:
+        """Finds archived items matching every keyword and quoted phrase in the query
+
+        Args:
+            query (str): keywords, with exact phrases in double quotes
+            limit (int, optional): the maximum number of results. Defaults to 20.
+
+        Returns:
+            list[SearchResult]: the matching items, scored by how often the keywords appear
+        """
+        phrases = [tokenize(phrase) for phrase in PHRASE.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = set(tokenize(PHRASE.sub(" ", query))).union(*phrases)
+        if not terms or limit <= 0:
+            return []
+        results: list[SearchResult] = []
+        for item in self.get_items():
+            title = tokenize(item.title)
+            summary = tokenize(item.summary)
+            if not terms.issubset(set(title).union(summary)):
+                continue
+            if phrases:
+                tokens = title + [EMPTY_STRING] + summary
+                if not all(contains_phrase(tokens, phrase) for phrase in phrases):
+                    continue
+            score = sum(
+                TITLE_WEIGHT * title.count(term) + summary.count(term) for term in terms
+            )
+            results.append(SearchResult(item=item, score=float(score)))
+        return heapq.nlargest(limit, results, key=lambda result: result.score)
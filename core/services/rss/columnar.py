@@ -0,0 +1,642 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+from dataclasses import fields
+import heapq
+import logging
+from logging import Logger
+import os
+from pathlib import Path
+import pickle
+from threading import RLock
+from typing import BinaryIO, Iterator
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.constants.common import EMPTY_STRING
+from core.exceptions.rss import StaleItemError
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssQueryService, IRssStorageService
+from core.mixins.save import BatchSaveMixin
+from core.models.feed import FeedItem
+from core.models.query import ItemQuery, SortOrder
+from core.services.rss.fingerprint import create_fingerprint
+from core.services.rss.query import decode_cursor
+from core.utilities.datetime import UTC, DateTime, to_epoch
+from core.utilities.decorators import autosave
+from core.utilities.file import atomic_write_bytes
+from core.utilities.heap import StringHeap
+
+config = ConfigurationRoot()
+
+SUMMARIES_SUFFIX: str = ".summaries"
+# NUL is not allowed in XML, so it never appears in feed text
+FIELD_SEPARATOR: str = "\x00"
+IMAGE_SEPARATOR: str = "\x1e"
+NO_TIME: int = -(2**63)
+NAIVE: int = -(2**15)
+EMPTY_SLOT: int = -1
+HASH_SIZE: int = 16
+MIN_TABLE_SIZE: int = 1024
+MICROSECOND = timedelta(microseconds=1)
+MICROSECONDS: int = 1_000_000
+EPOCH = DateTime(1970, 1, 1, tzinfo=UTC)
+# compact the text heap on save once superseded bytes outnumber live ones by this factor
+COMPACTION_RATIO: float = 1.0
+
+# row flags
+TITLE_NONE: int = 1
+LINK_NONE: int = 2
+LINK_IS_ID: int = 4
+IMAGES_NONE: int = 8
+SUMMARY_NONE: int = 16
+FINGERPRINT_NONE: int = 32
+CONTENT_HASH_NONE: int = 64
+# the fingerprint is the one create_fingerprint derives from the row, so it is not kept
+FINGERPRINT_DERIVED: int = 128
+
+# per row columns, persisted in this order
+COLUMNS: dict[str, str] = {
+    "text_starts": "Q",
+    "text_lengths": "I",
+    "summary_starts": "Q",
+    "summary_lengths": "I",
+    "feeds": "I",
+    "published": "q",
+    "published_offsets": "h",
+    "created": "q",
+    "created_offsets": "h",
+}
+
+
+def encode_time(value: datetime | None) -> tuple[int, int]:
+    """Splits a datetime into epoch microseconds and its UTC offset in minutes"""
+    if value is None:
+        return NO_TIME, NAIVE
+    offset = value.utcoffset()
+    if offset is None:
+        # naive values are local time, as datetime.timestamp treats them
+        return round(to_epoch(value) * MICROSECONDS), NAIVE
+    return (value - EPOCH) // MICROSECOND, int(offset.total_seconds()) // 60
+
+
+def decode_time(epoch: int, offset: int) -> DateTime | None:
+    if epoch == NO_TIME:
+        return None
+    if offset == NAIVE:
+        seconds, microseconds = divmod(epoch, MICROSECONDS)
+        return DateTime.fromtimestamp(seconds).replace(microsecond=microseconds)
+    return (EPOCH + timedelta(microseconds=epoch)).astimezone(
+        timezone(timedelta(minutes=offset))
+    )
+
+
+def encode_hash(value: str | None) -> bytes | None:
+    if value is None or len(value) != HASH_SIZE * 2:
+        return None
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        return None
+
+
+class FeedItemView(FeedItem):
+    """A read-only FeedItem over one row of a ColumnarRssStorageService
+
+    Fields are decoded on access and the summary is read from disk, so a view
+    costs little more than the object itself. Pickling a view produces a
+    plain FeedItem. Removing items renumbers rows; a view follows its item
+    across the latest renumbering and raises StaleItemError once it can't.
+    """
+
+    __slots__ = ("_store", "_row", "_epoch", "_text")
+
+    _store: ColumnarRssStorageService
+    _row: int
+    _epoch: int
+    _text: list[str] | None
+
+    def __init__(self, store: ColumnarRssStorageService, row: int, epoch: int | None = None):
+        """epoch is the numbering row belongs to, the store's current one by default"""
+        self._store = store
+        self._row = row
+        self._epoch = store._epoch if epoch is None else epoch
+        self._text = None
+
+    def __reduce__(self):
+        return FeedItem, tuple(getattr(self, item_field.name) for item_field in fields(FeedItem))
+
+    def _get_row(self) -> int:
+        store = self._store
+        if self._epoch != store._epoch:
+            row = EMPTY_SLOT
+            if self._epoch == store._epoch - 1:
+                row = store._row_map[self._row]
+            if row == EMPTY_SLOT:
+                raise StaleItemError()
+            self._row, self._epoch = row, store._epoch
+        return self._row
+
+    def _get_text(self) -> list[str]:
+        if self._text is None:
+            self._text = self._store._read_text(self._get_row())
+        return self._text
+
+    @property
+    def id(self) -> str:  # type: ignore[override]
+        return self._get_text()[0]
+
+    @property
+    def title(self) -> str | None:  # type: ignore[override]
+        if self._store.flags[self._get_row()] & TITLE_NONE:
+            return None
+        return self._get_text()[1]
+
+    @property
+    def summary(self) -> str | None:  # type: ignore[override]
+        return self._store._read_summary(self._get_row())
+
+    @property
+    def images(self) -> list[str] | None:  # type: ignore[override]
+        if self._store.flags[self._get_row()] & IMAGES_NONE:
+            return None
+        images = self._get_text()[3]
+        return images.split(IMAGE_SEPARATOR) if images else []
+
+    @property
+    def link(self) -> str | None:  # type: ignore[override]
+        flags = self._store.flags[self._get_row()]
+        if flags & LINK_NONE:
+            return None
+        if flags & LINK_IS_ID:
+            return self.id
+        return self._get_text()[2]
+
+    @property
+    def published(self) -> DateTime | None:  # type: ignore[override]
+        store, row = self._store, self._get_row()
+        return decode_time(store.published[row], store.published_offsets[row])
+
+    @property
+    def feed_url(self) -> str:  # type: ignore[override]
+        return self._store.feed_urls[self._store.feeds[self._get_row()]]
+
+    @property
+    def read(self) -> bool:  # type: ignore[override]
+        return bool(self._store.read[self._get_row()])
+
+    @property
+    def created(self) -> DateTime | None:  # type: ignore[override]
+        store, row = self._store, self._get_row()
+        return decode_time(store.created[row], store.created_offsets[row])
+
+    @property
+    def fingerprint(self) -> str | None:  # type: ignore[override]
+        row = self._get_row()
+        flags = self._store.flags[row]
+        if flags & FINGERPRINT_NONE:
+            return None
+        if flags & FINGERPRINT_DERIVED:
+            return create_fingerprint(self.link, self.title, self.published)
+        return self._store.fingerprints.get(row)
+
+    @property
+    def content_hash(self) -> str | None:  # type: ignore[override]
+        store, row = self._store, self._get_row()
+        if store.flags[row] & CONTENT_HASH_NONE:
+            return None
+        return store.hashes[row * HASH_SIZE : (row + 1) * HASH_SIZE].hex()
+
+
+class ColumnarRssStorageService(BatchSaveMixin, IRssStorageService, IRssQueryService, ISave):
+    """Holds stored items as columns instead of one FeedItem object per item
+
+    Ids, titles, links and images are packed into one UTF-8 heap, feed urls are
+    interned to integer ids, dates are epoch microseconds in arrays and
+    summaries stay on disk until read. Items are handed out as FeedItemView
+    objects decoded on access. The columns are pickled to the storage file on
+    save; summaries are appended to a sidecar file as they are stored.
+    """
+
+    log: Logger
+    text: StringHeap
+    text_starts: array
+    text_lengths: array
+    summary_starts: array
+    summary_lengths: array
+    feeds: array
+    published: array
+    published_offsets: array
+    created: array
+    created_offsets: array
+    read: bytearray
+    flags: bytearray
+    hashes: bytearray
+    feed_urls: list[str]
+    feed_ids: dict[str, int]
+    # fingerprints that are not derived from their row, rare enough to keep by row
+    fingerprints: dict[int, str]
+    _table: array
+    _summary_file: BinaryIO | None
+    _summary_size: int
+    # bumped whenever summaries are compacted into a new sidecar file
+    _summary_generation: int
+    _summary_garbage: int
+    _stale_summaries: list[Path]
+    _garbage: int
+    # bumped when removing items renumbers rows; _row_map takes the previous rows to the current ones
+    _epoch: int
+    _row_map: array
+    _lock: RLock
+
+    @property
+    def settings(self) -> FileStorageSettings:
+        return config.get_config(FileStorageSettings)
+
+    @property
+    def file_path(self) -> Path:
+        return self.settings.storage_file_path
+
+    @property
+    def summaries_path(self) -> Path:
+        name = self.file_path.name + SUMMARIES_SUFFIX
+        if self._summary_generation:
+            name += f".{self._summary_generation}"
+        return self.file_path.with_name(name)
+
+    @property
+    def count(self) -> int:
+        return len(self.read)
+
+    def __init__(self):
+        self.log = logging.getLogger(ColumnarRssStorageService.__name__)
+        self._lock = RLock()
+        self._summary_file = None
+        self._stale_summaries = []
+        self.load()
+
+    def load(self) -> None:
+        with self._lock:
+            self.close()
+            state = pickle.loads(self.file_path.read_bytes()) if self.file_path.exists() else {}
+            for name, typecode in COLUMNS.items():
+                setattr(self, name, state.get(name, array(typecode)))
+            self.read = state.get("read", bytearray())
+            self.flags = state.get("flags", bytearray())
+            self.hashes = state.get("hashes", bytearray())
+            self.fingerprints = state.get("fingerprints", {})
+            self.text = StringHeap(state.get("text"))
+            self.feed_urls = state.get("feed_urls", [])
+            self.feed_ids = {feed_url: index for index, feed_url in enumerate(self.feed_urls)}
+            self._summary_size = state.get("summary_size", 0)
+            self._summary_generation = state.get("summary_generation", 0)
+            self._summary_garbage = state.get("summary_garbage", 0)
+            self._garbage = state.get("garbage", 0)
+            self._epoch = state.get("epoch", 0)
+            self._row_map = state.get("row_map", array("i"))
+            self._open_summaries()
+            self._build_table(self.count)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._summary_file is not None:
+                self._summary_file.close()
+                self._summary_file = None
+
+    def get_stored_items(self) -> list[FeedItem]:
+        with self._lock:
+            return [FeedItemView(self, row) for row in range(self.count)]
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        with self._lock:
+            row = self._find(item_id)
+            return None if row == EMPTY_SLOT else FeedItemView(self, row)
+
+    def contains(self, item_id: str) -> bool:
+        with self._lock:
+            return self._find(item_id) != EMPTY_SLOT
+
+    @autosave
+    def update_feed_item(self, item: FeedItem) -> None:
+        with self._lock:
+            row = self._find(item.id)
+            if row == EMPTY_SLOT:
+                self._add(item)
+            else:
+                self._garbage += self.text_lengths[row]
+                self._summary_garbage += self.summary_lengths[row]
+                self._set(row, item)
+
+    @autosave
+    def store_feed_item(self, item: FeedItem) -> None:
+        self.store_feed_items([item])
+
+    @autosave
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        with self._lock:
+            for item in items:
+                if self._find(item.id) == EMPTY_SLOT:
+                    self._add(item)
+
+    @autosave
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        with self._lock:
+            removed = {self._find(item_id) for item_id in item_ids} - {EMPTY_SLOT}
+            if not removed:
+                return
+            for row in removed:
+                self._garbage += self.text_lengths[row]
+                self._summary_garbage += self.summary_lengths[row]
+            self._keep_rows([row for row in range(self.count) if row not in removed])
+
+    @autosave
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        with self._lock:
+            changed = []
+            for item_id in item_ids:
+                row = self._find(item_id)
+                if row != EMPTY_SLOT and self.read[row] != read:
+                    self.read[row] = read
+                    changed.append(item_id)
+            return changed
+
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        with self._lock:
+            rows = self._query_rows(query)
+            # the rows are numbered as of now, views built later must still map from this numbering
+            epoch = self._epoch
+        return (FeedItemView(self, row, epoch) for row in rows)
+
+    def save(self) -> None:
+        with self._lock:
+            if self._needs_compaction():
+                self.compact()
+            if self._summary_file is not None:
+                self._summary_file.flush()
+                os.fsync(self._summary_file.fileno())
+            state = {name: getattr(self, name) for name in COLUMNS}
+            state.update(
+                read=self.read,
+                flags=self.flags,
+                hashes=self.hashes,
+                fingerprints=self.fingerprints,
+                text=self.text.data,
+                feed_urls=self.feed_urls,
+                summary_size=self._summary_size,
+                summary_generation=self._summary_generation,
+                summary_garbage=self._summary_garbage,
+                garbage=self._garbage,
+                epoch=self._epoch,
+                row_map=self._row_map,
+            )
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+            atomic_write_bytes(self.file_path, data)
+            self._drop_stale_summaries()
+
+    def compact(self) -> None:
+        """Rewrites the text heap and summaries without what updates and removals left behind
+
+        Summaries go to a new sidecar file, so a reader of the last saved state
+        keeps valid offsets; the old file is deleted once the new state is saved.
+        """
+        with self._lock:
+            text = StringHeap()
+            for row in range(self.count):
+                self.text_starts[row], _ = text.append_bytes(
+                    self.text.get_bytes(self.text_starts[row], self.text_lengths[row])
+                )
+            self.text = text
+            self._garbage = 0
+            if self._summary_garbage:
+                self._compact_summaries()
+
+    def _needs_compaction(self) -> bool:
+        live_text = len(self.text) - self._garbage
+        live_summaries = self._summary_size - self._summary_garbage
+        return (
+            self._garbage > live_text * COMPACTION_RATIO
+            or self._summary_garbage > live_summaries * COMPACTION_RATIO
+        )
+
+    def _compact_summaries(self) -> None:
+        source = self._summary_file
+        self._stale_summaries.append(self.summaries_path)
+        self._summary_generation += 1
+        size = 0
+        with open(self.summaries_path, "wb") as summaries:
+            for row in range(self.count):
+                length = self.summary_lengths[row]
+                if length == 0:
+                    continue
+                source.seek(self.summary_starts[row])  # type: ignore
+                summaries.write(source.read(length))  # type: ignore
+                self.summary_starts[row] = size
+                size += length
+            summaries.flush()
+            os.fsync(summaries.fileno())
+        source.close()  # type: ignore
+        self._summary_size = size
+        self._summary_garbage = 0
+        self._open_summaries()
+
+    def _drop_stale_summaries(self) -> None:
+        for path in self._stale_summaries:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                # still open elsewhere on platforms that refuse to delete open files
+                self.log.warning("could not delete '%s': %s", path.as_posix(), e)
+        self._stale_summaries = []
+
+    def _keep_rows(self, rows: list[int]) -> None:
+        """Drops every row not listed, renumbering the rest in the order given"""
+        row_map = array("i", [EMPTY_SLOT]) * self.count
+        for new_row, row in enumerate(rows):
+            row_map[row] = new_row
+        for name, typecode in COLUMNS.items():
+            column = getattr(self, name)
+            setattr(self, name, array(typecode, [column[row] for row in rows]))
+        self.read = bytearray(self.read[row] for row in rows)
+        self.flags = bytearray(self.flags[row] for row in rows)
+        hashes = self.hashes
+        self.hashes = bytearray().join(
+            hashes[row * HASH_SIZE : (row + 1) * HASH_SIZE] for row in rows
+        )
+        self.fingerprints = {
+            index: self.fingerprints[row]
+            for index, row in enumerate(rows)
+            if row in self.fingerprints
+        }
+        self._build_table(len(rows))
+        self._row_map = row_map
+        self._epoch += 1
+
+    def _add(self, item: FeedItem) -> None:
+        row = self.count
+        for name in COLUMNS:
+            getattr(self, name).append(0)
+        self.read.append(0)
+        self.flags.append(0)
+        self.hashes.extend(bytes(HASH_SIZE))
+        self._set(row, item)
+        self._insert(item.id, row)
+
+    def _set(self, row: int, item: FeedItem) -> None:
+        flags = 0
+        if item.title is None:
+            flags |= TITLE_NONE
+        if item.link is None:
+            flags |= LINK_NONE
+        elif item.link == item.id:
+            flags |= LINK_IS_ID
+        if item.images is None:
+            flags |= IMAGES_NONE
+        if item.summary is None:
+            flags |= SUMMARY_NONE
+        link = EMPTY_STRING if flags & (LINK_NONE | LINK_IS_ID) else item.link
+        record = FIELD_SEPARATOR.join(
+            (
+                item.id,
+                item.title or EMPTY_STRING,
+                link or EMPTY_STRING,
+                IMAGE_SEPARATOR.join(item.images or []),
+            )
+        )
+        self.text_starts[row], self.text_lengths[row] = self.text.append(record)
+        self.summary_starts[row], self.summary_lengths[row] = self._write_summary(item.summary)
+        feed_id = self.feed_ids.get(item.feed_url)
+        if feed_id is None:
+            feed_id = len(self.feed_urls)
+            self.feed_urls.append(item.feed_url)
+            self.feed_ids[item.feed_url] = feed_id
+        self.feeds[row] = feed_id
+        self.published[row], self.published_offsets[row] = encode_time(item.published)
+        self.created[row], self.created_offsets[row] = encode_time(item.created)
+        self.read[row] = int(item.read)
+        self.fingerprints.pop(row, None)
+        if item.fingerprint is None:
+            flags |= FINGERPRINT_NONE
+        elif item.fingerprint == create_fingerprint(item.link, item.title, item.published):
+            flags |= FINGERPRINT_DERIVED
+        else:
+            self.fingerprints[row] = item.fingerprint
+        content_hash = encode_hash(item.content_hash)
+        if content_hash is None:
+            flags |= CONTENT_HASH_NONE
+            content_hash = bytes(HASH_SIZE)
+        self.hashes[row * HASH_SIZE : (row + 1) * HASH_SIZE] = content_hash
+        self.flags[row] = flags
+
+    def _read_text(self, row: int) -> list[str]:
+        return self.text.get(self.text_starts[row], self.text_lengths[row]).split(FIELD_SEPARATOR, 3)
+
+    def _item_id(self, row: int) -> str:
+        start = self.text_starts[row]
+        end = self.text.data.find(FIELD_SEPARATOR.encode(), start, start + self.text_lengths[row])
+        return self.text.data[start : end].decode("utf-8")
+
+    def _open_summaries(self) -> None:
+        if not self.summaries_path.exists():
+            self.summaries_path.touch()
+        self._summary_file = open(self.summaries_path, "r+b")
+        size = self._summary_file.seek(0, os.SEEK_END)
+        if size > self._summary_size:
+            # appended after the last save, nothing refers to it
+            self._summary_file.truncate(self._summary_size)
+
+    def _write_summary(self, summary: str | None) -> tuple[int, int]:
+        if not summary:
+            return 0, 0
+        data = summary.encode("utf-8")
+        start = self._summary_size
+        self._summary_file.seek(start)  # type: ignore
+        self._summary_file.write(data)  # type: ignore
+        self._summary_size += len(data)
+        return start, len(data)
+
+    def _read_summary(self, row: int) -> str | None:
+        with self._lock:
+            if self.flags[row] & SUMMARY_NONE:
+                return None
+            length = self.summary_lengths[row]
+            if length == 0:
+                return EMPTY_STRING
+            self._summary_file.seek(self.summary_starts[row])  # type: ignore
+            return self._summary_file.read(length).decode("utf-8")  # type: ignore
+
+    def _build_table(self, rows: int) -> None:
+        size = MIN_TABLE_SIZE
+        while size < rows * 2:
+            size *= 2
+        self._table = array("i", [EMPTY_SLOT]) * size
+        for row in range(rows):
+            self._insert(self._item_id(row), row)
+
+    def _hash(self, item_id: str) -> int:
+        return hash(item_id)
+
+    def _find(self, item_id: str) -> int:
+        table = self._table
+        mask = len(table) - 1
+        slot = self._hash(item_id) & mask
+        while True:
+            row = table[slot]
+            if row == EMPTY_SLOT or self._item_id(row) == item_id:
+                return row
+            slot = (slot + 1) & mask
+
+    def _insert(self, item_id: str, row: int) -> None:
+        if (row + 1) * 2 > len(self._table):
+            self._build_table(row)
+        table = self._table
+        mask = len(table) - 1
+        slot = self._hash(item_id) & mask
+        while table[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        table[slot] = row
+
+    def _query_rows(self, query: ItemQuery) -> list[int]:
+        published = self.published
+        rows: range | list[int] = range(self.count)
+        if query.feed_urls is not None:
+            feed_ids = {self.feed_ids[url] for url in query.feed_urls if url in self.feed_ids}
+            feeds = self.feeds
+            rows = [row for row in rows if feeds[row] in feed_ids]
+        if query.read is not None:
+            read = self.read
+            wanted = int(query.read)
+            rows = [row for row in rows if read[row] == wanted]
+        if query.published_after is not None:
+            after = encode_time(query.published_after)[0]
+            rows = [row for row in rows if published[row] != NO_TIME and published[row] >= after]
+        if query.published_before is not None:
+            before = encode_time(query.published_before)[0]
+            rows = [row for row in rows if published[row] != NO_TIME and published[row] < before]
+        newest_first = query.order == SortOrder.NEWEST_FIRST
+        if query.cursor is not None:
+            position = self._cursor_position(query.cursor)
+            rows = [
+                row
+                for row in rows
+                if (self._sort_key(row) < position if newest_first else self._sort_key(row) > position)
+            ]
+        if query.limit is not None and query.limit < len(rows):
+            select = heapq.nlargest if newest_first else heapq.nsmallest
+            top = select(query.limit, rows, key=published.__getitem__)
+            if not top:
+                return []
+            # rows sharing the boundary date may sort before the ones picked, by id
+            boundary = published[top[-1]]
+            chosen = set(top)
+            rows = top + [row for row in rows if published[row] == boundary and row not in chosen]
+        rows = sorted(rows, key=self._sort_key, reverse=newest_first)
+        return rows if query.limit is None else rows[: query.limit]
+
+    def _sort_key(self, row: int) -> tuple[int, str]:
+        # NO_TIME is the smallest value, so items without a date sort first ascending
+        return self.published[row], self._item_id(row)
+
+    def _cursor_position(self, cursor: str) -> tuple[int, str]:
+        published, item_id = decode_cursor(cursor)
+        if published is None:
+            return NO_TIME, item_id
+        return round(published * MICROSECONDS), item_id
@@ -0,0 +1,157 @@
+"""Unread counters per feed and per OPML category, kept by deltas and persisted
+
+Whoever changes items reports how many stored and unread items each feed
+gained or lost; reading a count never looks at the items. The per-feed counts
+are saved as JSON beside the storage file, so badges are available right after
+a restart, before any item is loaded.
+"""
+
+from collections import Counter
+import logging
+from logging import Logger
+from pathlib import Path
+from threading import RLock
+from typing import Iterable
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.constants.common import SLASH
+from core.interfaces.common import ISave
+from core.mixins.save import BatchSaveMixin
+from core.models.counters import UnreadSummary
+from core.models.feed import Feed, FeedItem
+from core.utilities import json
+from core.utilities.decorators import autosave
+from core.utilities.file import atomic_write_bytes
+
+config = ConfigurationRoot()
+
+COUNTERS_SUFFIX: str = ".counters"
+UNREAD: str = "unread"
+STORED: str = "stored"
+
+
+def category_paths(category: str) -> list[str]:
+    """A category and every folder above it: "a/b/c" -> ["a", "a/b", "a/b/c"]"""
+    name = category.strip(SLASH)
+    if not name:
+        return []
+    parts = name.split(SLASH)
+    return [SLASH.join(parts[: index + 1]) for index in range(len(parts))]
+
+
+def count_items(items: Iterable[FeedItem]) -> tuple[Counter[str], Counter[str]]:
+    """(unread, stored) item counts per feed url"""
+    unread: Counter[str] = Counter()
+    stored: Counter[str] = Counter()
+    for item in items:
+        stored[item.feed_url] += 1
+        if not item.read:
+            unread[item.feed_url] += 1
+    return unread, stored
+
+
+class UnreadCounters(BatchSaveMixin, ISave):
+    """Stored and unread item counts per feed url, and unread counts per category
+
+    Category counts are derived from the feed counts and the feeds' categories,
+    then changed by the same deltas, so they are never summed on read.
+    """
+
+    unread: Counter[str]
+    stored: Counter[str]
+    categories: Counter[str]
+    # feed url -> the category and the folders above it
+    feed_categories: dict[str, list[str]]
+    log: Logger
+    _lock: RLock
+
+    @property
+    def file_path(self) -> Path:
+        storage_file_path = config.get_config(FileStorageSettings).storage_file_path
+        return storage_file_path.with_name(storage_file_path.name + COUNTERS_SUFFIX)
+
+    @property
+    def exists(self) -> bool:
+        """whether the counts were saved before, rather than starting from zero"""
+        return self.file_path.exists()
+
+    def __init__(self, feeds: Iterable[Feed] = ()):
+        self.log = logging.getLogger(UnreadCounters.__name__)
+        self._lock = RLock()
+        self.feed_categories = {}
+        self.load()
+        self.set_feeds(feeds)
+
+    def load(self) -> None:
+        with self._lock:
+            if self.file_path.exists():
+                counts = json.loads(self.file_path.read_bytes())
+                self.unread = Counter(counts[UNREAD])
+                self.stored = Counter(counts[STORED])
+            else:
+                self.unread = Counter()
+                self.stored = Counter()
+            self._count_categories()
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps({UNREAD: dict(+self.unread), STORED: dict(+self.stored)})
+        atomic_write_bytes(self.file_path, data)
+
+    def set_feeds(self, feeds: Iterable[Feed]) -> None:
+        """Assigns feeds to their OPML categories, counting the categories again if any moved"""
+        feed_categories = {feed.url: category_paths(feed.category) for feed in feeds}
+        with self._lock:
+            if feed_categories != self.feed_categories:
+                self.feed_categories = feed_categories
+                self._count_categories()
+
+    def get_unread_count(self, feed_url: str) -> int:
+        return self.unread[feed_url]
+
+    def get_category_unread_count(self, category: str) -> int:
+        return self.categories[category.strip(SLASH)]
+
+    @autosave
+    def apply(self, unread: Counter[str], stored: Counter[str] | None = None) -> None:
+        """Adds per-feed deltas, negative for items read or removed
+
+        Args:
+            unread (Counter[str]): the change in unread items per feed url
+            stored (Counter[str] | None, optional): the change in stored items per feed url. Defaults to None.
+        """
+        with self._lock:
+            self.unread.update(unread)
+            if stored is not None:
+                self.stored.update(stored)
+            for feed_url, delta in unread.items():
+                for category in self.feed_categories.get(feed_url, ()):
+                    self.categories[category] += delta
+
+    @autosave
+    def reset(self, unread: Counter[str], stored: Counter[str]) -> None:
+        """Replaces every count, after the items were counted from scratch"""
+        with self._lock:
+            if unread != +self.unread or stored != +self.stored:
+                self.log.info("unread counts did not match the stored items, replacing them")
+            self.unread = Counter(unread)
+            self.stored = Counter(stored)
+            self._count_categories()
+
+    def summary(self) -> UnreadSummary:
+        with self._lock:
+            feeds = {feed_url: count for feed_url, count in self.unread.items() if count}
+            return UnreadSummary(
+                unread=sum(feeds.values()),
+                total=sum(self.stored.values()),
+                feeds=feeds,
+                categories={category: count for category, count in self.categories.items() if count},
+            )
+
+    def _count_categories(self) -> None:
+        self.categories = Counter()
+        for feed_url, categories in self.feed_categories.items():
+            count = self.unread[feed_url]
+            for category in categories:
+                self.categories[category] += count
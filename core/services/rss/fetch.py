@@ -0,0 +1,205 @@
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import gzip
+from http.client import HTTPException
+import logging
+from logging import Logger
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
+import time
+from typing import Iterable, Iterator
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+import zlib
+
+from core.config.common import config
+from core.config.fetch import FetchSettings
+from core.models.feed import Feed
+from core.models.fetch import FetchResult
+
+ACCEPT = "Accept"
+ACCEPT_ENCODING = "Accept-Encoding"
+CONTENT_ENCODING = "Content-Encoding"
+ETAG = "ETag"
+IF_MODIFIED_SINCE = "If-Modified-Since"
+IF_NONE_MATCH = "If-None-Match"
+LAST_MODIFIED = "Last-Modified"
+USER_AGENT = "User-Agent"
+
+ACCEPT_FEEDS = "application/atom+xml,application/rss+xml,application/rdf+xml,application/xml;q=0.9,text/xml;q=0.8,*/*;q=0.1"
+GZIP = "gzip"
+DEFLATE = "deflate"
+URL_SCHEMES = ("http", "https", "file", "ftp")
+
+
+class FeedFetcher:
+    """Downloads raw feed documents, leaving parsing to the caller
+
+    Concurrency is bounded globally by the size of the thread pool and per
+    host by per_host_limit. fetch_all hands a host's feeds to the pool only
+    as that host's fetches finish, so a single slow publisher can't hold
+    every worker; single fetches are bounded by a semaphore per host.
+    """
+
+    log: Logger
+    _host_locks: dict[str, BoundedSemaphore]
+    _host_locks_lock: Lock
+
+    def __init__(self, settings: FetchSettings | None = None):
+        self.log = logging.getLogger(FeedFetcher.__name__)
+        if settings is not None:
+            self.settings = settings
+        self._host_locks = {}
+        self._host_locks_lock = Lock()
+
+    @property
+    def settings(self) -> FetchSettings:
+        return config.get_config(FetchSettings, True)
+
+    @settings.setter
+    def settings(self, settings: FetchSettings) -> None:
+        config.set_config(FetchSettings, settings)
+
+    def fetch_feed(self, feed: Feed) -> FetchResult:
+        return self.fetch(feed.url, etag=feed.etag, modified=feed.modified)
+
+    def fetch(
+        self, url: str, etag: str | None = None, modified: str | None = None
+    ) -> FetchResult:
+        with self._host_lock(url):
+            return self._fetch(url, etag, modified)
+
+    def fetch_all(self, feeds: Iterable[Feed]) -> Iterator[tuple[Feed, FetchResult]]:
+        """Fetches feeds concurrently, yielding results in the order the feeds were given
+
+        Feeds are pulled from the iterable as workers free up, so a generator can
+        keep producing feeds while the first ones are already downloading. Feeds
+        of a host that already has per_host_limit fetches running wait in a
+        queue of that host, rather than in a worker.
+        """
+        settings = self.settings
+        window = max(settings.max_concurrency, 1) * 4
+        per_host_limit = max(settings.per_host_limit, 1)
+        pending: deque[tuple[Feed, Future[FetchResult]]] = deque()
+        lock = Lock()
+        running: Counter[str] = Counter()
+        waiting: dict[str, deque[tuple[Feed, Future[FetchResult]]]] = {}
+        stopped = False
+
+        with ThreadPoolExecutor(
+            max_workers=max(settings.max_concurrency, 1),
+            thread_name_prefix=FeedFetcher.__name__,
+        ) as executor:
+
+            def start(host: str, feed: Feed, future: Future[FetchResult]) -> None:
+                # called holding lock
+                running[host] += 1
+                executor.submit(run, host, feed, future)
+
+            def run(host: str, feed: Feed, future: Future[FetchResult]) -> None:
+                try:
+                    future.set_result(self.fetch_feed(feed))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    with lock:
+                        running[host] -= 1
+                        queue = waiting.get(host)
+                        if queue and not stopped:
+                            start(host, *queue.popleft())
+                        elif not queue:
+                            waiting.pop(host, None)
+                            if not running[host]:
+                                del running[host]
+
+            try:
+                for feed in feeds:
+                    future: Future[FetchResult] = Future()
+                    pending.append((feed, future))
+                    host = get_host(feed.url)
+                    with lock:
+                        if running[host] < per_host_limit:
+                            start(host, feed, future)
+                        else:
+                            waiting.setdefault(host, deque()).append((feed, future))
+                    if len(pending) >= window:
+                        feed, future = pending.popleft()
+                        yield feed, future.result()
+                while pending:
+                    feed, future = pending.popleft()
+                    yield feed, future.result()
+            finally:
+                # the caller stopped early, don't start the feeds still queued
+                with lock:
+                    stopped = True
+
+    def _host_lock(self, url: str) -> BoundedSemaphore:
+        host = get_host(url)
+        with self._host_locks_lock:
+            lock = self._host_locks.get(host)
+            if lock is None:
+                lock = BoundedSemaphore(max(self.settings.per_host_limit, 1))
+                self._host_locks[host] = lock
+            return lock
+
+    def _fetch(self, url: str, etag: str | None, modified: str | None) -> FetchResult:
+        started = time.perf_counter()
+        result = FetchResult(url=url)
+        try:
+            if urlsplit(url).scheme.lower() not in URL_SCHEMES:
+                result.content = Path(url).read_bytes()
+                result.status = 200
+            else:
+                self._fetch_url(result, etag, modified)
+        except HTTPError as e:
+            result.status = e.code
+            result.headers = dict(e.headers.items()) if e.headers else {}
+            result.etag = result.headers.get(ETAG, etag)
+            result.modified = result.headers.get(LAST_MODIFIED, modified)
+        # a body cut short raises IncompleteRead (an HTTPException), or EOFError or zlib.error once decompressed
+        except (URLError, OSError, ValueError, HTTPException, EOFError, zlib.error) as e:
+            self.log.warning("failed to fetch '%s': %s", url, e)
+            result.error = e
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def _fetch_url(
+        self, result: FetchResult, etag: str | None, modified: str | None
+    ) -> None:
+        settings = self.settings
+        request = Request(result.url)
+        request.add_header(USER_AGENT, settings.user_agent)
+        request.add_header(ACCEPT, ACCEPT_FEEDS)
+        request.add_header(ACCEPT_ENCODING, f"{GZIP}, {DEFLATE}")
+        if etag:
+            request.add_header(IF_NONE_MATCH, etag)
+        if modified:
+            request.add_header(IF_MODIFIED_SINCE, modified)
+        with urlopen(request, timeout=settings.timeout) as response:
+            result.status = getattr(response, "status", None) or 200
+            result.location = response.geturl()
+            result.headers = dict(response.headers.items())
+            result.content = decode_content(
+                response.read(), result.headers.get(CONTENT_ENCODING)
+            )
+        result.etag = result.headers.get(ETAG)
+        result.modified = result.headers.get(LAST_MODIFIED)
+
+
+def get_host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def decode_content(content: bytes, encoding: str | None) -> bytes:
+    if not encoding:
+        return content
+    encoding = encoding.lower()
+    if encoding == GZIP:
+        return gzip.decompress(content)
+    if encoding == DEFLATE:
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    return content
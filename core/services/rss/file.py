@@ -1,21 +1,35 @@
 import logging
+import os
 from pathlib import Path
 
 from core.config.common import ConfigurationRoot
 from core.config.file import FileStorageSettings
 from core.interfaces.common import ISave
 from core.interfaces.rss import IRssStorageService
+from core.mixins.save import BatchSaveMixin
 from core.models.feed import FeedItem
 from core.utilities.decorators import autosave
-from core.utilities.file import file_modification_date
+from core.utilities.file import atomic_write_bytes, file_modification_date
 from core.utilities.datetime import DateTime
+from core.utilities.save import get_save_coalescer
 
 config = ConfigurationRoot()
 
 
-class RssReaderStorage(ISave, IRssStorageService):
+class RssReaderStorage(BatchSaveMixin, ISave, IRssStorageService):
+    """Stores every item in one JSON array, rewritten on each save
+
+    The cache is tied to the file's identity, modification time and size, so
+    a file changed by another process is read again once per change rather
+    than on every call, and never while changes of this instance are waiting
+    to be saved.
+    """
+
     last_read: DateTime
     cache: list[FeedItem]
+    # id -> item over the cache, so lookups and updates don't scan it
+    index: dict[str, FeedItem]
+    _identity: tuple[int, int, int] | None
 
     @property
     def settings(self) -> FileStorageSettings:
@@ -35,20 +49,41 @@ class RssReaderStorage(ISave, IRssStorageService):
     def load(self) -> None:
         if not self.file_path.exists():
             self.cache = []
+            self.index = {}
             self.save()
             self.last_read = DateTime.now()
         else:
             self.last_read = self.get_last_modified()
-            self.cache = FeedItem.schema().loads(self.file_path.read_text())
+            self._read()
 
     def get_stored_items(self) -> list[FeedItem]:
-        if not self.file_path.exists():
+        if get_save_coalescer(self).pending:
+            # reading the file again would drop the changes waiting to be saved
+            return self.cache
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
             self.cache = []
+            self.index = {}
+            self._identity = None
             return self.cache
-        if self.get_last_modified() > self.last_read:
-            return FeedItem.schema().loads(self.file_path.read_text())
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._identity:
+            self.last_read = self.get_last_modified()
+            self._read()
+        return self.cache
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        self.get_stored_items()
+        return self.index.get(item_id)
+
+    @autosave
+    def update_feed_item(self, item: FeedItem) -> None:
+        self.get_stored_items()
+        cached_item = self.index.get(item.id)
+        if cached_item is None:
+            self.store_feed_item(item)
         else:
-            return self.cache
+            cached_item.update(item)
 
     @autosave
     def store_feed_item(self, item: FeedItem) -> None:
@@ -56,12 +91,46 @@ class RssReaderStorage(ISave, IRssStorageService):
 
     @autosave
     def store_feed_items(self, items: list[FeedItem]) -> None:
-        stored_items = self.get_stored_items()
-        self.cache = stored_items + [
-            item
-            for item in items
-            if item.id not in [stored_item.id for stored_item in stored_items]
-        ]
+        self.get_stored_items()
+        new_items = []
+        for item in items:
+            if item.id not in self.index:
+                self.index[item.id] = item
+                new_items.append(item)
+        self.cache = self.cache + new_items
+
+    @autosave
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        removed = set(item_ids)
+        self.cache = [item for item in self.get_stored_items() if item.id not in removed]
+        for item_id in removed:
+            self.index.pop(item_id, None)
+
+    @autosave
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        self.get_stored_items()
+        changed = []
+        for item_id in dict.fromkeys(item_ids):
+            item = self.index.get(item_id)
+            if item is not None and item.read != read:
+                item.read = read
+                changed.append(item_id)
+        return changed
 
     def save(self) -> None:
-        self.file_path.write_text(FeedItem.schema().dumps(self.cache))
+        atomic_write_bytes(self.file_path, FeedItem.iter_to_json(self.cache))
+        self._identity = self._file_identity()
+
+    def _read(self) -> None:
+        with open(self.file_path, "rb") as json_file:
+            identity = self._file_identity(json_file.fileno())
+            self.cache = FeedItem.json_to_list(json_file.read())
+        self.index = {}
+        for item in self.cache:
+            # the first copy of an id wins, as it did when lookups scanned the list
+            self.index.setdefault(item.id, item)
+        self._identity = identity
+
+    def _file_identity(self, descriptor: int | None = None) -> tuple[int, int, int]:
+        stat = os.stat(self.file_path) if descriptor is None else os.fstat(descriptor)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
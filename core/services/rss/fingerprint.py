@@ -0,0 +1,89 @@
+"""Stable identities and change detection for feed items and feed documents"""
+
+from datetime import datetime
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.constants.common import EMPTY_STRING
+from core.models.feed import FeedItem
+from core.utilities.datetime import to_epoch
+
+DIGEST_SIZE: int = 16
+SEPARATOR: str = "\x1f"
+WHITESPACE = re.compile(r"\s+")
+DEFAULT_PORTS: dict[str, int] = {"http": 80, "https": 443}
+# query parameters added by mailing lists and analytics that do not change the target
+TRACKING_PARAMETERS: tuple[str, ...] = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def normalize_link(link: str | None) -> str:
+    """Lowercases scheme and host, drops default ports, fragments and tracking parameters"""
+    if not link:
+        return EMPTY_STRING
+    try:
+        parts = urlsplit(link.strip())
+        port = parts.port
+    except ValueError:
+        return link.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or EMPTY_STRING).lower()
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    query = urlencode(
+        [
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith(TRACKING_PARAMETERS)
+        ]
+    )
+    return urlunsplit((scheme, host, parts.path.rstrip("/") or "/", query, EMPTY_STRING))
+
+
+def normalize_text(text: str | None) -> str:
+    if not text:
+        return EMPTY_STRING
+    return WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def normalize_published(published: datetime | None) -> str:
+    if published is None:
+        return EMPTY_STRING
+    return str(int(to_epoch(published)))
+
+
+def digest(*parts: str) -> str:
+    return hashlib.blake2b(SEPARATOR.join(parts).encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def create_fingerprint(link: str | None, title: str | None, published: datetime | None) -> str:
+    """Identifies an entry by what it points to, whatever GUID the publisher gave it"""
+    return digest(normalize_link(link), normalize_text(title), normalize_published(published))
+
+
+def create_content_hash(item: FeedItem) -> str:
+    """Changes whenever anything a reader would see in the item changes"""
+    return digest(
+        item.title or EMPTY_STRING,
+        item.summary or EMPTY_STRING,
+        item.link or EMPTY_STRING,
+        SEPARATOR.join(item.images or []),
+        normalize_published(item.published),
+    )
+
+
+def item_fingerprint(item: FeedItem) -> str:
+    """The stored fingerprint, computed for items stored before fingerprints existed"""
+    if item.fingerprint is None:
+        return create_fingerprint(item.link, item.title, item.published)
+    return item.fingerprint
+
+
+def item_content_hash(item: FeedItem) -> str:
+    if item.content_hash is None:
+        return create_content_hash(item)
+    return item.content_hash
+
+
+def body_digest(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=DIGEST_SIZE).hexdigest()
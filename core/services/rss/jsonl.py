@@ -0,0 +1,268 @@
+"""A JSON Lines item store that several processes can share
+
+Every change appends one line, an item in the camelCase JSON of FeedItem or a
+removal marker, under an exclusive lock on a sidecar lock file. A process
+reading the store checks the file's identity and size; when another process
+has appended, it reads only the new lines, and when the file was replaced by
+a compaction, it reads the file again once.
+"""
+
+import logging
+from logging import Logger
+import os
+from pathlib import Path
+from threading import RLock
+from typing import BinaryIO
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssStorageService
+from core.mixins.save import BatchSaveMixin
+from core.models.feed import FeedItem
+from core.utilities import json
+from core.utilities.decorators import autosave
+from core.utilities.file import atomic_replace, file_lock
+
+config = ConfigurationRoot()
+
+NEWLINE: bytes = b"\n"
+ARRAY_START: bytes = b"["
+REMOVED: str = "removed"
+# compact once superseded lines outnumber live items by this factor
+COMPACTION_RATIO: float = 1.0
+COMPACTION_MIN_STALE_RECORDS: int = 1024
+
+
+def encode_line(item_id: str, item: FeedItem | None) -> bytes:
+    """One line of the store: the item, or a marker for an item that was removed"""
+    record = {REMOVED: item_id} if item is None else item.to_dict()
+    return json.dumps(record) + NEWLINE
+
+
+class JsonLinesRssStorageService(BatchSaveMixin, IRssStorageService, ISave):
+    """Keeps an id -> item index, persisted as an append-only JSON Lines file
+
+    Saving appends the changed items, so it costs O(changed items) rather
+    than a rewrite of every item. Lines written by other processes are picked
+    up before each read and before each append, and later lines win. A line
+    cut short by a crash is dropped by the next writer. A file holding one
+    JSON array, as RssReaderStorage writes it, is read as well and rewritten
+    as JSON Lines on the first save.
+    """
+
+    index: dict[str, FeedItem]
+    log: Logger
+    # None marks an item removed since the last save
+    _pending: dict[str, FeedItem | None]
+    _records: int
+    _offset: int
+    _identity: tuple[int, int] | None
+    # the file holds a single JSON array rather than lines
+    _array: bool
+    _lock: RLock
+
+    @property
+    def settings(self) -> FileStorageSettings:
+        return config.get_config(FileStorageSettings)
+
+    @property
+    def file_path(self) -> Path:
+        return self.settings.storage_file_path
+
+    @property
+    def stale_records(self) -> int:
+        return self._records - len(self.index)
+
+    def __init__(self):
+        self.log = logging.getLogger(JsonLinesRssStorageService.__name__)
+        self._lock = RLock()
+        self.load()
+
+    def load(self) -> None:
+        with self._lock:
+            self.index = {}
+            self._pending = {}
+            self._records = 0
+            self._offset = 0
+            self._identity = None
+            self._array = False
+            self._sync()
+
+    def get_stored_items(self) -> list[FeedItem]:
+        with self._lock:
+            self._sync()
+            return list(self.index.values())
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        with self._lock:
+            self._sync()
+            return self.index.get(item_id)
+
+    def contains(self, item_id: str) -> bool:
+        return self.get_stored_item(item_id) is not None
+
+    @autosave
+    def update_feed_item(self, item: FeedItem) -> None:
+        with self._lock:
+            self._sync()
+            cached_item = self.index.get(item.id)
+            if cached_item is None:
+                self.index[item.id] = item
+                self._pending[item.id] = item
+            else:
+                cached_item.update(item)
+                self._pending[item.id] = cached_item
+
+    @autosave
+    def store_feed_item(self, item: FeedItem) -> None:
+        self.store_feed_items([item])
+
+    @autosave
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        with self._lock:
+            self._sync()
+            for item in items:
+                if item.id not in self.index:
+                    self.index[item.id] = item
+                    self._pending[item.id] = item
+
+    @autosave
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        with self._lock:
+            self._sync()
+            for item_id in item_ids:
+                if self.index.pop(item_id, None) is not None:
+                    self._pending[item_id] = None
+
+    @autosave
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        with self._lock:
+            self._sync()
+            changed = []
+            for item_id in item_ids:
+                item = self.index.get(item_id)
+                if item is not None and item.read != read:
+                    item.read = read
+                    self._pending[item_id] = item
+                    changed.append(item_id)
+            return changed
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            with file_lock(self.file_path):
+                # read what other processes appended, so our lines land after theirs
+                self._sync(locked=True)
+                pending, self._pending = self._pending, {}
+                if self._array:
+                    self._compact()
+                    return
+                with open(self.file_path, "ab") as jsonl_file:
+                    jsonl_file.write(b"".join(encode_line(*change) for change in pending.items()))
+                    jsonl_file.flush()
+                    os.fsync(jsonl_file.fileno())
+                self._records += len(pending)
+                self._remember_position()
+                if self._needs_compaction():
+                    self._compact()
+
+    def compact(self) -> None:
+        """Rewrites the file with one line per live item"""
+        with self._lock, file_lock(self.file_path):
+            self._sync(locked=True)
+            self._compact()
+
+    def _compact(self) -> None:
+        with atomic_replace(self.file_path) as temp_path:
+            with open(temp_path, "wb") as jsonl_file:
+                for item_id, item in self.index.items():
+                    jsonl_file.write(encode_line(item_id, item))
+        self._records = len(self.index)
+        self._array = False
+        self._remember_position()
+        self.log.debug("compacted '%s' to %d lines", self.file_path.as_posix(), self._records)
+
+    def _sync(self, locked: bool = False) -> None:
+        """Applies lines appended since the last read, or reads the file again if it was replaced
+
+        Args:
+            locked (bool, optional): the caller holds the exclusive file lock. Defaults to False.
+        """
+        if locked:
+            self._sync_file(locked)
+            return
+        with file_lock(self.file_path, exclusive=False):
+            self._sync_file(locked)
+
+    def _sync_file(self, locked: bool) -> None:
+        # opened and checked under the file lock, so a compaction can't swap the file in between
+        try:
+            jsonl_file = open(self.file_path, "rb")
+        except FileNotFoundError:
+            return
+        with jsonl_file:
+            stat = os.fstat(jsonl_file.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            if identity == self._identity and stat.st_size == self._offset:
+                return
+            if identity != self._identity or stat.st_size < self._offset:
+                # compacted by another process: start over, keeping our unsaved changes
+                self.index = {}
+                self._records = 0
+                self._offset = 0
+                self._array = False
+            self._identity = identity
+            partial = self._read_lines(jsonl_file)
+        if partial and locked:
+            # appends happen under the lock, so this is a line a crashed writer left unfinished
+            self.log.warning(
+                "'%s' ends with a partial line, truncating to %d bytes",
+                self.file_path.as_posix(),
+                self._offset,
+            )
+            os.truncate(self.file_path, self._offset)
+        for item_id, item in self._pending.items():
+            if item is None:
+                self.index.pop(item_id, None)
+            else:
+                self.index[item_id] = item
+
+    def _read_lines(self, jsonl_file: BinaryIO) -> int:
+        """Applies every complete line past the offset, returning the length of a partial last line"""
+        jsonl_file.seek(self._offset)
+        data = jsonl_file.read()
+        if self._offset == 0 and data.lstrip().startswith(ARRAY_START):
+            for item in FeedItem.iter_from_json(data):
+                self.index[item.id] = item
+            self._records = len(self.index)
+            self._offset = len(data)
+            self._array = True
+            return 0
+        end = data.rfind(NEWLINE) + 1
+        for line in data[:end].splitlines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if REMOVED in record:
+                self.index.pop(record[REMOVED], None)
+            else:
+                item = FeedItem.from_dict(record)
+                self.index[item.id] = item
+            self._records += 1
+        self._offset += end
+        return len(data) - end
+
+    def _remember_position(self) -> None:
+        stat = os.stat(self.file_path)
+        self._identity = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+
+    def _needs_compaction(self) -> bool:
+        stale = self.stale_records
+        return (
+            stale >= COMPACTION_MIN_STALE_RECORDS
+            and stale > len(self.index) * COMPACTION_RATIO
+        )
+
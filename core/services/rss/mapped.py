@@ -0,0 +1,302 @@
+"""An item store whose columns are memory-mapped from disk instead of loaded
+
+The file holds the text heap first, so text offsets are file offsets, then one
+fixed-width section per column, the id lookup table, and a trailer describing
+where each section starts. Opening a store maps the file and reads the
+trailer, so it takes the same time at ten items as at a million. Items are
+decoded when they are accessed, and every process that opens the same file
+shares its pages through the OS page cache.
+
+One process writes and any number read. The first change copies the mapped
+columns into memory, and save() writes a new file and maps it again. Readers
+keep their mapping of the old file until they notice it was replaced.
+"""
+
+from array import array
+from hashlib import blake2b
+import logging
+import mmap
+import os
+from pathlib import Path
+import pickle
+import struct
+import sys
+from typing import Iterator
+
+from core.exceptions.rss import StorageFormatError
+from core.models.feed import FeedItem
+from core.models.query import ItemQuery
+from core.services.rss.columnar import (
+    COLUMNS,
+    FIELD_SEPARATOR,
+    ColumnarRssStorageService,
+)
+from core.utilities.file import atomic_replace
+from core.utilities.heap import StringHeap
+
+MAGIC: bytes = b"FEEDMAP1"
+# columns are written in native byte order and mapped as they are
+BYTE_ORDERS: dict[str, int] = {"little": 0, "big": 1}
+TEXT: str = "text"
+# the text heap comes first so its offsets are file offsets
+SECTIONS: tuple[str, ...] = (
+    TEXT,
+    *COLUMNS,
+    "read",
+    "flags",
+    "hashes",
+    "table",
+    "row_map",
+    "feed_urls",
+    "fingerprints",
+)
+ALIGNMENT: int = 8
+INDEX_TYPECODE: str = "i"
+# the int32 sections, attributes of the columnar store but not columns
+INDEXES: dict[str, str] = {"table": "_table", "row_map": "_row_map"}
+TRAILER = struct.Struct(f"<{len(SECTIONS) * 2}Q7Q8s")
+
+
+class MappedRssStorageService(ColumnarRssStorageService):
+    """A ColumnarRssStorageService that maps its columns from the storage file
+
+    Summaries stay in the append-only sidecar file of the columnar store, which
+    readers never truncate, so offsets held by an older mapping stay valid.
+    """
+
+    _file_path: Path | None
+    _map: mmap.mmap | None
+    _views: list[memoryview]
+    _identity: tuple[int, int, int] | None
+    _text_size: int
+
+    @property
+    def file_path(self) -> Path:
+        if self._file_path is not None:
+            return self._file_path
+        return self.settings.storage_file_path
+
+    @property
+    def mapped(self) -> bool:
+        """whether the columns are still read from the mapped file, with no unsaved changes"""
+        return self._map is not None
+
+    def __init__(self, file_path: Path | None = None):
+        self._file_path = file_path
+        self._map = None
+        self._views = []
+        self._identity = None
+        super().__init__()
+        self.log = logging.getLogger(MappedRssStorageService.__name__)
+
+    def load(self) -> None:
+        with self._lock:
+            self.close()
+            if not self.file_path.exists():
+                # nothing to map, start with empty in-memory columns
+                super().load()
+                return
+            with open(self.file_path, "rb") as file:
+                stat = os.fstat(file.fileno())
+                if stat.st_size < TRAILER.size:
+                    raise StorageFormatError(self.file_path.as_posix(), "the file is truncated")
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            try:
+                self._map_sections()
+            except BaseException:
+                self._unmap()
+                raise
+            self._open_summaries()
+
+    def close(self) -> None:
+        with self._lock:
+            super().close()
+            self._unmap()
+
+    def get_stored_items(self) -> list[FeedItem]:
+        self._remap_if_replaced()
+        return super().get_stored_items()
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        self._remap_if_replaced()
+        return super().get_stored_item(item_id)
+
+    def contains(self, item_id: str) -> bool:
+        self._remap_if_replaced()
+        return super().contains(item_id)
+
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        self._remap_if_replaced()
+        return super().query_items(query)
+
+    def update_feed_item(self, item: FeedItem) -> None:
+        self._materialize()
+        super().update_feed_item(item)
+
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        self._materialize()
+        super().store_feed_items(items)
+
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        self._materialize()
+        super().remove_feed_items(item_ids)
+
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        self._materialize()
+        return super().mark_items_read(item_ids, read)
+
+    def compact(self) -> None:
+        self._materialize()
+        super().compact()
+
+    def save(self) -> None:
+        with self._lock:
+            if self.mapped:
+                return
+            if self._needs_compaction():
+                self.compact()
+            if self._summary_file is not None:
+                self._summary_file.flush()
+                os.fsync(self._summary_file.fileno())
+            with atomic_replace(self.file_path) as temp_path:
+                self._write(temp_path)
+            self._drop_stale_summaries()
+            self.load()
+
+    def _map_sections(self) -> None:
+        buffer = self._map
+        (
+            *bounds,
+            _,
+            summary_size,
+            summary_generation,
+            summary_garbage,
+            garbage,
+            epoch,
+            byte_order,
+            magic,
+        ) = TRAILER.unpack_from(
+            buffer, len(buffer) - TRAILER.size  # type: ignore
+        )
+        if magic != MAGIC:
+            raise StorageFormatError(self.file_path.as_posix(), "unknown file format")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise StorageFormatError(self.file_path.as_posix(), "written with another byte order")
+        whole = memoryview(buffer)  # type: ignore
+        self._views.append(whole)
+        sections: dict[str, memoryview] = {}
+        for index, name in enumerate(SECTIONS):
+            offset, length = bounds[index * 2], bounds[index * 2 + 1]
+            sections[name] = whole[offset : offset + length]
+            self._views.append(sections[name])
+        for name, attribute, typecode in self._arrays():
+            view = sections[name].cast(typecode)
+            self._views.append(view)
+            setattr(self, attribute, view)
+        self.read = sections["read"]  # type: ignore
+        self.flags = sections["flags"]  # type: ignore
+        self.hashes = sections["hashes"]  # type: ignore
+        self.text = StringHeap(buffer)
+        self._text_size = len(sections[TEXT])
+        feed_urls = bytes(sections["feed_urls"]).decode("utf-8")
+        self.feed_urls = feed_urls.split(FIELD_SEPARATOR) if feed_urls else []
+        self.feed_ids = {feed_url: index for index, feed_url in enumerate(self.feed_urls)}
+        self.fingerprints = pickle.loads(sections["fingerprints"])
+        self._summary_size = summary_size
+        self._summary_generation = summary_generation
+        self._summary_garbage = summary_garbage
+        self._garbage = garbage
+        self._epoch = epoch
+
+    def _unmap(self) -> None:
+        if self._map is None:
+            return
+        # the mapping can only be closed once nothing exports its buffer
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+        self._map = None
+
+    def _remap_if_replaced(self) -> None:
+        """Maps the file again when another process has saved a newer one"""
+        with self._lock:
+            if not self.mapped:
+                return
+            try:
+                stat = os.stat(self.file_path)
+            except FileNotFoundError:
+                return
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._identity:
+                self.log.debug("'%s' was replaced, mapping it again", self.file_path.as_posix())
+                self.load()
+
+    def _materialize(self) -> None:
+        """Copies the mapped columns into memory so they can be changed"""
+        with self._lock:
+            if not self.mapped:
+                return
+            for _, attribute, typecode in self._arrays():
+                column = array(typecode)
+                column.frombytes(getattr(self, attribute).cast("B"))
+                setattr(self, attribute, column)
+            self.read = bytearray(self.read)
+            self.flags = bytearray(self.flags)
+            self.hashes = bytearray(self.hashes)
+            self.text = StringHeap(bytearray(self._map[: self._text_size]))  # type: ignore
+            super().close()
+            self._unmap()
+            self._open_summaries()
+
+    def _open_summaries(self) -> None:
+        if not self.mapped:
+            # the writer owns the sidecar and drops what the last save did not keep
+            super()._open_summaries()
+            return
+        self.summaries_path.touch(exist_ok=True)
+        self._summary_file = open(self.summaries_path, "rb")
+
+    def _write(self, file_path: Path) -> None:
+        sections = {
+            TEXT: self.text.data,
+            **{name: getattr(self, name) for name in COLUMNS},
+            "read": self.read,
+            "flags": self.flags,
+            "hashes": self.hashes,
+            "table": self._table,
+            "row_map": self._row_map,
+            "feed_urls": FIELD_SEPARATOR.join(self.feed_urls).encode("utf-8"),
+            "fingerprints": pickle.dumps(self.fingerprints, protocol=pickle.HIGHEST_PROTOCOL),
+        }
+        bounds: list[int] = []
+        with open(file_path, "wb") as file:
+            for name in SECTIONS:
+                offset = file.tell()
+                length = file.write(sections[name])
+                bounds += (offset, length)
+                file.write(bytes(-file.tell() % ALIGNMENT))
+            file.write(
+                TRAILER.pack(
+                    *bounds,
+                    self.count,
+                    self._summary_size,
+                    self._summary_generation,
+                    self._summary_garbage,
+                    self._garbage,
+                    self._epoch,
+                    BYTE_ORDERS[sys.byteorder],
+                    MAGIC,
+                )
+            )
+
+    def _arrays(self) -> Iterator[tuple[str, str, str]]:
+        """(section, attribute, typecode) of every section mapped as an array"""
+        for name, typecode in COLUMNS.items():
+            yield name, name, typecode
+        for name, attribute in INDEXES.items():
+            yield name, attribute, INDEX_TYPECODE
+
+    def _hash(self, item_id: str) -> int:
+        # the lookup table is saved, so slots must not depend on the per-process hash seed
+        return int.from_bytes(blake2b(item_id.encode("utf-8"), digest_size=8).digest(), "little")
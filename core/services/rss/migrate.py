@@ -0,0 +1,103 @@
+import logging
+from pathlib import Path
+import pickle
+
+from core.config.file import (
+    DEFAULT_JSON_STORAGE_PATH,
+    DEFAULT_MAPPED_STORAGE_PATH,
+    DEFAULT_PICKLE_STORAGE_PATH,
+    DEFAULT_SQLITE_STORAGE_PATH,
+)
+from core.config.logging import dev_configuration
+from core.models.feed import FeedItem
+from core.services.rss.mapped import MappedRssStorageService
+from core.services.rss.sqlite import SqliteRssStorageService
+
+log = logging.getLogger(__name__)
+
+
+def read_pickle_items(pickle_path: Path) -> list[FeedItem]:
+    if not pickle_path.exists():
+        return []
+    return pickle.loads(pickle_path.read_bytes(), encoding="UTF-8")
+
+
+def read_json_items(json_path: Path) -> list[FeedItem]:
+    if not json_path.exists():
+        return []
+    return FeedItem.json_to_list(json_path.read_text())
+
+
+def read_source_items(pickle_path: Path | None, json_path: Path | None) -> dict[str, FeedItem]:
+    items: dict[str, FeedItem] = {}
+    if pickle_path is not None:
+        for item in read_pickle_items(pickle_path):
+            items[item.id] = item
+    if json_path is not None:
+        for item in read_json_items(json_path):
+            items[item.id] = item
+    return items
+
+
+def migrate_to_sqlite(
+    sqlite_path: Path = DEFAULT_SQLITE_STORAGE_PATH,
+    pickle_path: Path | None = DEFAULT_PICKLE_STORAGE_PATH,
+    json_path: Path | None = DEFAULT_JSON_STORAGE_PATH,
+) -> int:
+    """Copies items from the pickle and JSON stores into a SQLite store
+
+    The source files are left untouched. Items present in both sources are
+    merged on id, with the later source (JSON) winning, and read state is kept.
+
+    Args:
+        sqlite_path (Path, optional): the database to create or extend. Defaults to DEFAULT_SQLITE_STORAGE_PATH.
+        pickle_path (Path | None, optional): the pickle store to import, None to skip. Defaults to DEFAULT_PICKLE_STORAGE_PATH.
+        json_path (Path | None, optional): the JSON store to import, None to skip. Defaults to DEFAULT_JSON_STORAGE_PATH.
+
+    Returns:
+        int: the number of distinct items migrated
+    """
+    items = read_source_items(pickle_path, json_path)
+    storage = SqliteRssStorageService(sqlite_path)
+    try:
+        storage.update_feed_items(list(items.values()))
+        storage.save()
+    finally:
+        storage.close()
+    log.info("migrated %d items into '%s'", len(items), sqlite_path.as_posix())
+    return len(items)
+
+
+def migrate_to_mapped(
+    mapped_path: Path = DEFAULT_MAPPED_STORAGE_PATH,
+    pickle_path: Path | None = DEFAULT_PICKLE_STORAGE_PATH,
+    json_path: Path | None = DEFAULT_JSON_STORAGE_PATH,
+) -> int:
+    """Copies items from the pickle and JSON stores into a memory-mapped store
+
+    Sources are merged as in migrate_to_sqlite and are left untouched.
+
+    Args:
+        mapped_path (Path, optional): the mapped store to create or extend. Defaults to DEFAULT_MAPPED_STORAGE_PATH.
+        pickle_path (Path | None, optional): the pickle store to import, None to skip. Defaults to DEFAULT_PICKLE_STORAGE_PATH.
+        json_path (Path | None, optional): the JSON store to import, None to skip. Defaults to DEFAULT_JSON_STORAGE_PATH.
+
+    Returns:
+        int: the number of distinct items migrated
+    """
+    items = read_source_items(pickle_path, json_path)
+    storage = MappedRssStorageService(mapped_path)
+    try:
+        with storage.batch():
+            for item in items.values():
+                storage.update_feed_item(item)
+    finally:
+        storage.close()
+    log.info("migrated %d items into '%s'", len(items), mapped_path.as_posix())
+    return len(items)
+
+
+if __name__ == "__main__":
+    # migrate_to_sqlite logs what it migrated
+    dev_configuration()
+    migrate_to_sqlite()
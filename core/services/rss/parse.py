@@ -0,0 +1,197 @@
+"""Turns raw feed documents into compact records, in process or in a process pool
+
+feedparser's XML parsing and HTML sanitization are CPU bound, so threads don't
+help with them. Parsing happens in worker processes that only send back plain
+tuples, which pickle far smaller and faster than FeedParserDict trees.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+from threading import Lock
+import time
+from typing import Any, NamedTuple
+from urllib.parse import urljoin
+
+import feedparser as fp
+
+from core.constants.common import EMPTY_STRING
+
+ID = "id"
+ENTRIES = "entries"
+LINK = "link"
+PUBLISHED = "published"
+PUBLISHED_PARSED = "published_parsed"
+TITLE = "title"
+SUMMARY = "summary"
+IMAGE = "image"
+IMAGES = "media_thumbnail"
+URL = "url"
+HREF = "href"
+FEED = "feed"
+TTL = "ttl"
+UPDATE_PERIOD = "sy_updateperiod"
+UPDATE_FREQUENCY = "sy_updatefrequency"
+# feedparser resolves relative links against this response header
+CONTENT_LOCATION = "content-location"
+
+UPDATE_PERIOD_SECONDS: dict[str, int] = {
+    "hourly": 60 * 60,
+    "daily": 24 * 60 * 60,
+    "weekly": 7 * 24 * 60 * 60,
+    "monthly": 30 * 24 * 60 * 60,
+    "yearly": 365 * 24 * 60 * 60,
+}
+# fork is unsafe once the fetcher's threads are running
+START_METHODS: tuple[str, ...] = ("forkserver", "spawn")
+
+
+class ParsedEntry(NamedTuple):
+    id: str | None
+    title: str | None
+    summary: str | None
+    link: str | None
+    images: tuple[str, ...]
+    published: str | None
+    # feedparser's published_parsed as a plain 9-tuple
+    published_parsed: tuple[int, ...] | None
+
+
+class ParsedFeed(NamedTuple):
+    title: str
+    link: str
+    image: str | None
+    update_hint: int | None
+    entries: tuple[ParsedEntry, ...]
+    # how long feedparser took, measured where it ran, which may be a worker process
+    parse_seconds: float = 0.0
+
+
+def get_update_hint(feed: dict[str, Any]) -> int | None:
+    """Reads the publisher's polling hint, from RSS <ttl> or sy:updatePeriod/sy:updateFrequency
+
+    Args:
+        feed (dict[str, Any]): the parsed channel information
+
+    Returns:
+        int | None: the suggested polling interval in seconds, if the feed gives one
+    """
+    hints: list[int] = []
+    try:
+        ttl = int(str(feed.get(TTL)).strip())
+        if ttl > 0:
+            hints.append(ttl * 60)
+    except ValueError:
+        pass
+    period = UPDATE_PERIOD_SECONDS.get(str(feed.get(UPDATE_PERIOD, EMPTY_STRING)).strip().lower())
+    if period is not None:
+        try:
+            frequency = max(int(str(feed.get(UPDATE_FREQUENCY, 1)).strip()), 1)
+        except ValueError:
+            frequency = 1
+        hints.append(period // frequency)
+    return max(hints) if hints else None
+
+
+def to_parsed_entry(entry: dict[str, Any]) -> ParsedEntry:
+    published_parsed = entry.get(PUBLISHED_PARSED)
+    return ParsedEntry(
+        id=entry.get(ID),
+        title=entry.get(TITLE),
+        summary=entry.get(SUMMARY),
+        link=entry.get(LINK),
+        images=tuple(
+            image.get(URL, EMPTY_STRING)
+            for image in entry.get(IMAGES, [])
+            if image.get(URL, EMPTY_STRING) != EMPTY_STRING
+        ),
+        published=entry.get(PUBLISHED),
+        published_parsed=None if published_parsed is None else tuple(published_parsed),
+    )
+
+
+def response_headers(headers: dict[str, str] | None, url: str | None) -> dict[str, str]:
+    """Response headers as feedparser looks them up, by lower-case name
+
+    Parsing bytes, feedparser doesn't know where the document came from, so
+    the URL it was served from becomes its content-location, and a relative
+    Content-Location sent by the server is resolved against that URL.
+    """
+    normalized = {name.lower(): value for name, value in (headers or {}).items()}
+    if url:
+        normalized[CONTENT_LOCATION] = urljoin(url, normalized.get(CONTENT_LOCATION, EMPTY_STRING))
+    return normalized
+
+
+def parse_feed(
+    content: bytes, headers: dict[str, str] | None = None, url: str | None = None
+) -> ParsedFeed:
+    """Parses a feed document; a module level function so worker processes can run it
+
+    Args:
+        content (bytes): the document
+        headers (dict[str, str] | None, optional): the response headers. Defaults to None.
+        url (str | None, optional): where the document was served from, to resolve relative links. Defaults to None.
+    """
+    started = time.perf_counter()
+    rss = fp.parse(content, response_headers=response_headers(headers, url))
+    feed: dict[str, Any] = rss.get(FEED, {})  # type: ignore
+    return ParsedFeed(
+        title=feed.get(TITLE, EMPTY_STRING),
+        link=feed.get(LINK, EMPTY_STRING),
+        image=feed.get(IMAGE, {}).get(HREF),
+        update_hint=get_update_hint(feed),
+        entries=tuple(to_parsed_entry(entry) for entry in rss.get(ENTRIES, [])),  # type: ignore
+        parse_seconds=time.perf_counter() - started,
+    )
+
+
+class FeedParser:
+    """Parses feed documents in the calling thread, or in a pool of worker processes
+
+    The pool is started on first use and kept until close(), so its start-up
+    cost is paid once rather than on every refresh.
+    """
+
+    workers: int
+    _executor: ProcessPoolExecutor | None
+    _lock: Lock
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._executor = None
+        self._lock = Lock()
+
+    def submit(
+        self, content: bytes, headers: dict[str, str] | None = None, url: str | None = None
+    ) -> Future[ParsedFeed]:
+        if self.workers <= 0:
+            future: Future[ParsedFeed] = Future()
+            try:
+                future.set_result(parse_feed(content, headers, url))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._get_executor().submit(parse_feed, content, headers, url)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                method = next((m for m in START_METHODS if m in methods), None)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                )
+            return self._executor
+
+    def __enter__(self) -> FeedParser:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
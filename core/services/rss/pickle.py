@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 import pickle
 
@@ -5,15 +6,27 @@ from core.config.common import ConfigurationRoot
 from core.config.file import FileStorageSettings
 from core.interfaces.common import ISave
 from core.interfaces.rss import IRssStorageService
+from core.mixins.save import BatchSaveMixin
 from core.models.feed import FeedItem
 from core.utilities.decorators import autosave
-from core.utilities.list import first
+from core.utilities.file import atomic_write_bytes
+from core.utilities.save import get_save_coalescer
 
 config = ConfigurationRoot()
 
 
-class PickleRssStorageService(IRssStorageService, ISave):
+class PickleRssStorageService(BatchSaveMixin, IRssStorageService, ISave):
+    """Stores every item in one pickle, rewritten on each save
+
+    Reads are served from the cache. The file is only read again when its
+    identity, modification time or size changed, and never while changes of
+    this instance are waiting to be saved, since they would be lost.
+    """
+
     cache: list[FeedItem]
+    # id -> item over the cache, so lookups and updates don't scan it
+    index: dict[str, FeedItem]
+    _identity: tuple[int, int, int] | None
 
     @property
     def settings(self) -> FileStorageSettings:
@@ -27,15 +40,16 @@ class PickleRssStorageService(IRssStorageService, ISave):
         self.load()
 
     def get_stored_items(self) -> list[FeedItem]:
-        if not self.file_path.exists():
-            self.cache = []
-        else:
-            self.cache = pickle.loads(self.file_path.read_bytes(), encoding="UTF-8")
+        if not get_save_coalescer(self).pending and self._file_identity() != self._identity:
+            self.load()
         return self.cache
 
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        return self.index.get(item_id)
+
     @autosave
     def update_feed_item(self, item: FeedItem) -> None:
-        cached_item = first([i for i in self.cache if i.id == item.id])
+        cached_item = self.index.get(item.id)
         if cached_item is None:
             self.store_feed_item(item)
         else:
@@ -47,18 +61,49 @@ class PickleRssStorageService(IRssStorageService, ISave):
 
     @autosave
     def store_feed_items(self, items: list[FeedItem]) -> None:
-        self.cache = self.cache + [
-            item
-            for item in items
-            if item.id not in [stored_item.id for stored_item in self.cache]
-        ]
+        new_items = []
+        for item in items:
+            if item.id not in self.index:
+                self.index[item.id] = item
+                new_items.append(item)
+        self.cache = self.cache + new_items
+
+    @autosave
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        removed = set(item_ids)
+        self.cache = [item for item in self.cache if item.id not in removed]
+        for item_id in removed:
+            self.index.pop(item_id, None)
+
+    @autosave
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        changed = []
+        for item_id in item_ids:
+            item = self.index.get(item_id)
+            if item is not None and item.read != read:
+                item.read = read
+                changed.append(item_id)
+        return changed
 
     def save(self) -> None:
-        self.file_path.write_bytes(pickle.dumps(self.cache))
+        atomic_write_bytes(self.file_path, pickle.dumps(self.cache))
+        self._identity = self._file_identity()
 
     def load(self) -> list[FeedItem]:
-        if not self.file_path.exists():
+        try:
+            with open(self.file_path, "rb") as pickle_file:
+                identity = self._file_identity(pickle_file.fileno())
+                self.cache = pickle.loads(pickle_file.read(), encoding="UTF-8")
+        except FileNotFoundError:
+            identity = None
             self.cache = []
-        else:
-            self.cache = pickle.loads(self.file_path.read_bytes(), encoding="UTF-8")
+        self._identity = identity
+        self.index = {item.id: item for item in self.cache}
         return self.cache
+
+    def _file_identity(self, descriptor: int | None = None) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.file_path) if descriptor is None else os.fstat(descriptor)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,85 @@
+import base64
+import binascii
+import heapq
+import json
+from typing import Callable, Iterable, Iterator
+
+from core.exceptions.rss import InvalidCursorError
+from core.models.feed import FeedItem
+from core.models.query import ItemQuery, SortOrder
+from core.utilities.datetime import to_epoch
+
+# (has a published date, published epoch, id), the order every backend sorts by
+SortKey = tuple[bool, float, str]
+
+
+def sort_key(item: FeedItem) -> SortKey:
+    if item.published is None:
+        return False, 0.0, item.id
+    return True, to_epoch(item.published), item.id
+
+
+def encode_cursor(item: FeedItem) -> str:
+    """An opaque cursor continuing after the given item"""
+    has_published, published, item_id = sort_key(item)
+    value = json.dumps([published if has_published else None, item_id])
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float | None, str]:
+    try:
+        published, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursorError(cursor) from e
+    if not isinstance(item_id, str) or not (
+        published is None or isinstance(published, (int, float))
+    ):
+        raise InvalidCursorError(cursor)
+    return published, item_id
+
+
+def cursor_key(cursor: str) -> SortKey:
+    published, item_id = decode_cursor(cursor)
+    if published is None:
+        return False, 0.0, item_id
+    return True, float(published), item_id
+
+
+def create_filter(query: ItemQuery) -> Callable[[FeedItem], bool]:
+    """Builds a predicate applying the query's filters and cursor to items in memory"""
+    feed_urls = None if query.feed_urls is None else set(query.feed_urls)
+    after = None if query.published_after is None else to_epoch(query.published_after)
+    before = None if query.published_before is None else to_epoch(query.published_before)
+    newest_first = query.order == SortOrder.NEWEST_FIRST
+    position = None if query.cursor is None else cursor_key(query.cursor)
+
+    def matches(item: FeedItem) -> bool:
+        if feed_urls is not None and item.feed_url not in feed_urls:
+            return False
+        if query.read is not None and item.read != query.read:
+            return False
+        if after is not None or before is not None or position is not None:
+            key = sort_key(item)
+            if after is not None and not (key[0] and key[1] >= after):
+                return False
+            if before is not None and not (key[0] and key[1] < before):
+                return False
+            if position is not None and (key >= position if newest_first else key <= position):
+                return False
+        return True
+
+    return matches
+
+
+def filter_items(items: Iterable[FeedItem], query: ItemQuery) -> Iterator[FeedItem]:
+    """Applies a query to items in memory, for backends that cannot apply it themselves
+
+    Sorting needs every match, so this is only as lazy as the items given; a
+    limited query only keeps the best `limit` items while sorting.
+    """
+    matching = filter(create_filter(query), items)
+    newest_first = query.order == SortOrder.NEWEST_FIRST
+    if query.limit is not None:
+        select = heapq.nlargest if newest_first else heapq.nsmallest
+        return iter(select(query.limit, matching, key=sort_key))
+    return iter(sorted(matching, key=sort_key, reverse=newest_first))
@@ -1,110 +1,658 @@
-from typing import Any
-import feedparser as fp
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import replace
+import logging
+from logging import Logger
+from itertools import islice
+from threading import Lock, RLock, Thread
+import time
+from typing import Any, Iterable, Iterator
 from http import HTTPStatus as http
+from core.config.common import config
+from core.config.reader import ReaderSettings
 from core.constants.common import EMPTY_STRING
+from core.constants.metrics import (
+    CONVERT,
+    DEDUPE,
+    ENTRIES,
+    FEED,
+    FETCHED_BYTES,
+    NEW_ITEMS,
+    NO_RESPONSE,
+    PARSE,
+    READ,
+    RESPONSES,
+    SAVE,
+    STATUS,
+)
+from core.exceptions.common import BaseError
 from core.exceptions.feed import FeedNotFoundError
-from core.interfaces.feed import IFeedService
-from core.interfaces.rss import IRssStorageService
-from core.models.feed import Feed, FeedItem
-from core.utilities.datetime import DateTime
-
-
-ID = "id"
-ENTRIES = "entries"
-ETAG = "etag"
-LINK = "link"
-MODIFIED = "modified"
-PUBLISHED = "published"
-TITLE = "title"
-STATUS = "status"
-SUMMARY = "summary"
-IMAGE = "image"
-IMAGES = "media_thumbnail"
-URL = "url"
-HREF = "href"
+from core.exceptions.rss import CategoryDoesNotExistError, FeedParseError
+from core.interfaces.feed import IFeedService, IFeedStateService
+from core.interfaces.metrics import IMetricsSink
+from core.interfaces.rss import IRssQueryService, IRssReaderService, IRssStorageService
+from core.models.feed import Feed, FeedItem, FeedState
+from core.models.counters import UnreadSummary
+from core.models.fetch import FetchResult
+from core.models.query import ItemPage, ItemQuery
+from core.models.refresh import FeedRefreshResult, RefreshStats
+from core.services.metrics.sinks import NULL_METRICS
+from core.services.rss.counters import UnreadCounters, category_paths, count_items
+from core.services.rss.fetch import FeedFetcher
+from core.services.rss.fingerprint import (
+    body_digest,
+    create_content_hash,
+    create_fingerprint,
+    item_content_hash,
+    item_fingerprint,
+)
+from core.services.rss.parse import (
+    FeedParser,
+    ParsedEntry,
+    ParsedFeed,
+    parse_feed,
+    to_parsed_entry,
+)
+from core.services.rss.query import encode_cursor, filter_items
+from core.services.rss.readstate import ReadStateStorageService
+from core.services.rss.retention import RetentionService, item_age
+from core.utilities.datetime import DateTime, to_epoch
+
+# items read from storage per hold of the storage lock, when iterating a query
+QUERY_CHUNK_SIZE: int = 500
 
 
 def create_feed_item_from_entry(entry: dict[str, Any], feed_url: str) -> FeedItem:
-    return FeedItem(
-        id=entry.get(ID, entry.get(LINK, EMPTY_STRING)),
-        title=entry.get(TITLE),
-        summary=entry.get(SUMMARY),
-        link=entry.get(LINK),
-        images=[
-            image.get(URL, EMPTY_STRING)
-            for image in entry.get(IMAGES, [])
-            if image.get(URL, EMPTY_STRING) != EMPTY_STRING
-        ],
-        published=DateTime.parse_timestamp(entry.get(PUBLISHED)),
+    return create_feed_item(to_parsed_entry(entry), feed_url)
+
+
+def create_feed_item(entry: ParsedEntry, feed_url: str) -> FeedItem:
+    try:
+        published = DateTime.parse_timestamp(entry.published, entry.published_parsed, feed_url)  # type: ignore
+    except ValueError:
+        # an entry with an unreadable date is kept undated rather than failing its whole feed
+        published = None
+    fingerprint = create_fingerprint(entry.link, entry.title, published)
+    item = FeedItem(
+        id=entry.id or fingerprint,
+        title=entry.title,
+        summary=entry.summary,
+        link=entry.link,
+        images=list(entry.images),
+        published=published,
         feed_url=feed_url,
         created=DateTime.now(),
+        fingerprint=fingerprint,
     )
+    item.content_hash = create_content_hash(item)
+    return item
 
 
-def create_feed_from_rss(feed: dict, feed_url: str) -> Feed:
+def create_feed_from_rss(feed: ParsedFeed, feed_url: str) -> Feed:
     return Feed(
-        title=feed.get(TITLE, EMPTY_STRING),
+        title=feed.title,
         url=feed_url,
-        image=feed.get(IMAGE, dict()).get(HREF, None),
-        html_url=feed.get(LINK, EMPTY_STRING),
+        image=feed.image,
+        html_url=feed.link,
         category=EMPTY_STRING,
         created=DateTime.now(),
     )
 
 
-class RssFeedReaderService:
+class RssFeedReaderService(IRssReaderService):
+    """Reads feed items from storage and refreshes storage from the network
+
+    Reads (get_items, get_feed_items, query_items, get_page) only query
+    storage. refresh, refresh_feed and refresh_feeds fetch, parse, dedupe and
+    store. With stale_while_revalidate set, a read also starts a background
+    refresh of the feeds it covers, at most once per revalidate_interval.
+
+    Refreshes report to a metrics sink: a timing span for each stage (read,
+    parse, convert, dedupe and save) and per-feed counters of bytes fetched,
+    entries, new items and response statuses. The default sink drops them.
+
+    The storage backends are not all thread-safe, so every use of storage by
+    the reader, including background refreshes, holds storage_lock. Code that
+    uses storage_service directly while the reader is in use should hold it too.
+    """
+
     storage_service: IRssStorageService
     feed_service: IFeedService
+    state_service: IFeedStateService | None
+    retention: RetentionService | None
+    metrics: IMetricsSink
+    fetcher: FeedFetcher
+    parser: FeedParser
+    last_refresh: RefreshStats
+    log: Logger
+    storage_lock: RLock
+    _revalidated: dict[str | None, float]
+    _revalidation: Thread | None
+    _revalidation_lock: Lock
 
-    def __init__(self, storage_service: IRssStorageService, feed_service: IFeedService):
+    def __init__(
+        self,
+        storage_service: IRssStorageService,
+        feed_service: IFeedService,
+        fetcher: FeedFetcher | None = None,
+        state_service: IFeedStateService | None = None,
+        settings: ReaderSettings | None = None,
+        retention: RetentionService | None = None,
+        metrics: IMetricsSink | None = None,
+    ):
+        self.log = logging.getLogger(RssFeedReaderService.__name__)
         self.storage_service = storage_service
         self.feed_service = feed_service
+        self.fetcher = fetcher if fetcher is not None else FeedFetcher()
+        self.parser = FeedParser(self.fetcher.settings.parse_workers)
+        self.state_service = state_service
+        self.retention = retention
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        if settings is not None:
+            self.settings = settings
+        self.last_refresh = RefreshStats()
+        self.storage_lock = RLock()
+        self._revalidated = {}
+        self._revalidation = None
+        self._revalidation_lock = Lock()
+        self._assign_categories()
+
+    @property
+    def settings(self) -> ReaderSettings:
+        return config.get_config(ReaderSettings, True)
+
+    @settings.setter
+    def settings(self, settings: ReaderSettings) -> None:
+        config.set_config(ReaderSettings, settings)
 
     def get_feed(self, feed_url: str) -> Feed:
-        rss = fp.parse(feed_url)
-        if rss.get(STATUS) == http.NOT_FOUND:
+        result = self.fetcher.fetch(feed_url)
+        if result.status == http.NOT_FOUND:
             raise FeedNotFoundError(feed_url)
-        return create_feed_from_rss(rss.feed, feed_url)  # type: ignore
+        return create_feed_from_rss(
+            parse_feed(result.content, result.headers, result.document_url), feed_url
+        )
 
-    def get_items(self, include_read: bool = False) -> list[FeedItem]:
-        stored_items = [item for item in self.storage_service.get_stored_items()]
-        stored_ids = [item.id for item in stored_items]
-        for feed in self.feed_service.feeds:
-            stored_items += [
-                item
-                for item in self._get_feed_items(feed)
-                if item.id not in stored_ids and (item.read == False or include_read)
-            ]
-        return stored_items
-
-    def get_feed_items(self, feed: Feed, include_read: bool = False) -> list[FeedItem]:
-        stored_items = [
-            item
-            for item in self.storage_service.get_stored_items()
-            if item.feed_url == feed.url
-        ]
-        new_feed_items = self._get_feed_items(feed)
-        return stored_items + [
-            item
-            for item in new_feed_items
-            if item.id not in [existing.id for existing in stored_items]
-            and (item.read == False or include_read)
+    def get_items(
+        self,
+        category: str | None = None,
+        exclude_read: bool = True,
+    ) -> list[FeedItem]:
+        items = list(
+            self.query_items(
+                ItemQuery(category=category, read=False if exclude_read else None)
+            )
+        )
+        if self.settings.stale_while_revalidate:
+            self.revalidate(category)
+        return items
+
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        """Streams the items matching a query, reading them from storage a chunk at a time
+
+        Each chunk is read holding storage_lock, which is released between
+        chunks, so a slow consumer doesn't hold up refreshes.
+        """
+        query = self.resolve_query(query)
+        with self.storage_lock:
+            if isinstance(self.storage_service, IRssQueryService):
+                items = self.storage_service.query_items(query)
+            else:
+                items = filter_items(self.storage_service.get_stored_items(), query)
+        return self._locked(items)
+
+    def _locked(self, items: Iterator[FeedItem]) -> Iterator[FeedItem]:
+        while True:
+            with self.storage_lock:
+                chunk = list(islice(items, QUERY_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield from chunk
+
+    def get_page(self, query: ItemQuery) -> ItemPage:
+        if query.limit is None:
+            return ItemPage(items=list(self.query_items(query)))
+        # one extra item tells whether there is a next page
+        items = list(self.query_items(replace(query, limit=query.limit + 1)))
+        if len(items) <= query.limit:
+            return ItemPage(items=items)
+        items = items[: query.limit]
+        return ItemPage(items=items, next_cursor=encode_cursor(items[-1]) if items else None)
+
+    def resolve_query(self, query: ItemQuery) -> ItemQuery:
+        """Replaces a query's category with the urls of the feeds in it"""
+        if query.category is None:
+            return query
+        feed_urls = [feed.url for feed in self.get_category_feeds(query.category)]
+        if query.feed_urls is not None:
+            wanted = set(query.feed_urls)
+            feed_urls = [url for url in feed_urls if url in wanted]
+        return replace(query, category=None, feed_urls=feed_urls)
+
+    def get_category_feeds(self, category: str) -> list[Feed]:
+        """The feeds in a category, including those in nested folders below it"""
+        name = category.strip("/")
+        prefix = f"{name}/"
+        feeds = [
+            feed
+            for feed in self.feed_service.feeds
+            if feed.category == name or feed.category.startswith(prefix)
         ]
+        if not feeds:
+            raise CategoryDoesNotExistError(category)
+        return feeds
+
+    @property
+    def counters(self) -> UnreadCounters | None:
+        if isinstance(self.storage_service, ReadStateStorageService):
+            return self.storage_service.counters
+        return None
+
+    def get_unread_summary(self) -> UnreadSummary:
+        """Counts unread items, from the storage's UnreadCounters when it has them
+
+        Counters are kept by deltas, so this does not depend on the number of
+        stored items. Feeds are assigned to categories on every refresh.
+        Without counters, every stored item is counted.
+        """
+        counters = self.counters
+        if counters is not None:
+            return counters.summary()
+        with self.storage_lock:
+            unread, stored = count_items(self.storage_service.get_stored_items())
+        categories: Counter[str] = Counter()
+        for feed in self.feed_service.feeds:
+            for category in category_paths(feed.category):
+                categories[category] += unread[feed.url]
+        return UnreadSummary(
+            unread=sum(unread.values()),
+            total=sum(stored.values()),
+            feeds=dict(+unread),
+            categories=dict(+categories),
+        )
+
+    def mark_feed_read(self, feed: Feed, before: DateTime | None = None) -> int:
+        return self.mark_feeds_read([feed.url], before)
+
+    def mark_all_read(self, category: str | None = None, before: DateTime | None = None) -> int:
+        if category is None:
+            return self.mark_feeds_read(None, before)
+        return self.mark_feeds_read([feed.url for feed in self.get_category_feeds(category)], before)
+
+    def mark_feeds_read(self, feed_urls: list[str] | None, before: DateTime | None = None) -> int:
+        """Marks the unread items of feeds read, every stored feed's if feed_urls is None
+
+        With a ReadStateStorageService only the changed items are visited,
+        otherwise every stored item is, but either way storage saves once.
+        """
+        timestamp = None if before is None else to_epoch(before)
+        with self.storage_lock:
+            if isinstance(self.storage_service, ReadStateStorageService):
+                return len(self.storage_service.mark_feeds_read(feed_urls, timestamp))
+            wanted = None if feed_urls is None else set(feed_urls)
+            item_ids = []
+            for item in self.storage_service.get_stored_items():
+                if item.read or (wanted is not None and item.feed_url not in wanted):
+                    continue
+                age = item_age(item)
+                # items without any date count as the oldest
+                if timestamp is None or age is None or age < timestamp:
+                    item_ids.append(item.id)
+            if not item_ids:
+                return 0
+            return len(self.storage_service.mark_items_read(item_ids))
+
+    def refresh(self, category: str | None = None) -> list[FeedRefreshResult]:
+        """Fetches every enabled feed, or those in a category, and stores any new items
+
+        Args:
+            category (str | None, optional): only refresh the feeds in this category. Defaults to None.
+
+        Raises:
+            CategoryDoesNotExistError: raised if the category could not be found
+
+        Returns:
+            list[FeedRefreshResult]: one result per feed
+        """
+        if category is not None:
+            return self.refresh_feeds(self.get_category_feeds(category))
+        # a feed service that streams its feeds lets the first fetches start while it reads the rest
+        iter_feeds = getattr(self.feed_service, "iter_feeds", None)
+        return self.refresh_feeds(self.feed_service.feeds if iter_feeds is None else iter_feeds())
 
-    def read(self, feed: Feed) -> dict[str, Any] | None:
-        rss = fp.parse(feed.url, etag=feed.etag, modified=feed.modified)
-        if rss.get(STATUS) == http.NOT_FOUND:
+    def refresh_feed(self, feed: Feed) -> FeedRefreshResult:
+        """Fetches a single feed and stores any new items
+
+        Raises:
+            FeedNotFoundError: raised if the feed could not be found
+        """
+        _, results = self._refresh([feed])
+        return results[0]
+
+    def refresh_feeds(self, feeds: Iterable[Feed]) -> list[FeedRefreshResult]:
+        """Fetches the given feeds and stores any new items
+
+        Unlike refresh_feed, a feed that fails is reported in its result instead
+        of aborting the others.
+
+        Args:
+            feeds (Iterable[Feed]): the feeds to refresh
+
+        Returns:
+            list[FeedRefreshResult]: one result per feed, in the order given
+        """
+        self._assign_categories()
+        _, results = self._refresh(feeds, raise_errors=False)
+        return results
+
+    def get_feed_items(self, feed: Feed, exclude_read: bool = True) -> list[FeedItem]:
+        items = list(
+            self.query_items(
+                ItemQuery(feed_urls=[feed.url], read=False if exclude_read else None)
+            )
+        )
+        if self.settings.stale_while_revalidate:
+            self._revalidate(feed.url, [feed])
+        return items
+
+    def revalidate(self, category: str | None = None) -> bool:
+        """Starts a background refresh of every feed, or those in a category
+
+        Returns:
+            bool: False if a background refresh is already running or the same
+                feeds were refreshed within revalidate_interval
+        """
+        feeds = (
+            self.feed_service.feeds
+            if category is None
+            else self.get_category_feeds(category)
+        )
+        return self._revalidate(None if category is None else f"category:{category}", feeds)
+
+    def wait_for_revalidation(self, timeout: float | None = None) -> None:
+        """Blocks until any running background refresh has finished"""
+        revalidation = self._revalidation
+        if revalidation is not None:
+            revalidation.join(timeout)
+
+    def _revalidate(self, key: str | None, feeds: list[Feed]) -> bool:
+        now = time.monotonic()
+        with self._revalidation_lock:
+            if self._revalidation is not None and self._revalidation.is_alive():
+                return False
+            last = self._revalidated.get(key)
+            if last is not None and now - last < self.settings.revalidate_interval:
+                return False
+            self._revalidated[key] = now
+            self._revalidation = Thread(
+                target=self._run_revalidation,
+                args=(feeds,),
+                name=f"{RssFeedReaderService.__name__}.revalidate",
+                daemon=True,
+            )
+            self._revalidation.start()
+        return True
+
+    def _run_revalidation(self, feeds: list[Feed]) -> None:
+        try:
+            self.refresh_feeds(feeds)
+        except Exception as e:
+            self.log.exception("background refresh failed", exc_info=e)
+
+    def _assign_categories(self) -> None:
+        counters = self.counters
+        if counters is not None:
+            counters.set_feeds(self.feed_service.feeds)
+
+    def apply_state(self, feed: Feed) -> Feed:
+        """Restores the persisted validators onto a feed so the next fetch is conditional"""
+        if self.state_service is None:
+            return feed
+        state = self.state_service.get_state(feed.url)
+        if state is not None:
+            feed.etag = feed.etag or state.etag
+            feed.modified = feed.modified or state.modified
+            if feed.last_read is None and state.last_fetched is not None:
+                feed.last_read = state.last_fetched
+        return feed
+
+    def _refresh(
+        self,
+        feeds: Iterable[Feed],
+        raise_errors: bool = True,
+    ) -> tuple[list[FeedItem], list[FeedRefreshResult]]:
+        # feed url -> its stored items by id, and their fingerprints: only the refreshed
+        # feeds' items, as an entry republished under a new id comes back in the same feed
+        stored: dict[str, dict[str, FeedItem]] = {}
+        fingerprints: dict[str, set[str]] = {}
+        # feed url -> stored items, from one scan, for backends that can't query by feed
+        grouped: dict[str, list[FeedItem]] | None = None
+        # ids of the new items of every feed in this refresh
+        new_ids: set[str] = set()
+        new_items: list[FeedItem] = []
+        changed_items: list[FeedItem] = []
+        results: list[FeedRefreshResult] = []
+        states: list[FeedState] = []
+        pending: deque[tuple[Feed, FetchResult, FeedState, Future[ParsedFeed] | None]] = deque()
+        parser = self._get_parser()
+        # parsing runs ahead of merging by this many feeds, bounding the records held
+        window = max(parser.workers, 1) * 4
+        self.last_refresh = RefreshStats()
+        now = time.time()
+
+        def read_stored(feed_url: str) -> None:
+            """Reads a feed's stored items once its fetch completes, so feeds can stream in"""
+            nonlocal grouped
+            if feed_url in stored:
+                return
+            with self.storage_lock:
+                if isinstance(self.storage_service, IRssQueryService):
+                    query = ItemQuery(feed_urls=[feed_url], read=None)
+                    feed_items = list(self.storage_service.query_items(query))
+                else:
+                    if grouped is None:
+                        grouped = defaultdict(list)
+                        for item in self.storage_service.get_stored_items():
+                            grouped[item.feed_url].append(item)
+                    feed_items = grouped.pop(feed_url, [])
+            stored[feed_url] = {item.id: item for item in feed_items}
+            fingerprints[feed_url] = {item_fingerprint(item) for item in feed_items}
+
+        def merge(
+            feed: Feed,
+            fetched: FetchResult,
+            state: FeedState,
+            parsed: Future[ParsedFeed] | None,
+        ) -> None:
+            result = FeedRefreshResult(
+                url=feed.url, status=fetched.status, error=fetched.error
+            )
+            results.append(result)
+            try:
+                items = self._finish_feed_items(feed, fetched, state, parsed, result)
+            except BaseError as e:
+                if raise_errors:
+                    raise
+                self.log.warning("failed to refresh '%s': %s", feed.url, e)
+                result.error = e
+                return
+            if not items:
+                return
+            feed_stored, feed_fingerprints = stored[feed.url], fingerprints[feed.url]
+            with self.metrics.span(DEDUPE):
+                for item in items:
+                    existing = feed_stored.get(item.id)
+                    if existing is None:
+                        if item.id in new_ids:
+                            # another feed of this refresh has the id
+                            continue
+                        with self.storage_lock:
+                            existing = self.storage_service.get_stored_item(item.id)
+                        if existing is not None and existing.feed_url != feed.url:
+                            # the id belongs to another feed's item, which storing
+                            # or updating this entry would move to this feed
+                            continue
+                    if existing is not None:
+                        if item_content_hash(existing) != item.content_hash:
+                            # the publisher edited the entry, keep what the reader did with it
+                            item.read = existing.read
+                            item.created = existing.created
+                            feed_stored[item.id] = item
+                            changed_items.append(item)
+                            result.updated_items += 1
+                        continue
+                    if item.fingerprint in feed_fingerprints:
+                        # republished under a new id
+                        continue
+                    if self.retention is not None and self.retention.is_expired(item, now):
+                        # removed by the retention rules, the feed still lists it
+                        continue
+                    feed_stored[item.id] = item
+                    feed_fingerprints.add(item.fingerprint)
+                    new_ids.add(item.id)
+                    new_items.append(item)
+                    result.new_items += 1
+            if result.new_items and self.metrics.enabled:
+                self.metrics.increment(NEW_ITEMS, result.new_items, ((FEED, feed.url),))
+
+        try:
+            # fetch_all yields in feed order and merging keeps it, so the outcome is
+            # deterministic however downloads and parses interleave
+            for feed, fetched in self.fetcher.fetch_all(
+                self.apply_state(feed) for feed in feeds
+            ):
+                read_stored(feed.url)
+                state, parsed = self._start_feed_items(feed, fetched, parser)
+                states.append(state)
+                pending.append((feed, fetched, state, parsed))
+                if len(pending) >= window:
+                    merge(*pending.popleft())
+            while pending:
+                merge(*pending.popleft())
+        finally:
+            for _, _, _, parsed in pending:
+                if parsed is not None:
+                    parsed.cancel()
+        self.log.info("refreshed feeds: %r", self.last_refresh)
+        if new_items or changed_items:
+            with self.metrics.span(SAVE), self.storage_lock:
+                if new_items:
+                    self.storage_service.store_feed_items(new_items)
+                if changed_items:
+                    with self._storage_batch():
+                        for item in changed_items:
+                            # the item may have been marked read while the feeds were fetched
+                            current = self.storage_service.get_stored_item(item.id)
+                            if current is not None:
+                                if current.feed_url != item.feed_url:
+                                    continue
+                                item.read = current.read
+                            self.storage_service.update_feed_item(item)
+        # only once the items are stored: with the new validators and digest, the
+        # next poll gets a 304 or an unchanged body and would never see them again
+        self._save_states(states)
+        return new_items, results
+
+    def _storage_batch(self) -> AbstractContextManager:
+        batch = getattr(self.storage_service, "batch", None)
+        return nullcontext() if batch is None else batch()
+
+    def _get_parser(self) -> FeedParser:
+        workers = self.fetcher.settings.parse_workers
+        if self.parser.workers != workers:
+            self.parser.close()
+            self.parser = FeedParser(workers)
+        return self.parser
+
+    def close(self) -> None:
+        """Stops the parsing worker processes, if any were started"""
+        self.parser.close()
+
+    def read(self, feed: Feed) -> ParsedFeed | None:
+        return self.parse(feed, self.fetcher.fetch_feed(feed))
+
+    def parse(self, feed: Feed, result: FetchResult) -> ParsedFeed | None:
+        if result.status == http.NOT_FOUND:
             raise FeedNotFoundError(feed.url)
-        if rss.get(STATUS) == http.NOT_MODIFIED:
+        if result.status == http.NOT_MODIFIED:
             return None
-        return rss
+        if not result.ok:
+            self.log.warning("skipping '%s' (status=%s)", feed.url, result.status)
+            return None
+        return parse_feed(result.content, result.headers, result.document_url)
+
+    def _start_feed_items(
+        self, feed: Feed, result: FetchResult, parser: FeedParser
+    ) -> tuple[FeedState, Future[ParsedFeed] | None]:
+        """Records the fetch and starts parsing the body, unless it is the one last parsed"""
+        self.last_refresh.record(result.status)
+        if self.metrics.enabled:
+            self._record_fetch(feed, result)
+        previous = None if self.state_service is None else self.state_service.get_state(feed.url)
+        state = FeedState(
+            url=feed.url,
+            etag=feed.etag,
+            modified=feed.modified,
+            status=result.status,
+            last_fetched=DateTime.now(),
+            body_digest=None if previous is None else previous.body_digest,
+        )
+        if not result.ok or result.status == http.NOT_MODIFIED:
+            return state, None
+        # servers that ignore validators still often send the same document
+        digest = body_digest(result.content)
+        if digest == state.body_digest:
+            return state, None
+        state.body_digest = digest
+        return state, parser.submit(result.content, result.headers, result.document_url)
 
-    def _get_feed_items(self, feed: Feed):
-        rss = self.read(feed)
-        if rss is None:
+    def _finish_feed_items(
+        self,
+        feed: Feed,
+        result: FetchResult,
+        state: FeedState,
+        parsed: Future[ParsedFeed] | None,
+        refresh_result: FeedRefreshResult | None = None,
+    ) -> list[FeedItem]:
+        if result.status == http.NOT_FOUND:
+            raise FeedNotFoundError(feed.url)
+        if result.status == http.NOT_MODIFIED:
+            return []
+        if not result.ok:
+            self.log.warning("skipping '%s' (status=%s)", feed.url, result.status)
             return []
-        feed.etag = rss.get(ETAG, None)  # type: ignore
-        feed.modified = rss.get(MODIFIED, None)  # type: ignore
-        feed.last_read = DateTime.now()
-        entries: list[dict] = rss.get(ENTRIES, [])  # type: ignore
-        return [create_feed_item_from_entry(entry, feed.url) for entry in entries]
+        if parsed is not None:
+            try:
+                rss = parsed.result()
+            except Exception as e:
+                # keep the old validators so the document is fetched and parsed again
+                state.body_digest = None
+                raise FeedParseError(feed.url, str(e)) from e
+        feed.etag = state.etag = result.etag
+        feed.modified = state.modified = result.modified
+        feed.last_read = state.last_fetched
+        if parsed is None:
+            if refresh_result is not None:
+                refresh_result.unchanged = True
+            return []
+        if refresh_result is not None:
+            refresh_result.entries = len(rss.entries)
+            refresh_result.update_hint = rss.update_hint
+        if self.metrics.enabled:
+            self.metrics.observe(PARSE, rss.parse_seconds)
+            self.metrics.increment(ENTRIES, len(rss.entries), ((FEED, feed.url),))
+        with self.metrics.span(CONVERT):
+            return [create_feed_item(entry, feed.url) for entry in rss.entries]
+
+    def _record_fetch(self, feed: Feed, result: FetchResult) -> None:
+        labels = ((FEED, feed.url),)
+        status = NO_RESPONSE if result.status is None else str(int(result.status))
+        self.metrics.observe(READ, result.elapsed)
+        self.metrics.increment(RESPONSES, 1, labels + ((STATUS, status),))
+        if result.content:
+            self.metrics.increment(FETCHED_BYTES, len(result.content), labels)
+
+    def _save_states(self, states: list[FeedState]) -> None:
+        if self.state_service is not None and states:
+            self.state_service.set_states(states)
@@ -0,0 +1,301 @@
+"""Per-feed read state over any storage backend
+
+Unread items are indexed by feed, sorted by age, so unread counts are O(1)
+and marking a feed, a category or everything before a time read touches only
+the items that change. The change reaches storage in one mark_items_read
+call, which the append-only backends persist in O(changed items).
+"""
+
+from bisect import bisect_left, insort
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+import logging
+from logging import Logger
+from pathlib import Path
+import pickle
+from threading import RLock
+from typing import Iterable, Iterator
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssQueryService, IRssStorageService
+from core.models.feed import FeedItem
+from core.models.query import ItemQuery
+from core.services.rss.counters import UnreadCounters
+from core.services.rss.query import filter_items
+from core.services.rss.retention import item_age
+from core.utilities.file import atomic_write_bytes
+
+config = ConfigurationRoot()
+
+READ_MARKS_SUFFIX: str = ".read"
+# items without any date count as the oldest
+NO_DATE: float = float("-inf")
+
+
+class ReadStateStorageService(IRssStorageService, IRssQueryService):
+    """Wraps any storage backend, keeping an index of unread items per feed
+
+    Each bulk operation also raises the feeds' high-water marks: an item
+    stored later but dated at or before its feed's mark, such as an entry a
+    publisher backdated, is stored as read. Only the marks are saved by this
+    class, beside the storage file; the index is rebuilt from storage.
+
+    Given UnreadCounters, every change is reported to them as per-feed deltas.
+    Counters saved by an earlier run answer unread counts at once, and the
+    index is only built when an operation needs it.
+    """
+
+    storage: IRssStorageService
+    counters: UnreadCounters | None
+    # feed url -> epoch seconds at or before which new items are stored as read
+    marks: dict[str, float]
+    # feed url -> (age, id) of its unread items, sorted
+    unread: dict[str, list[tuple[float, str]]]
+    # id -> (feed url, age) of every stored item, the age None once it is read
+    items: dict[str, tuple[str, float | None]]
+    log: Logger
+    _indexed: bool
+    _lock: RLock
+
+    @property
+    def file_path(self) -> Path:
+        storage_file_path = config.get_config(FileStorageSettings).storage_file_path
+        return storage_file_path.with_name(storage_file_path.name + READ_MARKS_SUFFIX)
+
+    def __init__(
+        self,
+        storage: IRssStorageService,
+        counters: UnreadCounters | None = None,
+    ):
+        self.log = logging.getLogger(ReadStateStorageService.__name__)
+        self.storage = storage
+        self.counters = counters
+        self._lock = RLock()
+        self.load()
+
+    def load(self) -> None:
+        with self._lock:
+            if self.file_path.exists():
+                self.marks = pickle.loads(self.file_path.read_bytes())
+            else:
+                self.marks = {}
+            self.unread = {}
+            self.items = {}
+            self._indexed = False
+            if self.counters is None or not self.counters.exists:
+                self.rebuild()
+
+    def rebuild(self) -> None:
+        """Indexes every stored item again, and recounts the counters from the index"""
+        with self._lock:
+            self.unread = {}
+            self.items = {}
+            stored: Counter[str] = Counter()
+            for item in self.storage.get_stored_items():
+                self._index(item)
+                stored[item.feed_url] += 1
+            for entries in self.unread.values():
+                entries.sort()
+            self._indexed = True
+            if self.counters is not None:
+                unread = Counter({feed_url: len(entries) for feed_url, entries in self.unread.items()})
+                self.counters.reset(+unread, stored)
+
+    def unread_count(self, feed_url: str) -> int:
+        if self.counters is not None:
+            return self.counters.get_unread_count(feed_url)
+        self._ensure_index()
+        return len(self.unread.get(feed_url, ()))
+
+    def unread_counts(self) -> dict[str, int]:
+        """The number of unread items of every feed that has any"""
+        if self.counters is not None:
+            return self.counters.summary().feeds
+        with self._lock:
+            self._ensure_index()
+            return {feed_url: len(entries) for feed_url, entries in self.unread.items() if entries}
+
+    def mark_feeds_read(
+        self, feed_urls: Iterable[str] | None = None, before: float | None = None
+    ) -> list[str]:
+        """Marks the unread items of feeds read, optionally only those older than a time
+
+        Args:
+            feed_urls (Iterable[str] | None, optional): the feeds, None for every stored feed. Defaults to None.
+            before (float | None, optional): only mark items dated before these epoch seconds. Defaults to None.
+
+        Returns:
+            list[str]: the ids of the items marked read
+        """
+        with self._lock:
+            self._ensure_index()
+            item_ids: list[str] = []
+            unread: Counter[str] = Counter()
+            for feed_url in list(self.unread) if feed_urls is None else feed_urls:
+                entries = self.unread.get(feed_url, [])
+                end = len(entries) if before is None else bisect_left(entries, (before,))
+                for _, item_id in entries[:end]:
+                    self.items[item_id] = (feed_url, None)
+                    item_ids.append(item_id)
+                # without a time, up to the newest item actually marked: an item dated
+                # later, stored after this call, is still new
+                mark = before if before is not None else entries[end - 1][0] if end else None
+                unread[feed_url] -= end
+                del entries[:end]
+                if mark is not None:
+                    self.marks[feed_url] = max(self.marks.get(feed_url, NO_DATE), mark)
+            changed = self.storage.mark_items_read(item_ids, True) if item_ids else []
+            self._save_marks()
+            self._count(unread)
+        self.log.debug("marked %d items read", len(changed))
+        return changed
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Defers saving the storage and the counters until the outermost batch exits"""
+        with ExitStack() as stack:
+            batch = getattr(self.storage, "batch", None)
+            if batch is not None:
+                stack.enter_context(batch())
+            if self.counters is not None:
+                stack.enter_context(self.counters.batch())
+            yield
+
+    def get_stored_items(self) -> list[FeedItem]:
+        return self.storage.get_stored_items()
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        return self.storage.get_stored_item(item_id)
+
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        if isinstance(self.storage, IRssQueryService):
+            return self.storage.query_items(query)
+        return filter_items(self.storage.get_stored_items(), query)
+
+    def update_feed_item(self, item: FeedItem) -> None:
+        with self._lock:
+            self._ensure_index()
+            unread: Counter[str] = Counter()
+            stored: Counter[str] = Counter()
+            state = self.items.get(item.id)
+            if state is None:
+                self._apply_mark(item)
+            else:
+                stored[state[0]] -= 1
+                unread[state[0]] -= self._unindex(item.id)
+            self.storage.update_feed_item(item)
+            stored[item.feed_url] += 1
+            unread[item.feed_url] += self._index(item, sort=True)
+            self._count(unread, stored)
+
+    def store_feed_item(self, item: FeedItem) -> None:
+        self.store_feed_items([item])
+
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        with self._lock:
+            self._ensure_index()
+            # matches the backends, which keep the first copy of an item they see
+            new_items: dict[str, FeedItem] = {}
+            for item in items:
+                if item.id not in self.items and item.id not in new_items:
+                    self._apply_mark(item)
+                    new_items[item.id] = item
+            self.storage.store_feed_items(items)
+            unread: Counter[str] = Counter()
+            stored: Counter[str] = Counter()
+            for item in new_items.values():
+                stored[item.feed_url] += 1
+                unread[item.feed_url] += self._index(item, sort=True)
+            self._count(unread, stored)
+
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        with self._lock:
+            self._ensure_index()
+            self.storage.remove_feed_items(item_ids)
+            unread: Counter[str] = Counter()
+            stored: Counter[str] = Counter()
+            for item_id in item_ids:
+                state = self.items.get(item_id)
+                if state is None:
+                    continue
+                stored[state[0]] -= 1
+                unread[state[0]] -= self._unindex(item_id)
+                del self.items[item_id]
+            self._count(unread, stored)
+
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        with self._lock:
+            self._ensure_index()
+            changed = self.storage.mark_items_read(item_ids, read)
+            unread: Counter[str] = Counter()
+            for item_id in changed:
+                state = self.items.get(item_id)
+                if read:
+                    if state is not None:
+                        unread[state[0]] -= self._unindex(item_id)
+                    continue
+                item = self.storage.get_stored_item(item_id)
+                if item is not None:
+                    unread[item.feed_url] += self._index(item, sort=True)
+            self._count(unread)
+            return changed
+
+    def compact(self) -> None:
+        compact = getattr(self.storage, "compact", None)
+        if compact is not None:
+            compact()
+            if isinstance(self.storage, ISave):
+                self.storage.save()
+
+    def _ensure_index(self) -> None:
+        if not self._indexed:
+            self.rebuild()
+
+    def _count(self, unread: Counter[str], stored: Counter[str] | None = None) -> None:
+        if self.counters is None:
+            return
+        # deltas that cancel out, as an update's do, would still cost the counters a save
+        unread = Counter({feed_url: delta for feed_url, delta in unread.items() if delta})
+        if stored is not None:
+            stored = Counter({feed_url: delta for feed_url, delta in stored.items() if delta})
+        if unread or stored:
+            self.counters.apply(unread, stored)
+
+    def _apply_mark(self, item: FeedItem) -> None:
+        mark = self.marks.get(item.feed_url)
+        if mark is not None and not item.read and (item_age(item) or NO_DATE) <= mark:
+            item.read = True
+
+    def _index(self, item: FeedItem, sort: bool = False) -> bool:
+        """Records an item, returning whether it is unread"""
+        if item.read:
+            self.items[item.id] = (item.feed_url, None)
+            return False
+        age = item_age(item)
+        entry = (NO_DATE if age is None else age, item.id)
+        self.items[item.id] = (item.feed_url, entry[0])
+        entries = self.unread.setdefault(item.feed_url, [])
+        if sort:
+            insort(entries, entry)
+        else:
+            entries.append(entry)
+        return True
+
+    def _unindex(self, item_id: str) -> bool:
+        """Drops an item from the unread lists, leaving it known as read; whether it was unread"""
+        state = self.items.get(item_id)
+        if state is None or state[1] is None:
+            return False
+        feed_url, age = state
+        entries = self.unread[feed_url]
+        index = bisect_left(entries, (age, item_id))
+        if index < len(entries) and entries[index] == (age, item_id):
+            del entries[index]
+        self.items[item_id] = (feed_url, None)
+        return True
+
+    def _save_marks(self) -> None:
+        data = pickle.dumps(self.marks, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write_bytes(self.file_path, data)
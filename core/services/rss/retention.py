@@ -0,0 +1,192 @@
+from collections import defaultdict
+import logging
+from logging import Logger
+from pathlib import Path
+import pickle
+from threading import Lock
+import time
+from typing import Callable
+
+from core.config.common import config
+from core.config.file import FileStorageSettings, RetentionSettings
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssStorageService
+from core.models.feed import FeedItem
+from core.models.retention import CompactionResult
+from core.services.rss.archive import ItemArchive
+from core.services.rss.fingerprint import item_fingerprint
+from core.utilities.datetime import to_epoch
+from core.utilities.file import atomic_write_bytes
+
+REMOVED_SUFFIX: str = ".removed"
+DAY: int = 24 * 60 * 60
+
+
+def item_age(item: FeedItem) -> float | None:
+    """The epoch seconds an item's age is counted from: published, else when it was stored"""
+    value = item.published or item.created
+    return None if value is None else to_epoch(value)
+
+
+def select_expired(
+    items: list[FeedItem], settings: RetentionSettings, now: float
+) -> list[FeedItem]:
+    """Picks the items the retention rules remove
+
+    Args:
+        items (list[FeedItem]): the stored items
+        settings (RetentionSettings): the retention rules
+        now (float): the current time in epoch seconds
+
+    Returns:
+        list[FeedItem]: the expired items, each listed once
+    """
+    expired: dict[str, FeedItem] = {}
+    ages = {item.id: item_age(item) for item in items}
+    for max_age_days, read_only in (
+        (settings.max_age_days, False),
+        (settings.read_max_age_days, True),
+    ):
+        if max_age_days is None:
+            continue
+        cutoff = now - max_age_days * DAY
+        for item in items:
+            age = ages[item.id]
+            if age is not None and age < cutoff and (item.read or not read_only):
+                expired[item.id] = item
+    if settings.max_items_per_feed is not None:
+        feeds: dict[str, list[FeedItem]] = defaultdict(list)
+        for item in items:
+            feeds[item.feed_url].append(item)
+        for feed_items in feeds.values():
+            if len(feed_items) <= settings.max_items_per_feed:
+                continue
+            # items without any date count as the oldest
+            feed_items.sort(key=lambda item: ages[item.id] or float("-inf"), reverse=True)
+            for item in feed_items[settings.max_items_per_feed :]:
+                expired[item.id] = item
+    return list(expired.values())
+
+
+class RetentionService(ISave):
+    """Applies the retention rules to stored items, archiving what it removes
+
+    The fingerprints of removed items are remembered, so a feed that still
+    lists an entry does not bring it back on the next refresh. Each refresh
+    that turns one away renews it; once no feed has listed it for
+    forget_removed_days, it is forgotten at the next compaction. Renewals are
+    saved with the compaction.
+    """
+
+    storage: IRssStorageService
+    archive: ItemArchive
+    # fingerprint -> epoch seconds the item was removed or last listed by its feed
+    removed: dict[str, float]
+    log: Logger
+    _lock: Lock
+
+    @property
+    def settings(self) -> RetentionSettings:
+        return config.get_config(RetentionSettings, True)
+
+    @settings.setter
+    def settings(self, settings: RetentionSettings) -> None:
+        config.set_config(RetentionSettings, settings)
+
+    @property
+    def file_path(self) -> Path:
+        storage_file_path = config.get_config(FileStorageSettings).storage_file_path
+        return storage_file_path.with_name(storage_file_path.name + REMOVED_SUFFIX)
+
+    def __init__(
+        self,
+        storage: IRssStorageService,
+        archive: ItemArchive | None = None,
+        settings: RetentionSettings | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.log = logging.getLogger(RetentionService.__name__)
+        self.storage = storage
+        self.archive = archive if archive is not None else ItemArchive()
+        if settings is not None:
+            self.settings = settings
+        self.clock = clock
+        self._lock = Lock()
+        self.load()
+
+    def load(self) -> None:
+        with self._lock:
+            if self.file_path.exists():
+                self.removed = pickle.loads(self.file_path.read_bytes())
+            else:
+                self.removed = {}
+
+    def save(self) -> None:
+        with self._lock:
+            data = pickle.dumps(self.removed, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write_bytes(self.file_path, data)
+
+    def is_expired(self, item: FeedItem, now: float | None = None) -> bool:
+        """Whether an incoming item should not be stored, because it was removed or is too old
+
+        Args:
+            item (FeedItem): the incoming feed item
+            now (float | None, optional): the current time in epoch seconds. Defaults to the clock.
+
+        Returns:
+            bool: True if the item should be dropped
+        """
+        now = self.clock() if now is None else now
+        fingerprint = item_fingerprint(item)
+        with self._lock:
+            if fingerprint in self.removed:
+                # still listed by its feed
+                self.removed[fingerprint] = now
+                return True
+        max_age_days = self.settings.max_age_days
+        if max_age_days is None:
+            return False
+        age = item_age(item)
+        return age is not None and age < now - max_age_days * DAY
+
+    def compact(self, now: float | None = None) -> CompactionResult:
+        """Removes expired items from storage, archiving them first if archiving is on
+
+        Args:
+            now (float | None, optional): the current time in epoch seconds. Defaults to the clock.
+
+        Returns:
+            CompactionResult: how many items were kept, removed and archived
+        """
+        settings = self.settings
+        now = self.clock() if now is None else now
+        items = self.storage.get_stored_items()
+        expired = select_expired(items, settings, now)
+        result = CompactionResult(kept=len(items) - len(expired), removed=len(expired))
+        # read before removal, which may invalidate items that are views into storage
+        removed = [item_fingerprint(item) for item in expired]
+        if expired:
+            if settings.archive:
+                # the segment is written before anything is removed, so a failure loses nothing
+                result.segment = self.archive.write_segment(expired)
+                result.archived = len(expired)
+            self.storage.remove_feed_items([item.id for item in expired])
+        compact = getattr(self.storage, "compact", None)
+        if compact is not None:
+            compact()
+            if isinstance(self.storage, ISave):
+                self.storage.save()
+        self._remember(removed, settings, now)
+        self.log.info("compacted storage: %r", result)
+        return result
+
+    def _remember(self, removed: list[str], settings: RetentionSettings, now: float) -> None:
+        with self._lock:
+            cutoff = now - settings.forget_removed_days * DAY
+            self.removed = {
+                fingerprint: seen
+                for fingerprint, seen in self.removed.items()
+                if seen >= cutoff
+            }
+            self.removed.update(dict.fromkeys(removed, now))
+        self.save()
@@ -0,0 +1,245 @@
+from dataclasses import dataclass
+import heapq
+import logging
+from logging import Logger
+import random
+from threading import Event, Thread
+import time
+from typing import Callable
+
+from core.config.common import config
+from core.config.scheduler import SchedulerSettings
+from core.models.feed import Feed
+from core.models.refresh import FeedRefreshResult
+from core.models.retention import CompactionResult
+from core.services.rss.reader import RssFeedReaderService
+from core.services.rss.retention import RetentionService
+from core.utilities.datetime import to_epoch
+
+
+@dataclass(slots=True)
+class FeedSchedule:
+    feed: Feed
+    interval: float
+    next_due: float
+    last_polled: float | None = None
+    failures: int = 0
+    unchanged: int = 0
+    update_hint: int | None = None
+
+
+class FeedPollingScheduler:
+    """Polls each feed when it is due, adapting per-feed intervals to how often it publishes
+
+    Due times live in a heap, so each tick only touches the feeds that are due.
+    A feed that publishes is polled sooner (its interval tracks the observed gap
+    between new items), one that returns 304s or nothing new backs off
+    exponentially, and errors back off from their own base interval. Publisher
+    ttl / sy:updatePeriod hints set a floor on the interval, and every due time
+    is jittered so feeds don't bunch up. Given a RetentionService, the loop
+    also runs its compaction once every compaction_interval.
+    """
+
+    reader: RssFeedReaderService
+    retention: RetentionService | None
+    schedules: dict[str, FeedSchedule]
+    log: Logger
+    _heap: list[tuple[float, int, str]]
+    _sequence: int
+    _last_compaction: float | None
+    _stop: Event
+    _thread: Thread | None
+
+    def __init__(
+        self,
+        reader: RssFeedReaderService,
+        settings: SchedulerSettings | None = None,
+        clock: Callable[[], float] = time.time,
+        rng: random.Random | None = None,
+        retention: RetentionService | None = None,
+    ):
+        self.log = logging.getLogger(FeedPollingScheduler.__name__)
+        self.reader = reader
+        if settings is not None:
+            self.settings = settings
+        self.clock = clock
+        self.rng = rng if rng is not None else random.Random()
+        self.retention = retention
+        self._last_compaction = None
+        self.schedules = {}
+        self._heap = []
+        self._sequence = 0
+        self._stop = Event()
+        self._thread = None
+
+    @property
+    def settings(self) -> SchedulerSettings:
+        return config.get_config(SchedulerSettings, True)
+
+    @settings.setter
+    def settings(self, settings: SchedulerSettings) -> None:
+        config.set_config(SchedulerSettings, settings)
+
+    def sync_feeds(self) -> None:
+        """Starts scheduling feeds that were added and forgets feeds that were removed or disabled"""
+        now = self.clock()
+        feeds = {feed.url: feed for feed in self.reader.feed_service.feeds}
+        for url in list(self.schedules.keys()):
+            if url not in feeds:
+                # the heap entry is dropped lazily when it comes due
+                del self.schedules[url]
+        for url, feed in feeds.items():
+            if url not in self.schedules:
+                self._schedule(self._create_schedule(feed, now))
+
+    def due_feeds(self, now: float | None = None) -> list[Feed]:
+        """Pops every feed that is due, in due order"""
+        if now is None:
+            now = self.clock()
+        due: list[Feed] = []
+        while self._heap and self._heap[0][0] <= now:
+            next_due, _, url = heapq.heappop(self._heap)
+            schedule = self.schedules.get(url)
+            if schedule is None or schedule.next_due != next_due:
+                continue
+            due.append(schedule.feed)
+        return due
+
+    def poll_due(self, now: float | None = None) -> list[FeedRefreshResult]:
+        due = self.due_feeds(now)
+        if not due:
+            return []
+        results: list[FeedRefreshResult] = []
+        error: Exception | None = None
+        try:
+            results = self.reader.refresh_feeds(due)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # due_feeds took the feeds off the heap, each must go back even if the refresh raised
+            polled = self.clock()
+            reported = {result.url: result for result in results}
+            for feed in due:
+                schedule = self.schedules.get(feed.url)
+                if schedule is not None:
+                    result = reported.get(feed.url) or FeedRefreshResult(url=feed.url, error=error)
+                    self.reschedule(schedule, result, polled)
+        return results
+
+    def compact_due(self, now: float | None = None) -> CompactionResult | None:
+        """Runs the retention compaction if its interval has passed since the last run"""
+        if self.retention is None:
+            return None
+        if now is None:
+            now = self.clock()
+        interval = self.retention.settings.compaction_interval
+        if self._last_compaction is not None and now - self._last_compaction < interval:
+            return None
+        self._last_compaction = now
+        with self.reader.storage_lock:
+            return self.retention.compact()
+
+    def seconds_until_next(self) -> float:
+        while self._heap:
+            next_due, _, url = self._heap[0]
+            schedule = self.schedules.get(url)
+            if schedule is not None and schedule.next_due == next_due:
+                return max(next_due - self.clock(), 0.0)
+            heapq.heappop(self._heap)
+        return self.settings.sync_interval
+
+    def reschedule(
+        self, schedule: FeedSchedule, result: FeedRefreshResult, now: float
+    ) -> None:
+        settings = self.settings
+        if result.update_hint is not None:
+            schedule.update_hint = result.update_hint
+        if result.failed:
+            schedule.failures += 1
+            delay = min(
+                settings.error_interval * settings.backoff_factor ** (schedule.failures - 1),
+                settings.max_error_interval,
+            )
+        else:
+            schedule.failures = 0
+            if result.new_items > 0:
+                schedule.unchanged = 0
+                if schedule.last_polled is not None:
+                    # move toward the observed gap between new items
+                    observed = (now - schedule.last_polled) / result.new_items
+                    schedule.interval = (schedule.interval + observed) / 2
+            else:
+                schedule.unchanged += 1
+                schedule.interval *= settings.backoff_factor
+            schedule.interval = self._clamp(schedule.interval, schedule.update_hint)
+            delay = schedule.interval
+        schedule.last_polled = now
+        schedule.next_due = now + self._jitter(delay)
+        self._schedule(schedule)
+
+    def run(self, stop: Event | None = None) -> None:
+        if stop is None:
+            stop = self._stop
+        self.sync_feeds()
+        last_sync = self.clock()
+        while not stop.is_set():
+            if self.clock() - last_sync >= self.settings.sync_interval:
+                self.sync_feeds()
+                last_sync = self.clock()
+            try:
+                self.poll_due()
+            except Exception as e:
+                self.log.error("polling failed", exc_info=e)
+            try:
+                self.compact_due()
+            except Exception as e:
+                self.log.error("compaction failed", exc_info=e)
+            stop.wait(min(self.seconds_until_next(), self.settings.sync_interval))
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(
+            target=self.run, name=FeedPollingScheduler.__name__, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _create_schedule(self, feed: Feed, now: float) -> FeedSchedule:
+        settings = self.settings
+        interval = settings.default_interval
+        last_polled = None
+        self.reader.apply_state(feed)
+        if feed.last_read is not None:
+            last_polled = to_epoch(feed.last_read)
+        if last_polled is not None and last_polled + interval > now:
+            next_due = last_polled + self._jitter(interval)
+        else:
+            # spread first polls over the shortest interval instead of all at once
+            next_due = now + self.rng.uniform(0, settings.min_interval)
+        return FeedSchedule(
+            feed=feed, interval=interval, next_due=next_due, last_polled=last_polled
+        )
+
+    def _schedule(self, schedule: FeedSchedule) -> None:
+        self.schedules[schedule.feed.url] = schedule
+        self._sequence += 1
+        heapq.heappush(self._heap, (schedule.next_due, self._sequence, schedule.feed.url))
+
+    def _clamp(self, interval: float, update_hint: int | None) -> float:
+        settings = self.settings
+        floor = settings.min_interval
+        if update_hint is not None:
+            floor = max(floor, update_hint)
+        return min(max(interval, floor), max(settings.max_interval, floor))
+
+    def _jitter(self, delay: float) -> float:
+        jitter = self.settings.jitter
+        return delay * self.rng.uniform(1 - jitter, 1 + jitter)
@@ -0,0 +1,475 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+import heapq
+import html
+import logging
+from logging import Logger
+import math
+import os
+from pathlib import Path
+import pickle
+import re
+from threading import RLock
+from typing import Iterator
+import zlib
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.constants.common import EMPTY_STRING
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssQueryService, IRssStorageService
+from core.interfaces.search import ISearchService
+from core.mixins.save import BatchSaveMixin
+from core.models.feed import FeedItem
+from core.models.query import ItemQuery
+from core.models.search import SearchResult
+from core.utilities.decorators import autosave
+from core.services.rss.appendlog import encode_record, read_records
+from core.services.rss.query import filter_items
+from core.utilities.file import atomic_write_bytes
+
+config = ConfigurationRoot()
+
+SEARCH_INDEX_SUFFIX: str = ".search"
+SEARCH_JOURNAL_SUFFIX: str = ".log"
+# a save writes a new snapshot instead once the journal outgrows the index, or this
+JOURNAL_MIN_RECORDS: int = 1024
+TOKEN = re.compile(r"\w+")
+TAG = re.compile(r"<[^>]*>")
+PHRASE = re.compile(r'"([^"]+)"')
+# a title match counts as this many summary matches
+TITLE_WEIGHT: int = 3
+MAX_FREQUENCY: int = 0xFFFF
+# BM25 parameters
+K1: float = 1.2
+B: float = 0.75
+# phrases are verified against the item text, so over-fetch candidates for them
+PHRASE_CANDIDATES: int = 4
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return TOKEN.findall(html.unescape(TAG.sub(" ", text)).lower())
+
+
+def content_hash(item: FeedItem) -> int:
+    return zlib.crc32(f"{item.title or EMPTY_STRING}\x00{item.summary or EMPTY_STRING}".encode())
+
+
+def contains_phrase(tokens: list[str], phrase: list[str]) -> bool:
+    width = len(phrase)
+    return any(
+        tokens[start : start + width] == phrase
+        for start in range(len(tokens) - width + 1)
+        if tokens[start] == phrase[0]
+    )
+
+
+class SearchIndex(BatchSaveMixin, ISearchService, ISave):
+    """An inverted index over FeedItem titles and summaries with BM25 ranking
+
+    Every indexed item gets a document number. Postings are append-only
+    arrays of (document, term frequency) per term, so adding items never
+    reorders them; a changed item is re-added under a new document number
+    and its old one is tombstoned until the next compaction. Queries match
+    items containing every keyword, intersecting from the rarest term so
+    selective queries only touch a few postings, and quoted phrases are
+    checked against the item text.
+
+    The index is persisted as a snapshot and a journal beside it. Saving
+    appends the items added and removed since the last save to the journal,
+    as term counts, so it costs O(changed items); a compaction, or a journal
+    grown larger than the index, writes a new snapshot. Both carry a
+    generation, so a journal left behind by a crash during a snapshot is not
+    replayed over it. When the loaded index doesn't hold as many items as
+    storage, because one of them was saved without the other, it is rebuilt.
+    """
+
+    storage: IRssStorageService
+    log: Logger
+    postings: dict[str, tuple[array, array]]
+    item_ids: list[str | None]
+    doc_lengths: array
+    docs: dict[str, tuple[int, int]]
+    total_length: int
+    generation: int
+    # changes not yet appended to the journal: (id, digest, term counts), or a removed id
+    _journal: list[tuple[str, int, dict[str, int]] | str]
+    _journal_records: int
+    # the next save writes a snapshot, which also holds everything in _journal
+    _snapshot_due: bool
+    _lock: RLock
+
+    @property
+    def settings(self) -> FileStorageSettings:
+        return config.get_config(FileStorageSettings)
+
+    @property
+    def file_path(self) -> Path:
+        storage_file_path = self.settings.storage_file_path
+        return storage_file_path.with_name(storage_file_path.name + SEARCH_INDEX_SUFFIX)
+
+    @property
+    def journal_path(self) -> Path:
+        return self.file_path.with_name(self.file_path.name + SEARCH_JOURNAL_SUFFIX)
+
+    @property
+    def count(self) -> int:
+        return len(self.docs)
+
+    @property
+    def dead(self) -> int:
+        return len(self.item_ids) - len(self.docs)
+
+    def __init__(self, storage: IRssStorageService):
+        self.log = logging.getLogger(SearchIndex.__name__)
+        self.storage = storage
+        self.generation = 0
+        self._lock = RLock()
+        self.load()
+
+    def clear(self) -> None:
+        self.postings = {}
+        self.item_ids = []
+        self.doc_lengths = array("I")
+        self.docs = {}
+        self.total_length = 0
+        self._journal = []
+        self._journal_records = 0
+        self._snapshot_due = True
+
+    def load(self) -> None:
+        with self._lock:
+            self.clear()
+            if not self.file_path.exists():
+                self.rebuild()
+                return
+            state = pickle.loads(self.file_path.read_bytes())
+            self.postings = state["postings"]
+            self.item_ids = state["item_ids"]
+            self.doc_lengths = state["doc_lengths"]
+            self.docs = state["docs"]
+            self.total_length = state["total_length"]
+            self.generation = state.get("generation", 0)
+            self._snapshot_due = False
+            self._replay()
+            stored = len(self.storage.get_stored_items())
+            if stored != self.count:
+                self.log.warning(
+                    "'%s' holds %d items but storage holds %d, rebuilding it",
+                    self.file_path.as_posix(),
+                    self.count,
+                    stored,
+                )
+                self.rebuild()
+
+    @autosave
+    def rebuild(self) -> None:
+        with self._lock:
+            self.clear()
+            self.index_items(self.storage.get_stored_items())
+
+    def save(self) -> None:
+        with self._lock:
+            if self._snapshot_due or self._journal_records + len(self._journal) > max(
+                self.count, JOURNAL_MIN_RECORDS
+            ):
+                self._write_snapshot()
+            elif self._journal:
+                self._append_journal()
+
+    def contains(self, item_id: str) -> bool:
+        return item_id in self.docs
+
+    @autosave
+    def index_items(self, items: list[FeedItem]) -> None:
+        with self._lock:
+            for item in items:
+                digest = content_hash(item)
+                existing = self.docs.get(item.id)
+                if existing is not None:
+                    if existing[1] == digest:
+                        continue
+                    self._remove(item.id)
+                counts = self._add(item, digest)
+                if not self._snapshot_due:
+                    self._journal.append((item.id, digest, counts))
+            if self.dead > len(self.docs):
+                self.compact()
+
+    @autosave
+    def remove_items(self, item_ids: list[str]) -> None:
+        with self._lock:
+            for item_id in item_ids:
+                if self._remove(item_id) and not self._snapshot_due:
+                    self._journal.append(item_id)
+
+    def search(self, query: str, limit: int = 20) -> list[SearchResult]:
+        phrases = [tokenize(phrase) for phrase in PHRASE.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = list(dict.fromkeys(tokenize(PHRASE.sub(" ", query)) + [t for p in phrases for t in p]))
+        if not terms or limit <= 0:
+            return []
+        with self._lock:
+            scores = self._score(terms)
+            wanted = limit * PHRASE_CANDIDATES if phrases else limit
+            ranked = heapq.nlargest(wanted, scores.items(), key=lambda entry: entry[1])
+            item_ids = [(self.item_ids[doc], score) for doc, score in ranked]
+        results: list[SearchResult] = []
+        for item_id, score in item_ids:
+            if item_id is None:
+                continue
+            item = self.storage.get_stored_item(item_id)
+            if item is None:
+                continue
+            if phrases:
+                tokens = tokenize(item.title) + [EMPTY_STRING] + tokenize(item.summary)
+                if not all(contains_phrase(tokens, phrase) for phrase in phrases):
+                    continue
+            results.append(SearchResult(item=item, score=score))
+            if len(results) >= limit:
+                break
+        return results
+
+    def compact(self) -> None:
+        """Drops tombstoned documents and renumbers the rest"""
+        with self._lock:
+            renumbered: dict[int, int] = {}
+            item_ids: list[str | None] = []
+            doc_lengths = array("I")
+            for doc, item_id in enumerate(self.item_ids):
+                if item_id is None:
+                    continue
+                renumbered[doc] = len(item_ids)
+                item_ids.append(item_id)
+                doc_lengths.append(self.doc_lengths[doc])
+            postings: dict[str, tuple[array, array]] = {}
+            for term, (docs, frequencies) in self.postings.items():
+                kept_docs, kept_frequencies = array("I"), array("H")
+                for doc, frequency in zip(docs, frequencies):
+                    new_doc = renumbered.get(doc)
+                    if new_doc is not None:
+                        kept_docs.append(new_doc)
+                        kept_frequencies.append(frequency)
+                if kept_docs:
+                    postings[term] = (kept_docs, kept_frequencies)
+            self.postings = postings
+            self.item_ids = item_ids
+            self.doc_lengths = doc_lengths
+            self.docs = {
+                item_id: (renumbered[doc], digest)
+                for item_id, (doc, digest) in self.docs.items()
+            }
+            # the journal replays by item id, but the snapshot should drop the tombstones too
+            self._snapshot_due = True
+
+    def _write_snapshot(self) -> None:
+        self.generation += 1
+        state = {
+            "postings": self.postings,
+            "item_ids": self.item_ids,
+            "doc_lengths": self.doc_lengths,
+            "docs": self.docs,
+            "total_length": self.total_length,
+            "generation": self.generation,
+        }
+        atomic_write_bytes(self.file_path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        self.journal_path.unlink(missing_ok=True)
+        self._journal = []
+        self._journal_records = 0
+        self._snapshot_due = False
+
+    def _append_journal(self) -> None:
+        # a new journal starts with the generation of the snapshot it follows
+        mode = "ab" if self._journal_records else "wb"
+        with open(self.journal_path, mode) as journal_file:
+            if not self._journal_records:
+                journal_file.write(encode_record(self.generation))
+            journal_file.write(b"".join(encode_record(record) for record in self._journal))
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self._journal_records += len(self._journal)
+        self._journal = []
+
+    def _replay(self) -> None:
+        """Applies the journal written since the loaded snapshot"""
+        if not self.journal_path.exists():
+            return
+        valid_size = 0
+        with open(self.journal_path, "rb") as journal_file:
+            records = read_records(journal_file)
+            header = next(records, None)
+            if header is None or header[0] != self.generation:
+                # left behind by a crash while the snapshot was written, which holds it all
+                self.journal_path.unlink()
+                return
+            valid_size = header[1]
+            for record, end in records:
+                if isinstance(record, str):
+                    self._remove(record)
+                else:
+                    item_id, digest, counts = record
+                    self._remove(item_id)
+                    self._insert(item_id, digest, counts)
+                self._journal_records += 1
+                valid_size = end
+        if valid_size != self.journal_path.stat().st_size:
+            self.log.warning(
+                "'%s' ends with a partial record, truncating to %d bytes",
+                self.journal_path.as_posix(),
+                valid_size,
+            )
+            os.truncate(self.journal_path, valid_size)
+
+    def _add(self, item: FeedItem, digest: int) -> dict[str, int]:
+        """Indexes an item, returning its term counts"""
+        counts = Counter(tokenize(item.summary))
+        for term in tokenize(item.title):
+            counts[term] += TITLE_WEIGHT
+        self._insert(item.id, digest, counts)
+        return dict(counts)
+
+    def _insert(self, item_id: str, digest: int, counts: dict[str, int]) -> None:
+        doc = len(self.item_ids)
+        self.item_ids.append(item_id)
+        length = sum(counts.values())
+        self.doc_lengths.append(length)
+        self.total_length += length
+        self.docs[item_id] = (doc, digest)
+        for term, frequency in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = (array("I"), array("H"))
+                self.postings[term] = entry
+            entry[0].append(doc)
+            entry[1].append(min(frequency, MAX_FREQUENCY))
+
+    def _remove(self, item_id: str) -> bool:
+        existing = self.docs.pop(item_id, None)
+        if existing is None:
+            return False
+        doc = existing[0]
+        self.item_ids[doc] = None
+        self.total_length -= self.doc_lengths[doc]
+        return True
+
+    def _score(self, terms: list[str]) -> dict[int, float]:
+        entries = [self.postings.get(term) for term in terms]
+        if any(entry is None for entry in entries):
+            return {}
+        entries.sort(key=lambda entry: len(entry[0]))  # type: ignore
+        documents = max(len(self.docs), 1)
+        average_length = max(self.total_length / documents, 1.0)
+        item_ids, doc_lengths = self.item_ids, self.doc_lengths
+
+        def weight(entry: tuple[array, array]) -> float:
+            frequency = len(entry[0])
+            return math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
+
+        def term_score(frequency: int, doc: int, idf: float) -> float:
+            norm = K1 * (1 - B + B * doc_lengths[doc] / average_length)
+            return idf * frequency * (K1 + 1) / (frequency + norm)
+
+        rarest = entries[0]
+        idf = weight(rarest)  # type: ignore
+        scores: dict[int, float] = {
+            doc: term_score(frequency, doc, idf)
+            for doc, frequency in zip(*rarest)  # type: ignore
+            if item_ids[doc] is not None
+        }
+        for docs, frequencies in entries[1:]:  # type: ignore
+            idf = weight((docs, frequencies))
+            size = len(docs)
+            matched: dict[int, float] = {}
+            for doc, score in scores.items():
+                position = bisect_left(docs, doc)
+                if position < size and docs[position] == doc:
+                    matched[doc] = score + term_score(frequencies[position], doc, idf)
+            scores = matched
+            if not scores:
+                break
+        return scores
+
+
+class SearchIndexedStorageService(IRssStorageService, IRssQueryService):
+    """Wraps any storage backend, keeping a SearchIndex in step with its items
+
+    The storage and the index each save themselves; batch() defers both.
+    """
+
+    storage: IRssStorageService
+    index: SearchIndex
+
+    def __init__(self, storage: IRssStorageService, index: SearchIndex | None = None):
+        self.storage = storage
+        self.index = index if index is not None else SearchIndex(storage)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            if isinstance(self.storage, BatchSaveMixin):
+                stack.enter_context(self.storage.batch())
+            stack.enter_context(self.index.batch())
+            yield
+
+    def search(self, query: str, limit: int = 20) -> list[SearchResult]:
+        return self.index.search(query, limit)
+
+    def get_stored_items(self) -> list[FeedItem]:
+        return self.storage.get_stored_items()
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        return self.storage.get_stored_item(item_id)
+
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        if isinstance(self.storage, IRssQueryService):
+            return self.storage.query_items(query)
+        return filter_items(self.storage.get_stored_items(), query)
+
+    def update_feed_item(self, item: FeedItem) -> None:
+        with self.batch():
+            self.storage.update_feed_item(item)
+            stored_item = self.storage.get_stored_item(item.id)
+            self.index.index_items([item if stored_item is None else stored_item])
+
+    def store_feed_item(self, item: FeedItem) -> None:
+        self.store_feed_items([item])
+
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        # the backends keep the first copy of an item they see, or update it in place
+        # like SQLite, so an id seen before is indexed as storage ended up with it
+        new_items: dict[str, FeedItem] = {}
+        seen_ids: set[str] = set()
+        for item in items:
+            if self.index.contains(item.id) or item.id in new_items:
+                seen_ids.add(item.id)
+            else:
+                new_items[item.id] = item
+        with self.batch():
+            self.storage.store_feed_items(items)
+            for item_id in seen_ids:
+                stored_item = self.storage.get_stored_item(item_id)
+                if stored_item is not None:
+                    new_items[item_id] = stored_item
+            self.index.index_items(list(new_items.values()))
+
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        with self.batch():
+            self.storage.remove_feed_items(item_ids)
+            self.index.remove_items(item_ids)
+
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        # the read state is not indexed
+        return self.storage.mark_items_read(item_ids, read)
+
+    def compact(self) -> None:
+        compact = getattr(self.storage, "compact", None)
+        if compact is not None:
+            compact()
+            if isinstance(self.storage, ISave):
+                self.storage.save()
+        self.index.compact()
+        self.index.save()
@@ -0,0 +1,334 @@
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+from logging import Logger
+from pathlib import Path
+import sqlite3
+from threading import RLock
+from typing import Any, Iterable, Iterator
+
+from core.config.common import ConfigurationRoot
+from core.config.file import FileStorageSettings
+from core.interfaces.common import ISave
+from core.interfaces.rss import IRssQueryService, IRssStorageService
+from core.models.feed import FeedItem
+from core.models.query import ItemQuery, SortOrder
+from core.services.rss.query import decode_cursor, encode_cursor
+from core.utilities.datetime import DateTime, to_epoch
+
+config = ConfigurationRoot()
+
+SCHEMA: tuple[str, ...] = (
+    """CREATE TABLE IF NOT EXISTS feed_items (
+        id TEXT PRIMARY KEY,
+        title TEXT,
+        summary TEXT,
+        images TEXT,
+        link TEXT,
+        published REAL,
+        published_offset INTEGER,
+        feed_url TEXT NOT NULL DEFAULT '',
+        read INTEGER NOT NULL DEFAULT 0,
+        created REAL,
+        created_offset INTEGER,
+        fingerprint TEXT,
+        content_hash TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_feed_items_feed_url ON feed_items (feed_url, published)",
+    "CREATE INDEX IF NOT EXISTS ix_feed_items_feed_url_read ON feed_items (feed_url, read, published)",
+    "CREATE INDEX IF NOT EXISTS ix_feed_items_read ON feed_items (read, published)",
+    "CREATE INDEX IF NOT EXISTS ix_feed_items_published ON feed_items (published)",
+)
+# columns added after the first release, added to existing databases on load
+ADDED_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("fingerprint", "TEXT"),
+    ("content_hash", "TEXT"),
+)
+COLUMNS: str = "id, title, summary, images, link, published, published_offset, feed_url, read, created, created_offset, fingerprint, content_hash"
+PLACEHOLDERS: str = ", ".join("?" for _ in COLUMNS.split(","))
+SELECT_ITEMS: str = f"SELECT {COLUMNS} FROM feed_items"
+# Re-fetched items refresh their content, but never reset read state or creation time
+UPSERT_ITEMS: str = f"""INSERT INTO feed_items ({COLUMNS}) VALUES ({PLACEHOLDERS})
+    ON CONFLICT (id) DO UPDATE SET
+        title = excluded.title,
+        summary = excluded.summary,
+        images = excluded.images,
+        link = excluded.link,
+        published = excluded.published,
+        published_offset = excluded.published_offset,
+        feed_url = excluded.feed_url,
+        fingerprint = excluded.fingerprint,
+        content_hash = excluded.content_hash"""
+DELETE_ITEM: str = "DELETE FROM feed_items WHERE id = ?"
+SELECT_READ_CHANGES: str = "SELECT id FROM feed_items WHERE read <> ? AND id IN ({})"
+MARK_READ: str = "UPDATE feed_items SET read = ? WHERE id = ?"
+# ids bound to one statement, below SQLite's limit on parameters
+MARK_CHUNK_SIZE: int = 500
+REPLACE_ITEM: str = f"INSERT OR REPLACE INTO feed_items ({COLUMNS}) VALUES ({PLACEHOLDERS})"
+# unlimited queries are read this many rows at a time, so the lock is never held between yields
+QUERY_CHUNK_SIZE: int = 500
+
+
+class SqliteRssStorageService(IRssStorageService, IRssQueryService, ISave):
+    """Stores feed items in a SQLite database in WAL mode
+
+    feed_url, read and published are indexed so per-feed, unread and date
+    ordered reads are index lookups rather than scans of every stored item.
+    """
+
+    connection: sqlite3.Connection
+    log: Logger
+    _file_path: Path | None
+    _lock: RLock
+
+    @property
+    def settings(self) -> FileStorageSettings:
+        return config.get_config(FileStorageSettings)
+
+    @property
+    def file_path(self) -> Path:
+        if self._file_path is not None:
+            return self._file_path
+        return self.settings.storage_file_path
+
+    def __init__(self, file_path: Path | None = None):
+        self.log = logging.getLogger(SqliteRssStorageService.__name__)
+        self._file_path = file_path
+        self._lock = RLock()
+        self.load()
+
+    def load(self) -> None:
+        self.connection = sqlite3.connect(
+            self.file_path, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            columns = {
+                row[1] for row in self.connection.execute("PRAGMA table_info(feed_items)")
+            }
+            for name, definition in ADDED_COLUMNS:
+                if name not in columns:
+                    self.connection.execute(
+                        f"ALTER TABLE feed_items ADD COLUMN {name} {definition}"
+                    )
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+    def get_stored_items(self) -> list[FeedItem]:
+        return self._select(SELECT_ITEMS)
+
+    def get_stored_item(self, item_id: str) -> FeedItem | None:
+        items = self._select(f"{SELECT_ITEMS} WHERE id = ?", (item_id,))
+        return items[0] if items else None
+
+    def get_feed_items(self, feed_url: str, exclude_read: bool = False) -> list[FeedItem]:
+        if exclude_read:
+            return self._select(
+                f"{SELECT_ITEMS} WHERE feed_url = ? AND read = 0 ORDER BY published DESC",
+                (feed_url,),
+            )
+        return self._select(
+            f"{SELECT_ITEMS} WHERE feed_url = ? ORDER BY published DESC", (feed_url,)
+        )
+
+    def get_unread_items(self) -> list[FeedItem]:
+        return self._select(f"{SELECT_ITEMS} WHERE read = 0 ORDER BY published DESC")
+
+    def get_items_by_published(
+        self, newest_first: bool = True, limit: int | None = None
+    ) -> list[FeedItem]:
+        direction = "DESC" if newest_first else "ASC"
+        if limit is None:
+            return self._select(f"{SELECT_ITEMS} ORDER BY published {direction}")
+        return self._select(
+            f"{SELECT_ITEMS} ORDER BY published {direction} LIMIT ?", (limit,)
+        )
+
+    def query_items(self, query: ItemQuery) -> Iterator[FeedItem]:
+        if query.limit is not None:
+            return iter(self._select(*build_query(query, query.limit)))
+        # build the first statement now so a bad cursor is raised here, not on first use
+        return self._query_chunks(query, build_query(query, QUERY_CHUNK_SIZE))
+
+    def _query_chunks(
+        self, query: ItemQuery, statement: tuple[str, list[Any]]
+    ) -> Iterator[FeedItem]:
+        while True:
+            items = self._select(*statement)
+            yield from items
+            if len(items) < QUERY_CHUNK_SIZE:
+                return
+            statement = build_query(
+                replace(query, cursor=encode_cursor(items[-1])), QUERY_CHUNK_SIZE
+            )
+
+    def update_feed_item(self, item: FeedItem) -> None:
+        self.update_feed_items([item])
+
+    def update_feed_items(self, items: list[FeedItem]) -> None:
+        """Replaces stored items outright, read state included, in one transaction"""
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(REPLACE_ITEM, (to_row(item) for item in items))
+
+    def store_feed_item(self, item: FeedItem) -> None:
+        self.store_feed_items([item])
+
+    def store_feed_items(self, items: list[FeedItem]) -> None:
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(UPSERT_ITEMS, (to_row(item) for item in items))
+
+    def remove_feed_items(self, item_ids: list[str]) -> None:
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(DELETE_ITEM, ((item_id,) for item_id in item_ids))
+
+    def mark_items_read(self, item_ids: list[str], read: bool = True) -> list[str]:
+        changed: list[str] = []
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN")
+            for start in range(0, len(item_ids), MARK_CHUNK_SIZE):
+                chunk = item_ids[start : start + MARK_CHUNK_SIZE]
+                statement = SELECT_READ_CHANGES.format(", ".join("?" for _ in chunk))
+                changed += (row[0] for row in self.connection.execute(statement, [int(read), *chunk]))
+            self.connection.executemany(MARK_READ, ((int(read), item_id) for item_id in changed))
+        return changed
+
+    def compact(self) -> None:
+        """Returns the pages freed by removed items to the file system"""
+        with self._lock:
+            self.connection.execute("VACUUM")
+
+    def save(self) -> None:
+        # every write runs in its own transaction; checkpoint so the main file is current
+        with self._lock:
+            self.connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _select(self, statement: str, parameters: Iterable[Any] = ()) -> list[FeedItem]:
+        with self._lock:
+            rows = self.connection.execute(statement, tuple(parameters)).fetchall()
+        return [from_row(row) for row in rows]
+
+
+def build_query(query: ItemQuery, limit: int) -> tuple[str, list[Any]]:
+    """Translates an ItemQuery into a SELECT, continuing after the cursor by keyset
+
+    Rows sort by (published, id) with NULL published first ascending and last
+    descending, matching sort_key in core.services.rss.query.
+    """
+    clauses: list[str] = []
+    parameters: list[Any] = []
+    if query.feed_urls is not None:
+        placeholders = ", ".join("?" for _ in query.feed_urls)
+        # an empty feed list matches nothing, and IN () is not valid SQL
+        clauses.append(f"feed_url IN ({placeholders})" if query.feed_urls else "0")
+        parameters.extend(query.feed_urls)
+    if query.read is not None:
+        clauses.append("read = ?")
+        parameters.append(int(query.read))
+    if query.published_after is not None:
+        clauses.append("published >= ?")
+        parameters.append(to_epoch(query.published_after))
+    if query.published_before is not None:
+        clauses.append("published < ?")
+        parameters.append(to_epoch(query.published_before))
+    newest_first = query.order == SortOrder.NEWEST_FIRST
+    if query.cursor is not None:
+        published, item_id = decode_cursor(query.cursor)
+        if published is None and newest_first:
+            clauses.append("(published IS NULL AND id < ?)")
+            parameters.append(item_id)
+        elif published is None:
+            clauses.append("(published IS NOT NULL OR id > ?)")
+            parameters.append(item_id)
+        elif newest_first:
+            clauses.append("(published IS NULL OR published < ? OR (published = ? AND id < ?))")
+            parameters.extend((published, published, item_id))
+        else:
+            clauses.append("(published > ? OR (published = ? AND id > ?))")
+            parameters.extend((published, published, item_id))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    direction = "DESC" if newest_first else "ASC"
+    parameters.append(limit)
+    return (
+        f"{SELECT_ITEMS}{where} ORDER BY published {direction}, id {direction} LIMIT ?",
+        parameters,
+    )
+
+
+def to_row(item: FeedItem) -> tuple:
+    published, published_offset = encode_datetime(item.published)
+    created, created_offset = encode_datetime(item.created)
+    return (
+        item.id,
+        item.title,
+        item.summary,
+        None if item.images is None else json.dumps(item.images),
+        item.link,
+        published,
+        published_offset,
+        item.feed_url,
+        int(item.read),
+        created,
+        created_offset,
+        item.fingerprint,
+        item.content_hash,
+    )
+
+
+def from_row(row: tuple) -> FeedItem:
+    (
+        id,
+        title,
+        summary,
+        images,
+        link,
+        published,
+        published_offset,
+        feed_url,
+        read,
+        created,
+        created_offset,
+        fingerprint,
+        content_hash,
+    ) = row
+    return FeedItem(
+        id=id,
+        title=title,
+        summary=summary,
+        images=None if images is None else json.loads(images),
+        link=link,
+        published=decode_datetime(published, published_offset),
+        feed_url=feed_url,
+        read=bool(read),
+        created=decode_datetime(created, created_offset),
+        fingerprint=fingerprint,
+        content_hash=content_hash,
+    )
+
+
+def encode_datetime(value: datetime | None) -> tuple[float | None, int | None]:
+    """Splits a datetime into an epoch (sortable across offsets) and its UTC offset
+
+    A None offset marks a naive datetime, so values round trip unchanged.
+    """
+    if value is None:
+        return None, None
+    epoch = to_epoch(value)
+    offset = value.utcoffset()
+    return epoch, None if offset is None else int(offset.total_seconds())
+
+
+def decode_datetime(epoch: float | None, offset: int | None) -> DateTime | None:
+    if epoch is None:
+        return None
+    if offset is None:
+        return DateTime.fromtimestamp(epoch)
+    return DateTime.fromtimestamp(epoch, timezone(timedelta(seconds=offset)))
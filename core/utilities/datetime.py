@@ -1,4 +1,8 @@
-from datetime import datetime, UTC, timezone
+from datetime import datetime, timedelta, UTC, timezone
+from functools import lru_cache
+import re
+from time import struct_time
+from typing import Callable
 from typing_extensions import Self
 
 TZ_FORMAT = "%a, %d %b %Y %H:%M:%S %Z"
@@ -6,6 +10,25 @@ OFFSET_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
 
 UTC: timezone = UTC
 
+PARSE_CACHE_SIZE: int = 16384
+RFC_822 = re.compile(
+    r"\s*(?:[A-Za-z]+,?\s*)?(\d{1,2})[\s-]+([A-Za-z]{3})[A-Za-z]*\.?[\s-]+(\d{2,4})"
+    r"\s+(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?\s*([+-]\d{2}:?\d{2}|[A-Za-z]+)?\s*"
+)
+MONTHS: dict[str, int] = {
+    month: index
+    for index, month in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"],
+        start=1,
+    )
+}
+# RFC 822 zone names, in hours from UTC
+ZONES: dict[str, int] = {
+    "ut": 0, "utc": 0, "gmt": 0, "z": 0,
+    "est": -5, "edt": -4, "cst": -6, "cdt": -5,
+    "mst": -7, "mdt": -6, "pst": -8, "pdt": -7,
+}
+
 
 class DateTime(datetime):
     @classmethod
@@ -25,19 +48,33 @@ class DateTime(datetime):
         return super().strptime(date_string, format)
 
     @classmethod
-    def parse_timestamp(cls, date_string) -> Self:
-        try:
-            return super().strptime(date_string, OFFSET_FORMAT)
-        except ValueError:
-            pass
-        try:
-            return super().strptime(date_string, TZ_FORMAT)
-        except ValueError:
-            pass
-        try:
-            return super().fromisoformat(date_string)
-        except ValueError:
-            raise
+    def parse_timestamp(
+        cls,
+        date_string: str | None,
+        parsed: struct_time | None = None,
+        source: str | None = None,
+    ) -> Self | None:
+        """Parses an RFC 822 or ISO 8601 timestamp
+
+        Named zones (GMT, UTC, EST, ...) are converted to offsets, so every
+        result is timezone aware.
+
+        Args:
+            date_string (str | None): the timestamp text
+            parsed (struct_time | None, optional): feedparser's already parsed UTC value (e.g. published_parsed), used instead of the text when given. Defaults to None.
+            source (str | None, optional): where the timestamp came from, e.g. the feed url; the format that last worked for a source is tried first. Defaults to None.
+
+        Raises:
+            ValueError: raised if the text matches no supported format
+
+        Returns:
+            Self | None: the timestamp, or None if there was none
+        """
+        if parsed is not None:
+            return cls(*parsed[:5], min(parsed[5], 59), tzinfo=UTC)
+        if date_string is None:
+            return None
+        return _parse_cached(cls, date_string, source)
 
     def timestamp(self) -> str:
         return self.strftime(TZ_FORMAT)
@@ -47,3 +84,71 @@ class DateTime(datetime):
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(year={self.year},month={self.month},day={self.day}, hour={self.hour}, minute={self.minute}, second={self.second})"
+
+
+def _parse_rfc_822(cls: type[DateTime], date_string: str) -> DateTime | None:
+    match = RFC_822.fullmatch(date_string)
+    if match is None:
+        return None
+    day, month_name, year, hour, minute, second, zone = match.groups()
+    month = MONTHS.get(month_name.lower())
+    if month is None:
+        return None
+    year = int(year)
+    if year < 100:
+        year += 2000 if year < 50 else 1900
+    return cls(
+        year,
+        month,
+        int(day),
+        int(hour),
+        int(minute),
+        min(int(second or 0), 59),
+        tzinfo=_parse_zone(zone),
+    )
+
+
+def _parse_zone(zone: str | None) -> timezone:
+    if zone is None:
+        return UTC
+    if zone[0] in "+-":
+        digits = zone[1:].replace(":", "")
+        offset = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+        return timezone(-offset if zone[0] == "-" else offset)
+    # unknown names are treated as UTC, as feedparser does
+    hours = ZONES.get(zone.lower(), 0)
+    return UTC if hours == 0 else timezone(timedelta(hours=hours))
+
+
+def _parse_iso_8601(cls: type[DateTime], date_string: str) -> DateTime | None:
+    try:
+        value = cls.fromisoformat(date_string.strip())
+    except ValueError:
+        return None
+    return value if value.tzinfo is not None else value.replace(tzinfo=UTC)
+
+
+def to_epoch(value: datetime) -> float:
+    """The epoch seconds of a datetime; DateTime.timestamp formats a string instead"""
+    return datetime.timestamp(value)
+
+
+PARSERS: tuple[Callable[[type[DateTime], str], DateTime | None], ...] = (
+    _parse_rfc_822,
+    _parse_iso_8601,
+)
+# source -> index into PARSERS of the format that last parsed one of its timestamps
+_source_formats: dict[str, int] = {}
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(cls: type[DateTime], date_string: str, source: str | None) -> DateTime:
+    first = _source_formats.get(source, 0) if source is not None else 0
+    for offset in range(len(PARSERS)):
+        index = (first + offset) % len(PARSERS)
+        value = PARSERS[index](cls, date_string)
+        if value is not None:
+            if source is not None and index != first:
+                _source_formats[source] = index
+            return value
+    raise ValueError(f"'{date_string}' is not a supported timestamp format")
@@ -1,11 +1,18 @@
+from functools import wraps
 
 from core.interfaces.common import ISave
+from core.utilities.save import get_save_coalescer
 
 
 def autosave(method):
+    """Saves after the method returns, coalescing with any enclosing autosave or batch()"""
+
+    @wraps(method)
     def wrapper(self: ISave, *args, **kwargs):
-        result = method(self, *args, **kwargs)
-        self.save()
+        coalescer = get_save_coalescer(self)
+        with coalescer.batch():
+            result = method(self, *args, **kwargs)
+            coalescer.request()
         return result
 
     return wrapper
@@ -1,8 +1,39 @@
+from contextlib import contextmanager
+import os
 import os.path
 from pathlib import Path
+import stat
+import tempfile
+from threading import Lock
+from typing import Iterator
 
 from core.utilities.datetime import DateTime
 
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where file_lock falls back to per-path thread locks
+    fcntl = None
+
+TEMP_SUFFIX: str = ".tmp"
+LOCK_SUFFIX: str = ".lock"
+# what open() would create a new file with
+DEFAULT_FILE_MODE: int = 0o666
+
+
+def _get_umask() -> int:
+    # os.umask can only be read by setting it, so this runs once, at import
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK: int = _get_umask()
+
+# lock file path -> the lock standing in for flock where fcntl is missing
+_path_locks: dict[str, Lock] = {}
+_path_locks_lock = Lock()
+
 
 def file_modification_date(file_path: Path) -> DateTime:
     """Get the last modified date for a given file path
@@ -15,3 +46,83 @@ def file_modification_date(file_path: Path) -> DateTime:
     """
     timestamp = os.path.getmtime(str(file_path))
     return DateTime.fromtimestamp(timestamp)
+
+
+@contextmanager
+def atomic_replace(file_path: Path) -> Iterator[Path]:
+    """Yields a temporary path next to file_path which replaces it once the block succeeds
+
+    Readers see either the old file or the complete new one, never a partial write.
+
+    Args:
+        file_path (Path): the path to be replaced
+
+    Yields:
+        Path: the temporary path to write to
+    """
+    descriptor, temp_name = tempfile.mkstemp(
+        prefix=f".{file_path.name}.", suffix=TEMP_SUFFIX, dir=file_path.parent
+    )
+    os.close(descriptor)
+    temp_path = Path(temp_name)
+    try:
+        # mkstemp creates the file 0600, keep the permissions the replaced file had
+        os.chmod(temp_path, replaced_file_mode(file_path))
+        yield temp_path
+        with open(temp_path, "rb+") as temp_file:
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def replaced_file_mode(file_path: Path) -> int:
+    """The permission bits of file_path, or those a newly created file would get"""
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return DEFAULT_FILE_MODE & ~UMASK
+
+
+def atomic_write_bytes(file_path: Path, data: bytes) -> None:
+    with atomic_replace(file_path) as temp_path:
+        temp_path.write_bytes(data)
+
+
+def atomic_write_text(file_path: Path, text: str, encoding: str = "UTF-8") -> None:
+    with atomic_replace(file_path) as temp_path:
+        temp_path.write_text(text, encoding=encoding)
+
+
+@contextmanager
+def file_lock(file_path: Path, exclusive: bool = True) -> Iterator[None]:
+    """Holds an advisory lock on a sidecar lock file for file_path, across processes
+
+    Without fcntl (Windows) the lock only serializes the threads of this
+    process, and shared locks are taken as exclusive ones.
+
+    Args:
+        file_path (Path): the path whose writers and readers should be serialized
+        exclusive (bool, optional): False takes a shared lock, for readers. Defaults to True.
+    """
+    lock_path = file_path.with_name(file_path.name + LOCK_SUFFIX)
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is None:
+            with _get_path_lock(lock_path):
+                yield
+            return
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _get_path_lock(lock_path: Path) -> Lock:
+    key = os.path.abspath(lock_path)
+    with _path_locks_lock:
+        lock = _path_locks.get(key)
+        if lock is None:
+            lock = _path_locks[key] = Lock()
+        return lock
@@ -0,0 +1,35 @@
+from mmap import mmap
+
+
+class StringHeap:
+    """UTF-8 strings packed end to end in one buffer, addressed by (offset, length)
+
+    A million short strings held this way cost their encoded bytes, rather
+    than a Python object of 50 bytes or more each. The buffer may also be a
+    read-only mmap, in which case strings are read straight from the mapped
+    file and appending is not possible.
+    """
+
+    __slots__ = ("data",)
+
+    data: bytearray | mmap
+
+    def __init__(self, data: bytearray | mmap | None = None):
+        self.data = bytearray() if data is None else data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def append(self, value: str) -> tuple[int, int]:
+        return self.append_bytes(value.encode("utf-8"))
+
+    def append_bytes(self, value: bytes) -> tuple[int, int]:
+        offset = len(self.data)
+        self.data += value
+        return offset, len(value)
+
+    def get(self, offset: int, length: int) -> str:
+        return self.data[offset : offset + length].decode("utf-8")
+
+    def get_bytes(self, offset: int, length: int) -> bytes:
+        return bytes(self.data[offset : offset + length])
@@ -0,0 +1,61 @@
+"""JSON encoding through orjson when it is installed, the standard library otherwise"""
+
+import json
+from json import JSONDecodeError
+from json.decoder import WHITESPACE
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SEPARATORS: tuple[str, str] = (",", ":")
+ARRAY_START: bytes = b"["
+ARRAY_END: bytes = b"]"
+DECODER = json.JSONDecoder()
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes value as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=SEPARATORS, ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_array(values: Iterable[Any]) -> bytes:
+    """Encodes values as one JSON array, one element at a time
+
+    Only the encoded elements are held, never a list of every value.
+    """
+    return ARRAY_START + b",".join(map(dumps, values)) + ARRAY_END
+
+
+def iter_array(data: bytes | str) -> Iterator[Any]:
+    """Decodes the elements of a JSON array one at a time
+
+    Each element is decoded as it is reached, so a caller that converts and
+    drops them never holds every decoded element at once.
+    """
+    text = data.decode("utf-8") if isinstance(data, (bytes, bytearray)) else data
+    index = WHITESPACE.match(text, 0).end()  # type: ignore
+    if not text.startswith("[", index):
+        raise JSONDecodeError("Expecting '['", text, index)
+    index = WHITESPACE.match(text, index + 1).end()  # type: ignore
+    if text.startswith("]", index):
+        return
+    while True:
+        value, index = DECODER.raw_decode(text, index)
+        yield value
+        index = WHITESPACE.match(text, index).end()  # type: ignore
+        if text.startswith("]", index):
+            return
+        if not text.startswith(",", index):
+            raise JSONDecodeError("Expecting ',' delimiter", text, index)
+        index = WHITESPACE.match(text, index + 1).end()  # type: ignore
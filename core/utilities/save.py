@@ -0,0 +1,129 @@
+import atexit
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock, RLock, Timer, local
+from typing import Iterator
+from weakref import WeakSet
+
+from core.interfaces.common import ISave
+
+COALESCER_ATTRIBUTE = "_save_coalescer"
+
+
+@dataclass(slots=True)
+class SaveMetrics:
+    requested: int = 0
+    performed: int = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self.requested - self.performed
+
+
+class SaveCoalescer:
+    """Turns many save requests against one ISave into as few save() calls as possible
+
+    Requests made inside batch() are deferred until the outermost batch of
+    the same thread exits; batches are counted per thread, so a long batch on
+    one thread doesn't hold back the saves requested by others. With a
+    debounce interval, the save is further delayed until no request has
+    arrived for that many seconds.
+    """
+
+    target: ISave
+    metrics: SaveMetrics
+    _lock: RLock
+    # the calling thread's batch depth, as .depth
+    _local: local
+    _dirty: bool
+    _timer: Timer | None
+
+    def __init__(self, target: ISave):
+        self.target = target
+        self.metrics = SaveMetrics()
+        self._lock = RLock()
+        self._local = local()
+        self._dirty = False
+        self._timer = None
+
+    @property
+    def debounce(self) -> float:
+        return getattr(self.target, "save_debounce", 0.0)
+
+    @property
+    def pending(self) -> bool:
+        return self._dirty
+
+    @property
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    @contextmanager
+    def batch(self) -> Iterator[SaveCoalescer]:
+        self._local.depth = self._depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth -= 1
+            with self._lock:
+                if self._depth == 0 and self._dirty:
+                    self._schedule()
+
+    def request(self) -> None:
+        with self._lock:
+            self.metrics.requested += 1
+            self._dirty = True
+            if self._depth == 0:
+                self._schedule()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._cancel_timer()
+            if not self._dirty:
+                return
+            # a save that raises stays pending, to be tried again
+            self.target.save()
+            self._dirty = False
+            self.metrics.performed += 1
+
+    def _schedule(self) -> None:
+        debounce = self.debounce
+        if debounce <= 0:
+            self.flush()
+            return
+        self._cancel_timer()
+        self._timer = Timer(debounce, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+        _debounced.add(self)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+# coalescers that ever debounced a save, held weakly so their targets can still be collected
+_debounced: WeakSet[SaveCoalescer] = WeakSet()
+
+
+@atexit.register
+def _flush_debounced() -> None:
+    """Performs the debounced saves still pending at exit, which would otherwise be lost"""
+    for coalescer in list(_debounced):
+        coalescer.flush()
+
+
+# held while a coalescer is attached, so two threads can't attach one each
+_attach_lock = Lock()
+
+
+def get_save_coalescer(target: ISave) -> SaveCoalescer:
+    coalescer = target.__dict__.get(COALESCER_ATTRIBUTE)
+    if coalescer is None:
+        with _attach_lock:
+            coalescer = target.__dict__.get(COALESCER_ATTRIBUTE)
+            if coalescer is None:
+                coalescer = SaveCoalescer(target)
+                setattr(target, COALESCER_ATTRIBUTE, coalescer)
+    return coalescer
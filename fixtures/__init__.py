@@ -0,0 +1 @@
+# py-feed-reader.fixtures
\ No newline at end of file
@@ -0,0 +1,311 @@
+from collections import Counter
+from dataclasses import dataclass
+from email.utils import format_datetime
+from http import HTTPStatus as http
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+from threading import Lock, Thread
+import time
+from typing import Iterable
+from xml.sax.saxutils import escape
+
+from core.models.feed import Feed
+from core.utilities.datetime import DateTime
+
+LOCALHOST = "127.0.0.1"
+RSS_CONTENT_TYPE = "application/rss+xml; charset=utf-8"
+ATOM_CONTENT_TYPE = "application/atom+xml; charset=utf-8"
+# statuses a simulated publisher fails with
+ERROR_STATUSES: tuple[int, ...] = (
+    http.INTERNAL_SERVER_ERROR,
+    http.BAD_GATEWAY,
+    http.SERVICE_UNAVAILABLE,
+    http.TOO_MANY_REQUESTS,
+)
+# pending connections the listening socket accepts, enough for a whole fetch window
+REQUEST_QUEUE_SIZE: int = 1024
+
+
+@dataclass(slots=True)
+class CannedFeed:
+    body: bytes
+    delay: float = 0.0
+    status: int = http.OK
+    etag: str | None = None
+    content_type: str = RSS_CONTENT_TYPE
+
+
+@dataclass(slots=True)
+class FeedProfile:
+    """How the publishers of simulated feeds behave, every chance drawn per request"""
+
+    # entries listed in each document
+    items: int = 20
+    # the chance that a request finds newly published entries
+    churn: float = 0.2
+    # entries published each time a feed churns
+    new_items: int = 2
+    latency: float = 0.0
+    # up to this many seconds added to the latency at random
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    # whether documents carry an ETag and unchanged ones are answered with 304
+    etags: bool = True
+    oversize_rate: float = 0.0
+    # the approximate size of an oversized document
+    oversize_bytes: int = 5 * 2**20
+    # the share of feeds served as Atom rather than RSS
+    atom: float = 0.0
+
+
+def make_rss(
+    title: str,
+    items: Iterable[tuple[str, str]],
+    link: str = "http://example.com/",
+    padding: int = 0,
+) -> bytes:
+    """Builds a minimal RSS 2.0 document
+
+    Args:
+        title (str): the channel title
+        items (Iterable[tuple[str, str]]): (guid, title) pairs, newest first
+        link (str, optional): the channel link. Defaults to "http://example.com/".
+        padding (int, optional): filler characters added to every description. Defaults to 0.
+
+    Returns:
+        bytes: the UTF-8 encoded document
+    """
+    published = format_datetime(DateTime.utcnow())
+    filler = " " + "x" * padding if padding else ""
+    entries = "".join(
+        f"<item><guid>{escape(guid)}</guid><title>{escape(item_title)}</title>"
+        f"<link>{escape(link)}{escape(guid)}</link><pubDate>{published}</pubDate>"
+        f"<description>{escape(item_title)}{filler}</description></item>"
+        for guid, item_title in items
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>{escape(title)}</title><link>{escape(link)}</link>{entries}"
+        "</channel></rss>"
+    ).encode("utf-8")
+
+
+def make_atom(
+    title: str,
+    items: Iterable[tuple[str, str]],
+    link: str = "http://example.com/",
+    padding: int = 0,
+) -> bytes:
+    """Builds a minimal Atom 1.0 document
+
+    Args:
+        title (str): the feed title
+        items (Iterable[tuple[str, str]]): (id, title) pairs, newest first
+        link (str, optional): the feed link. Defaults to "http://example.com/".
+        padding (int, optional): filler characters added to every summary. Defaults to 0.
+
+    Returns:
+        bytes: the UTF-8 encoded document
+    """
+    updated = DateTime.utcnow().isoformat()
+    filler = " " + "x" * padding if padding else ""
+    entries = "".join(
+        f"<entry><id>{escape(entry_id)}</id><title>{escape(entry_title)}</title>"
+        f'<link href="{escape(link)}{escape(entry_id)}"/><updated>{updated}</updated>'
+        f"<summary>{escape(entry_title)}{filler}</summary></entry>"
+        for entry_id, entry_title in items
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<title>{escape(title)}</title><id>{escape(link)}</id><link href="{escape(link)}"/>'
+        f"<updated>{updated}</updated>{entries}</feed>"
+    ).encode("utf-8")
+
+
+class SimulatedFeed:
+    """A publisher whose document changes between requests as its FeedProfile says
+
+    Every feed draws from a random generator of its own, so a run with the
+    same seeds serves the same sequence of documents and failures.
+    """
+
+    name: str
+    profile: FeedProfile
+    atom: bool
+    # entries published so far, the document lists the newest of them
+    published: int
+    revision: int
+    _random: random.Random
+    _body: bytes | None
+    _lock: Lock
+
+    def __init__(self, name: str, profile: FeedProfile, seed: int = 1):
+        self.name = name
+        self.profile = profile
+        self._random = random.Random(seed)
+        self.atom = self._random.random() < profile.atom
+        self.published = profile.items
+        self.revision = 0
+        self._body = None
+        self._lock = Lock()
+
+    def respond(self) -> CannedFeed:
+        """Decides the response to one request, publishing new entries when the feed churns"""
+        profile = self.profile
+        with self._lock:
+            delay = profile.latency
+            if profile.jitter:
+                delay += self._random.random() * profile.jitter
+            if profile.error_rate and self._random.random() < profile.error_rate:
+                return CannedFeed(b"", delay=delay, status=self._random.choice(ERROR_STATUSES))
+            if profile.churn and self._random.random() < profile.churn:
+                self.published += profile.new_items
+                self.revision += 1
+                self._body = None
+            if profile.oversize_rate and self._random.random() < profile.oversize_rate:
+                # a different document each time, so it is never answered with 304
+                body = self._render(profile.oversize_bytes // max(profile.items, 1))
+                return CannedFeed(body, delay=delay, content_type=self.content_type)
+            if self._body is None:
+                self._body = self._render()
+            etag = f'"{self.name}-{self.revision}"' if profile.etags else None
+            return CannedFeed(self._body, delay=delay, etag=etag, content_type=self.content_type)
+
+    @property
+    def content_type(self) -> str:
+        return ATOM_CONTENT_TYPE if self.atom else RSS_CONTENT_TYPE
+
+    def _render(self, padding: int = 0) -> bytes:
+        first = max(self.published - self.profile.items, 0)
+        items = [
+            (f"{self.name}-{index}", f"{self.name} item {index}")
+            for index in reversed(range(first, self.published))
+        ]
+        make = make_atom if self.atom else make_rss
+        return make(self.name, items, f"http://{self.name}.example.com/", padding)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+class FeedServer:
+    """A local HTTP stand-in that serves canned or simulated feeds, optionally with artificial latency
+
+    Usage:
+        with FeedServer() as server:
+            server.add_feed("/a.xml", CannedFeed(make_rss("a", [("1", "one")]), delay=0.2))
+            reader.fetcher.fetch(server.url("/a.xml"))
+
+    Simulated feeds stand in for thousands of publishers in load and soak tests:
+        feeds = server.add_simulated_feeds(5000, FeedProfile(latency=0.05, error_rate=0.01))
+    """
+
+    feeds: dict[str, CannedFeed | SimulatedFeed]
+    requests: list[str]
+    # response counts by status
+    statuses: Counter[int]
+    record_requests: bool
+    _statuses_lock: Lock
+
+    def __init__(self, host: str = LOCALHOST, port: int = 0, record_requests: bool = True):
+        self.feeds = {}
+        self.requests = []
+        self.statuses = Counter()
+        self.record_requests = record_requests
+        self._statuses_lock = Lock()
+        self._server = _HTTPServer((host, port), self._handler_type())
+        self._server.daemon_threads = True
+        self._thread: Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def add_feed(self, path: str, feed: CannedFeed | SimulatedFeed) -> str:
+        self.feeds[path] = feed
+        return self.url(path)
+
+    def add_simulated_feeds(
+        self, count: int, profile: FeedProfile, seed: int = 1, category: str = "simulated"
+    ) -> list[Feed]:
+        """Adds simulated feeds sharing a profile
+
+        Args:
+            count (int): how many feeds to add
+            profile (FeedProfile): how their publishers behave
+            seed (int, optional): seeds the feeds' random generators. Defaults to 1.
+            category (str, optional): the category of the returned feeds. Defaults to "simulated".
+
+        Returns:
+            list[Feed]: the feeds, ready to be written to an OPML file
+        """
+        feeds: list[Feed] = []
+        for index in range(count):
+            name = f"feed-{index}"
+            url = self.add_feed(f"/{name}.xml", SimulatedFeed(name, profile, seed + index))
+            feeds.append(Feed(title=name, url=url, html_url="", category=category))
+        return feeds
+
+    def count(self, status: int) -> None:
+        with self._statuses_lock:
+            self.statuses[status] += 1
+
+    def start(self) -> None:
+        self._thread = Thread(
+            target=self._server.serve_forever, name=FeedServer.__name__, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> FeedServer:
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _handler_type(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class CannedFeedHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if server.record_requests:
+                    server.requests.append(self.path)
+                feed = server.feeds.get(self.path)
+                if isinstance(feed, SimulatedFeed):
+                    feed = feed.respond()
+                if feed is None:
+                    server.count(http.NOT_FOUND)
+                    self.send_error(http.NOT_FOUND)
+                    return
+                if feed.delay:
+                    time.sleep(feed.delay)
+                if feed.etag is not None and self.headers.get("If-None-Match") == feed.etag:
+                    server.count(http.NOT_MODIFIED)
+                    self.send_response(http.NOT_MODIFIED)
+                    self.send_header("ETag", feed.etag)
+                    self.end_headers()
+                    return
+                server.count(feed.status)
+                self.send_response(feed.status)
+                self.send_header("Content-Type", feed.content_type)
+                self.send_header("Content-Length", str(len(feed.body)))
+                if feed.etag is not None:
+                    self.send_header("ETag", feed.etag)
+                self.end_headers()
+                self.wfile.write(feed.body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return CannedFeedHandler
@@ -2,7 +2,10 @@ from core.config.common import config
 from core.config.file import FileStorageSettings, DEFAULT_PICKLE_STORAGE_PATH
 import core.config.logging as logging
 from core.services.feed.opml import OPMLFeedService
+from core.services.feed.state import JsonFeedStateService
+from core.services.rss.counters import UnreadCounters
 from core.services.rss.pickle import PickleRssStorageService
+from core.services.rss.readstate import ReadStateStorageService
 from core.services.rss.reader import RssFeedReaderService
 
 
@@ -10,5 +13,8 @@ settings = config.get_config(FileStorageSettings, True)
 settings.storage_file_path = DEFAULT_PICKLE_STORAGE_PATH
 logging.dev_configuration()
 feed_service = OPMLFeedService()
-storage_service = PickleRssStorageService()
-reader = RssFeedReaderService(storage_service, feed_service)
+storage_service = ReadStateStorageService(
+    PickleRssStorageService(), UnreadCounters(feed_service.feeds)
+)
+state_service = JsonFeedStateService()
+reader = RssFeedReaderService(storage_service, feed_service, state_service=state_service)